@@ -1,15 +1,19 @@
 import os
+import re
 import json
 import requests
 import psycopg2
 import dotenv
 
+import data_access
+
 dotenv.load_dotenv()
 
 DB_URL      = os.getenv("DB_URI")
 GEMINI_KEY  = os.getenv("GEMINI_API_KEY")
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
 GEMINI_URL  = (
-    "https://generativelanguage.googleapis.com/v1beta/models/"
+    f"{GEMINI_API_BASE}/v1beta/models/"
     "gemini-2.5-flash:generateContent"
 )
 
@@ -25,41 +29,10 @@ def get_connection():
 def get_vehicle_image_db(brand, model, year):
     """
     Look up image_url from afdc_vehicles.
-    Tries exact year first, then any year for that brand+model.
+    Tries exact year first, then the nearest year for that brand+model.
     Returns None if not found or URL is 'NaN'.
     """
-    conn = get_connection()
-    cur  = conn.cursor()
-
-    cur.execute("""
-        SELECT image_url
-        FROM afdc_vehicles
-        WHERE LOWER(brand) = LOWER(%s)
-          AND LOWER(model)  LIKE LOWER(%s)
-          AND year = %s
-          AND image_url IS NOT NULL
-          AND image_url != 'NaN'
-        LIMIT 1
-    """, (brand, f"%{model}%", year))
-
-    row = cur.fetchone()
-
-    if not row:
-        cur.execute("""
-            SELECT image_url
-            FROM afdc_vehicles
-            WHERE LOWER(brand) = LOWER(%s)
-              AND LOWER(model)  LIKE LOWER(%s)
-              AND image_url IS NOT NULL
-              AND image_url != 'NaN'
-            ORDER BY ABS(year - %s)
-            LIMIT 1
-        """, (brand, f"%{model}%", year))
-        row = cur.fetchone()
-
-    cur.close()
-    conn.close()
-
+    row = data_access.vehicle_image(brand, model, year)
     if not row:
         return None
 
@@ -76,23 +49,48 @@ WIKI_HEADERS = {
     "User-Agent": "CarbonWise/1.0 (vehicle lifecycle emissions platform; contact@carbonwise.app) python-requests"
 }
 
+WIKI_API_URL = os.getenv("WIKI_API_URL", "https://en.wikipedia.org/w/api.php")
+
+
+def wikimedia_search_params(query):
+    return {
+        "action":      "query",
+        "list":        "search",
+        "srsearch":    query,
+        "srnamespace": 0,
+        "srlimit":     3,
+        "format":      "json",
+    }
+
+
+def wikimedia_image_params(page_title):
+    return {
+        "action":      "query",
+        "titles":      page_title,
+        "prop":        "pageimages",
+        "pithumbsize": 640,
+        "format":      "json",
+    }
+
+
+def wikimedia_thumb(image_data):
+    """Return the first page thumbnail URL in a pageimages response, or None."""
+    pages = image_data.get("query", {}).get("pages", {})
+    for page in pages.values():
+        thumb = page.get("thumbnail", {}).get("source")
+        if thumb:
+            return thumb
+    return None
+
+
 def get_wikimedia_image(query):
     """
     Search Wikimedia Commons for a vehicle image using the provided query string.
     Returns the best image URL (thumb ~640px wide) or None if nothing found.
     """
     try:
-        search_url = "https://en.wikipedia.org/w/api.php"
-        search_params = {
-            "action":      "query",
-            "list":        "search",
-            "srsearch":    query,
-            "srnamespace": 0,
-            "srlimit":     3,
-            "format":      "json",
-        }
-
-        search_res = requests.get(search_url, params=search_params, headers=WIKI_HEADERS, timeout=8)
+        search_res = requests.get(WIKI_API_URL, params=wikimedia_search_params(query),
+                                  headers=WIKI_HEADERS, timeout=8)
         search_res.raise_for_status()
         search_data = search_res.json()
 
@@ -103,24 +101,14 @@ def get_wikimedia_image(query):
 
         # Try each result until we find one with a page image
         for hit in hits:
-            page_title = hit["title"]
-
-            image_res = requests.get(search_url, params={
-                "action":      "query",
-                "titles":      page_title,
-                "prop":        "pageimages",
-                "pithumbsize": 640,
-                "format":      "json",
-            }, headers=WIKI_HEADERS, timeout=8)
+            image_res = requests.get(WIKI_API_URL, params=wikimedia_image_params(hit["title"]),
+                                     headers=WIKI_HEADERS, timeout=8)
             image_res.raise_for_status()
-            image_data = image_res.json()
 
-            pages = image_data.get("query", {}).get("pages", {})
-            for page in pages.values():
-                thumb = page.get("thumbnail", {}).get("source")
-                if thumb:
-                    print(f"[ai_summary] Wikimedia fallback image: {thumb}")
-                    return thumb
+            thumb = wikimedia_thumb(image_res.json())
+            if thumb:
+                print(f"[ai_summary] Wikimedia fallback image: {thumb}")
+                return thumb
 
         print(f"[ai_summary] Wikimedia: no page image found for '{query}'")
         return None
@@ -221,36 +209,18 @@ STRICT RULES — violating any will break the parser:
 # CALL GEMINI
 # =====================================================
 
-def call_gemini(prompt):
-
-    if not GEMINI_KEY:
-        raise ValueError("GEMINI_API_KEY not set in environment — add it to your .env file")
-
-    print(f"[ai_summary] Calling Gemini API...")
-
-    try:
-        response = requests.post(
-            f"{GEMINI_URL}?key={GEMINI_KEY}",
-            headers={"Content-Type": "application/json"},
-            json={
-                "contents": [{"parts": [{"text": prompt}]}],
-                "generationConfig": {
-                    "temperature":     0.2,
-                    "maxOutputTokens": 4096,
-                }
-            },
-            timeout=30
-        )
-    except requests.exceptions.Timeout:
-        raise ValueError("Gemini API timed out after 30s")
-    except requests.exceptions.ConnectionError as e:
-        raise ValueError(f"Cannot reach Gemini API: {e}")
+def gemini_request_body(prompt):
+    return {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {
+            "temperature":     0.2,
+            "maxOutputTokens": 4096,
+        }
+    }
 
-    if not response.ok:
-        print(f"[ai_summary] Gemini HTTP {response.status_code}: {response.text[:500]}")
-        raise ValueError(f"Gemini API error {response.status_code}: {response.text[:200]}")
 
-    data = response.json()
+def parse_gemini_summary(data):
+    """Extract and JSON-decode the summary text from a Gemini response body."""
     print(f"[ai_summary] Gemini response keys: {list(data.keys())}")
 
     candidates = data.get("candidates", [])
@@ -288,6 +258,32 @@ def call_gemini(prompt):
         raise ValueError(f"Gemini response is not valid JSON even after repair.\nRaw: {text[:500]}")
 
 
+def call_gemini(prompt):
+
+    if not GEMINI_KEY:
+        raise ValueError("GEMINI_API_KEY not set in environment — add it to your .env file")
+
+    print(f"[ai_summary] Calling Gemini API...")
+
+    try:
+        response = requests.post(
+            f"{GEMINI_URL}?key={GEMINI_KEY}",
+            headers={"Content-Type": "application/json"},
+            json=gemini_request_body(prompt),
+            timeout=30
+        )
+    except requests.exceptions.Timeout:
+        raise ValueError("Gemini API timed out after 30s")
+    except requests.exceptions.ConnectionError as e:
+        raise ValueError(f"Cannot reach Gemini API: {e}")
+
+    if not response.ok:
+        print(f"[ai_summary] Gemini HTTP {response.status_code}: {response.text[:500]}")
+        raise ValueError(f"Gemini API error {response.status_code}: {response.text[:200]}")
+
+    return parse_gemini_summary(response.json())
+
+
 # =====================================================
 # MAIN ENTRY POINT
 # =====================================================
@@ -306,6 +302,20 @@ def generate_summary(vehicles_data, distance_km):
     prompt  = build_prompt(vehicles_data, distance_km)
     summary = call_gemini(prompt)
 
+    for v, image_query in summary_image_requests(summary, vehicles_data):
+        img = get_vehicle_image(v["brand"], v["model"], v["year"], image_query=image_query)
+        attach_summary_image(summary, v, img)
+
+    summary.setdefault("winner_image_url", None)
+
+    return summary
+
+
+def summary_image_requests(summary, vehicles_data):
+    """
+    Yield (vehicle, image_query) for every compared vehicle.
+    Prefers the breakdown-level query, falls back to winner_image_query for the winner.
+    """
     winner_name        = summary.get("winner", "")
     winner_image_query = summary.get("winner_image_query")
 
@@ -318,20 +328,101 @@ def generate_summary(vehicles_data, distance_km):
     for v in vehicles_data:
         full_name = f"{v['brand']} {v['model']} {v['year']}"
 
-        # Prefer breakdown-level query, fall back to winner_image_query for winner
         image_query = breakdown_queries.get(full_name)
         if not image_query and full_name == winner_name:
             image_query = winner_image_query
 
-        img = get_vehicle_image(v["brand"], v["model"], v["year"], image_query=image_query)
+        yield v, image_query
 
-        if full_name == winner_name:
-            summary["winner_image_url"] = img
 
-        for b in summary.get("breakdown", []):
-            if b.get("name") == full_name:
-                b["image_url"] = img
+def attach_summary_image(summary, v, img):
+    full_name = f"{v['brand']} {v['model']} {v['year']}"
 
-    summary.setdefault("winner_image_url", None)
+    if full_name == summary.get("winner", ""):
+        summary["winner_image_url"] = img
+
+    for b in summary.get("breakdown", []):
+        if b.get("name") == full_name:
+            b["image_url"] = img
+
+
+# =====================================================
+# OCR CLAIM  (screenshot → Gemini Vision → verdict)
+# =====================================================
+
+GEMINI_VISION_URL = GEMINI_URL
+
+OCR_PROMPT = """You are a greenwashing auditor for vehicle advertising.
+
+Read the attached screenshot. If it contains an environmental or emissions
+marketing claim about a vehicle, assess it under EU Directive 2024/825 and
+UK ASA guidance.
+
+Respond ONLY with raw JSON — no markdown, no prose, no code fences:
+{
+  "found": true,
+  "claim_text": "verbatim claim (max 120 chars)",
+  "risk_level": "SAFE|CAUTION|WARNING|VIOLATION",
+  "verdict": "one sentence (max 100 chars)",
+  "explanation": "why (max 300 chars)",
+  "suggestion": "compliant rewording or null"
+}
+
+If no environmental claim is visible, return found=false, an empty
+claim_text and risk_level null.
+"""
+
+OCR_FALLBACK = {
+    "found":       False,
+    "claim_text":  "",
+    "risk_level":  None,
+    "verdict":     "Unable to analyse screenshot",
+    "explanation": "The AI response was malformed or truncated.",
+    "suggestion":  None,
+}
+
+
+def ocr_request_body(image_b64, mime_type):
+    return {
+        "contents": [{
+            "parts": [
+                {"inline_data": {"mime_type": mime_type, "data": image_b64}},
+                {"text": OCR_PROMPT},
+            ]
+        }],
+        "generationConfig": {"temperature": 0.1, "maxOutputTokens": 1000},
+    }
+
+
+def parse_ocr_response(raw):
+    """Decode Gemini Vision output into the verdict dict, repairing truncation."""
+    text = "".join(
+        p.get("text", "")
+        for p in raw.get("candidates", [{}])[0]
+                    .get("content", {})
+                    .get("parts", [])
+    ).strip()
+
+    print(f"[ocr-claim] Gemini raw: {text}")
+
+    text = text.replace("```json", "").replace("```", "").strip()
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    match = re.search(r"\{[\s\S]*\}", text)
+    if match:
+        fragment = match.group(0)
+        if fragment.count("{") > fragment.count("}"):
+            fragment += "}"
+        if fragment.count('"') % 2 == 1:
+            fragment += '"'
+        try:
+            return json.loads(fragment)
+        except json.JSONDecodeError:
+            pass
 
-    return summary
\ No newline at end of file
+    print("[ocr-claim] JSON recovery failed")
+    return dict(OCR_FALLBACK)
@@ -1,10 +1,128 @@
-from fastapi import FastAPI
+"""
+api.py  —  CarbonWise async ASGI service
+=========================================
+Same routes and JSON shapes as app.py, served by FastAPI so that slow
+outbound calls (Gemini, Wikimedia, grounded search) no longer pin a worker
+thread for 30–45 s each.
+
+  - Postgres via an asyncpg pool          (DB_URI, DB_POOL_MIN / DB_POOL_MAX)
+  - Outbound HTTP via one httpx.AsyncClient
+  - Engine / recommender / rule-engine work offloaded to a thread pool
+    (ENGINE_WORKERS) — those paths still use psycopg2 internally
+  - Vehicle rows and afdc image lookups go through data_access on that
+    pool, so they share its versioned cache with app.py. A cache miss is
+    a blocking psycopg2 query on an engine thread, not an asyncpg one
+  - /wallet/* and /impact/* are served by the existing Flask blueprints
+    through the WSGI bridge. They stay blocking: each request holds a
+    bridge thread and a psycopg2 connection for its whole duration, so
+    they gain nothing from the event loop (see README, Async server)
+
+Run:
+    cd backend
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Compare against the Flask app with benchmarks/asgi_vs_flask.py.
+"""
+
+import os
+import json
+import math
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import asyncpg
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from engine import vehicles, total_emissions, break_even_km
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse, Response
+from flask import Flask
+
+from engine import calculate_lifecycle, grid_version
+from recommendation import recommend_vehicle, cache_version as recommend_version
+from break_even import break_even_km
+from greenwashing import evaluate_claims
+from greenwashing_pipeline import (
+    start_web_search,
+    remaining_deadline,
+    park_web_search,
+    register_base_report,
+    get_web_search,
+    normalise_inputs,
+    build_response,
+    parse_deadline,
+)
+from carbon_index import carbon_score
+from annual_impact import annual_emissions
+from ai_summary import (
+    GEMINI_KEY,
+    GEMINI_URL,
+    GEMINI_VISION_URL,
+    WIKI_API_URL,
+    WIKI_HEADERS,
+    get_vehicle_image_db,
+    build_prompt,
+    gemini_request_body,
+    parse_gemini_summary,
+    summary_image_requests,
+    attach_summary_image,
+    wikimedia_search_params,
+    wikimedia_image_params,
+    wikimedia_thumb,
+    ocr_request_body,
+    parse_ocr_response,
+)
+from grid_format import build_grid, FORMATS as GRID_FORMATS
+from http_cache import lookup, store, negotiate, WatchedJSONFile
+import data_access
+import data_versions
+import metrics
+import query_audit
+from wallet_routes import wallet_bp
+from impact_routes import impact_bp
+
+load_dotenv()
 
-app = FastAPI()
+DB_POOL_MIN    = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX    = int(os.getenv("DB_POOL_MAX", "20"))
+ENGINE_WORKERS = int(os.getenv("ENGINE_WORKERS", "8"))
+MAX_PAGE_LIMIT = 500            # /vehicles rows per page
+
+GRID_FILE = WatchedJSONFile(os.path.join(
+    os.path.dirname(__file__), "..", "data", "grid_master_v2_2026_clean.json"
+))
+
+_db:     asyncpg.Pool | None       = None
+_http:   httpx.AsyncClient | None  = None
+_engine: ThreadPoolExecutor | None = None
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global _db, _http, _engine
+    db_uri = os.getenv("DB_URI")
+    if not db_uri:
+        raise ValueError("DB_URI environment variable not set")
+
+    _db     = await asyncpg.create_pool(db_uri, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX)
+    _http   = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=8.0),
+                                event_hooks=metrics.httpx_event_hooks())
+    _engine = ThreadPoolExecutor(max_workers=ENGINE_WORKERS, thread_name_prefix="engine")
+    try:
+        yield
+    finally:
+        await _http.aclose()
+        await _db.close()
+        _engine.shutdown(wait=False)
+
+
+app = FastAPI(title="CarbonWise API", lifespan=lifespan)
 
-# Allow browser access
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -12,4 +130,540 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if metrics.ENABLED:
+    metrics.instrument_requests()
+    app.middleware("http")(metrics.asgi_middleware)
+if query_audit.ENABLED:
+    app.middleware("http")(query_audit.asgi_middleware)
+
+
+# ─────────────────────────────────────────────────────────────────
+# HELPERS
+# ─────────────────────────────────────────────────────────────────
+
+def _error(message, status):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+def _json(payload, status=200):
+    return JSONResponse(jsonable_encoder(payload), status_code=status)
+
+
+async def _body(request: Request) -> dict:
+    try:
+        return (await request.json()) or {}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return {}
+
+
+async def _cached_json(request: Request, key, version, build):
+    """Async twin of app._cached_json — build is a coroutine function."""
+    entry = lookup(key, version) or store(key, version, await build())
+    return _respond(request, entry)
+
+
+def _respond(request: Request, entry):
+    status, body, headers = negotiate(
+        entry,
+        request.headers.get("if-none-match"),
+        request.headers.get("accept-encoding"),
+    )
+    return Response(body, status_code=status, headers=headers, media_type="application/json")
+
+
+async def _offload(fn, *args, **kwargs):
+    """Run blocking engine code on the engine pool without stalling the loop.
+    The request's context goes along, so its DB queries count towards it."""
+    loop = asyncio.get_running_loop()
+    ctx  = contextvars.copy_context()
+    return await loop.run_in_executor(_engine, partial(ctx.run, fn, *args, **kwargs))
+
+
+async def _fetch_vehicles(refs):
+    """Vehicle rows for [(brand, model, year), ...] via data_access, in one lookup."""
+    return await _offload(data_access.vehicles, refs)
+
+
+async def _fetch_vehicle(brand, model, year):
+    return (await _fetch_vehicles([(brand, model, year)]))[0]
+
+
+# ─────────────────────────────────────────────────────────────────
+# IMAGE LOOKUP  (async mirror of ai_summary.get_vehicle_image)
+# ─────────────────────────────────────────────────────────────────
+
+async def _vehicle_image_db(brand, model, year):
+    return await _offload(get_vehicle_image_db, brand, model, year)
+
+
+async def _wikimedia_image(query):
+    try:
+        res = await _http.get(WIKI_API_URL, params=wikimedia_search_params(query),
+                              headers=WIKI_HEADERS, timeout=8)
+        res.raise_for_status()
+        hits = res.json().get("query", {}).get("search", [])
+        for hit in hits:
+            res = await _http.get(WIKI_API_URL, params=wikimedia_image_params(hit["title"]),
+                                  headers=WIKI_HEADERS, timeout=8)
+            res.raise_for_status()
+            thumb = wikimedia_thumb(res.json())
+            if thumb:
+                return thumb
+        return None
+    except Exception as e:
+        print(f"[api] Wikimedia fallback failed: {e}")
+        return None
+
+
+async def _vehicle_image(brand, model, year, image_query=None):
+    url = await _vehicle_image_db(brand, model, year)
+    if url:
+        return url
+    if image_query:
+        url = await _wikimedia_image(image_query)
+        if url:
+            return url
+    return await _wikimedia_image(f"{brand} {model} {year} car")
+
+
+async def _call_gemini(prompt):
+    if not GEMINI_KEY:
+        raise ValueError("GEMINI_API_KEY not set in environment — add it to your .env file")
+    try:
+        response = await _http.post(
+            f"{GEMINI_URL}?key={GEMINI_KEY}",
+            headers={"Content-Type": "application/json"},
+            json=gemini_request_body(prompt),
+            timeout=30,
+        )
+    except httpx.TimeoutException:
+        raise ValueError("Gemini API timed out after 30s")
+    except httpx.TransportError as e:
+        raise ValueError(f"Cannot reach Gemini API: {e}")
+
+    if not response.is_success:
+        raise ValueError(f"Gemini API error {response.status_code}: {response.text[:200]}")
+    return parse_gemini_summary(response.json())
+
+
+# ─────────────────────────────────────────────────────────────────
+# HEALTH CHECK
+# ─────────────────────────────────────────────────────────────────
+
+@app.get("/")
+async def home():
+    return {"platform": "CarbonWise API", "status": "running"}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# ─────────────────────────────────────────────────────────────────
+# VEHICLE LIST / SEARCH / DETAIL
+# ─────────────────────────────────────────────────────────────────
+
+@app.get("/vehicles")
+async def get_vehicles(request: Request, page: int = 1, limit: int = 200, vehicle_type: str = ""):
+    page  = max(1, page)
+    limit = max(1, min(limit, MAX_PAGE_LIMIT))
+    return await _cached_json(
+        request,
+        ("vehicles", page, limit, vehicle_type),
+        data_versions.current(data_versions.VEHICLES),
+        lambda: _vehicles_page(page, limit, vehicle_type),
+    )
+
+
+async def _vehicles_page(page, limit, vehicle_type):
+    offset = (page - 1) * limit
+
+    if vehicle_type.upper() == "EV":
+        where, params = "WHERE vehicle_type IN ('EV','BEV')", []
+    elif vehicle_type:
+        where, params = "WHERE vehicle_type=$1", [vehicle_type]
+    else:
+        where, params = "", []
+
+    n = len(params)
+    async with _db.acquire() as conn:
+        total = await conn.fetchval(f"SELECT COUNT(*) FROM vehicles {where}", *params)
+        rows  = await conn.fetch(
+            f"SELECT brand, model, year, vehicle_type FROM vehicles {where} "
+            f"ORDER BY brand, model LIMIT ${n + 1} OFFSET ${n + 2}",
+            *params, limit, offset,
+        )
+
+    return {
+        "vehicles": [
+            {"brand": r[0], "model": r[1], "year": r[2], "vehicle_type": r[3]}
+            for r in rows
+        ],
+        "total": total,
+        "page":  page,
+        "pages": math.ceil(total / limit),
+    }
+
+
+@app.get("/vehicle-search")
+async def vehicle_search(q: str = ""):
+    q = q.strip()
+    if len(q) < 2:
+        return []
+
+    async with _db.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT brand, model, year, vehicle_type FROM vehicles "
+            "WHERE LOWER(brand) LIKE $1 OR LOWER(model) LIKE $1 "
+            "ORDER BY brand, model LIMIT 30",
+            f"%{q.lower()}%",
+        )
+    return [
+        {"brand": r[0], "model": r[1], "year": r[2], "vehicle_type": r[3]}
+        for r in rows
+    ]
+
+
+@app.get("/vehicle-detail")
+async def vehicle_detail(brand: str | None = None, model: str | None = None,
+                         year: str | None = None):
+    if not all([brand, model, year]):
+        return _error("brand, model, year required", 400)
+
+    vehicle = await _fetch_vehicle(brand, model, year)
+    if not vehicle:
+        return _error("Vehicle not found", 404)
+    return _json(vehicle)
+
+
+@app.post("/winner-detail")
+async def winner_detail(request: Request):
+    data  = await _body(request)
+    brand = data.get("brand", "")
+    model = data.get("model", "")
+    year  = data.get("year")
+
+    if not brand or not model:
+        return {"image_url": None, "specs": None}
+
+    row = await _offload(data_access.vehicle_image, brand, model, year)
+
+    manufacturer_url = None
+    if row:
+        raw_mfr = row[1]
+        if raw_mfr and raw_mfr.strip() not in ("", "NaN"):
+            manufacturer_url = raw_mfr
+
+    return {
+        "image_url": await _vehicle_image(brand, model, year),
+        "specs":     {"manufacturer_url": manufacturer_url},
+    }
+
+
+# ─────────────────────────────────────────────────────────────────
+# LIFECYCLE / COMPARE / RECOMMEND / BREAK-EVEN
+# ─────────────────────────────────────────────────────────────────
+
+@app.post("/lifecycle")
+async def lifecycle(request: Request):
+    data      = await _body(request)
+    brand     = data.get("brand")
+    model     = data.get("model")
+    year      = data.get("vehicle_year")
+    country   = data.get("country")
+    grid_year = data.get("grid_year")
+
+    if not all([brand, model, year, country]):
+        return _error("Missing parameters", 400)
+
+    # cached until this country's grid rows or the catalogue change
+    key     = ("lifecycle", json.dumps([brand, model, year, country, grid_year], default=str))
+    version = (grid_version(country), data_versions.current(data_versions.VEHICLES))
+    entry   = lookup(key, version)
+    if entry is None:
+        vehicle = await _fetch_vehicle(brand, model, year)
+        if not vehicle:
+            return _error("Vehicle not found", 404)
+        entry = store(key, version, await _offload(calculate_lifecycle, vehicle, country, grid_year))
+
+    return _respond(request, entry)
+
+
+@app.post("/compare-multiple")
+async def compare_multiple(request: Request):
+    data           = await _body(request)
+    country        = data.get("country")
+    year           = data.get("year")
+    distance_km    = data.get("distance_km")
+    vehicles_input = data.get("vehicles")
+
+    if not vehicles_input:
+        return _error("vehicles required", 400)
+
+    vehicles = await _fetch_vehicles([(v["brand"], v["model"], v["year"]) for v in vehicles_input])
+
+    async def _one(v, vehicle):
+        if not vehicle:
+            return {
+                "brand": v["brand"], "model": v["model"], "year": v["year"],
+                "error": "Vehicle not found in database",
+            }
+        lc = await _offload(calculate_lifecycle, vehicle, country, year, distance_km=distance_km)
+        return {
+            "brand": vehicle["brand"],
+            "model": vehicle["model"],
+            "year":  vehicle["year"],
+            **lc,
+        }
+
+    results = await asyncio.gather(*(_one(v, veh) for v, veh in zip(vehicles_input, vehicles)))
+    return _json(list(results))
+
+
+@app.post("/recommend")
+async def recommend(request: Request):
+    data = await _body(request)
+    args = dict(
+        daily_km     = data.get("daily_km"),
+        years        = data.get("years"),
+        body_type    = data.get("filters", {}).get("bodyType"),
+        vehicle_type = data.get("filters", {}).get("vehicle_type"),
+        country      = data.get("country", "US"),
+        grid_year    = data.get("grid_year", 2023),
+    )
+    return await _cached_json(
+        request,
+        ("recommend", json.dumps(args, sort_keys=True, default=str)),
+        recommend_version(args["country"], args["grid_year"]),
+        lambda: _offload(recommend_vehicle, **args),
+    )
+
+
+@app.post("/break-even")
+async def break_even(request: Request):
+    data      = await _body(request)
+    v_a       = data.get("vehicle_a")
+    v_b       = data.get("vehicle_b")
+    country   = data.get("country", "US")
+    grid_year = data.get("grid_year", 2023)
+
+    if not v_a or not v_b:
+        return _error("vehicle_a and vehicle_b are required", 400)
+
+    vehicle_a, vehicle_b = await _fetch_vehicles([
+        (v_a["brand"], v_a["model"], v_a["year"]),
+        (v_b["brand"], v_b["model"], v_b["year"]),
+    ])
+
+    if not vehicle_a or not vehicle_b:
+        return _error("One or both vehicles not found", 404)
+
+    return _json(await _offload(break_even_km, vehicle_a, vehicle_b, country, grid_year))
+
+
+# ─────────────────────────────────────────────────────────────────
+# GREENWASHING DETECTION
+# ─────────────────────────────────────────────────────────────────
+
+@app.post("/greenwashing")
+async def greenwashing(request: Request):
+    data         = await _body(request)
+    lifecycle    = data.get("lifecycle")
+    vehicle_meta = data.get("vehicle") or data.get("vehicle_meta") or {}
+    search_web   = bool(data.get("search_web", False))
+
+    if not lifecycle:
+        return _error("lifecycle is required", 400)
+    if not vehicle_meta:
+        return _error("vehicle is required", 400)
+
+    lc, vm = normalise_inputs(lifecycle, vehicle_meta)
+    deadline_s = parse_deadline(data.get("web_deadline_s"))
+
+    web_job = start_web_search(lc, vm) if search_web else None
+
+    try:
+        report = await _offload(
+            evaluate_claims,
+            lifecycle       = lc,
+            vehicle_meta    = vm,
+            proposed_claims = data.get("claims", []) or None,
+        )
+    except Exception as e:
+        print(f"[greenwashing] evaluate_claims error: {e}")
+        return _error(str(e), 422)
+
+    web_result = None
+    pending_id = None
+    if web_job:
+        register_base_report(web_job, report.overall_risk.value, report.transparency_score)
+        try:
+            # shield: a timeout here must not cancel the search for the follow-up poll
+            web_result = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(web_job["future"])),
+                timeout=remaining_deadline(web_job, deadline_s),
+            )
+        except asyncio.TimeoutError:
+            park_web_search(web_job)
+            pending_id = web_job["id"]
+
+    return _json(build_response(lc, vm, report, web_result, search_web, pending_id))
+
+
+@app.get("/greenwashing/web/{job_id}")
+async def greenwashing_web(job_id: str):
+    result = get_web_search(job_id)
+    if result is None:
+        return _error("Unknown or expired web_search_id", 404)
+    return result
+
+
+# ─────────────────────────────────────────────────────────────────
+# CARBON SCORE / ANNUAL IMPACT
+# ─────────────────────────────────────────────────────────────────
+
+@app.post("/carbon-score")
+async def carbon_score_route(request: Request):
+    data      = await _body(request)
+    emissions = data.get("total_g_per_km")
+    if emissions is None:
+        return _error("Missing emissions value", 400)
+    return carbon_score(emissions)
+
+
+@app.post("/annual-impact")
+async def annual_impact_route(request: Request):
+    data      = await _body(request)
+    emissions = data.get("total_g_per_km")
+    annual_km = data.get("annual_km")
+    if not emissions or not annual_km:
+        return _error("Missing parameters", 400)
+    return annual_emissions(emissions, annual_km)
+
+
+# ─────────────────────────────────────────────────────────────────
+# GRID DATA / COUNTRIES
+# ─────────────────────────────────────────────────────────────────
+
+@app.get("/grid")
+async def get_grid_data(request: Request, format: str = "nested"):
+    if format not in GRID_FORMATS:
+        return _error(f"format must be one of {', '.join(GRID_FORMATS)}", 400)
+
+    async def _build():
+        async with _db.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT country_code, year, raw_intensity, carbon_intensity_gco2_per_kwh "
+                "FROM grid_intensity ORDER BY country_code, year"
+            )
+        return build_grid(rows, format)
+
+    return await _cached_json(
+        request, ("grid", format), data_versions.current(data_versions.GRID), _build
+    )
+
+
+@app.get("/grid-data")
+async def grid_data(request: Request):
+    try:
+        entry = GRID_FILE.entry()
+    except FileNotFoundError:
+        return _error("Grid data file not found", 404)
+    except json.JSONDecodeError:
+        return _error("Invalid grid data format", 500)
+
+    status, body, headers = negotiate(
+        entry,
+        request.headers.get("if-none-match"),
+        request.headers.get("accept-encoding"),
+    )
+    return Response(body, status_code=status, headers=headers, media_type="application/json")
+
+
+@app.get("/countries")
+async def countries(request: Request):
+    return await _cached_json(
+        request, ("countries",), data_versions.current(data_versions.GRID), _countries_from_db
+    )
+
+
+async def _countries_from_db():
+    async with _db.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT DISTINCT country_code FROM grid_intensity ORDER BY country_code"
+        )
+    return [r[0] for r in rows]
+
+
+# ─────────────────────────────────────────────────────────────────
+# AI SUMMARY  (Gemini)
+# ─────────────────────────────────────────────────────────────────
+
+@app.post("/ai-summary")
+async def ai_summary(request: Request):
+    data        = await _body(request)
+    vehicles    = data.get("vehicles", [])
+    distance_km = data.get("distance_km", 100)
+    if not vehicles:
+        return _error("No vehicles provided", 400)
+
+    try:
+        summary  = await _call_gemini(build_prompt(vehicles, distance_km))
+        lookups  = list(summary_image_requests(summary, vehicles))
+        images   = await asyncio.gather(*(
+            _vehicle_image(v["brand"], v["model"], v["year"], image_query=q)
+            for v, q in lookups
+        ))
+        for (v, _), img in zip(lookups, images):
+            attach_summary_image(summary, v, img)
+        summary.setdefault("winner_image_url", None)
+        return summary
+    except Exception as e:
+        print(f"[ai_summary] ERROR: {e}")
+        return _error(str(e), 500)
+
+
+# ==================================================
+# OCR CLAIM — Screenshot → Gemini Vision → Verdict
+# ==================================================
+
+@app.post("/ocr-claim")
+async def ocr_claim(request: Request):
+    data      = await _body(request)
+    image_b64 = data.get("image_b64", "")
+    mime_type = data.get("mime_type", "image/png")
+
+    if not image_b64:
+        return _error("No image provided", 400)
+
+    gemini_key = os.getenv("GEMINI_API_KEY")
+    if not gemini_key:
+        return _error("GEMINI_API_KEY not configured", 500)
+
+    try:
+        resp = await _http.post(
+            f"{GEMINI_VISION_URL}?key={gemini_key}",
+            json=ocr_request_body(image_b64, mime_type),
+            timeout=30,
+        )
+        resp.raise_for_status()
+        return parse_ocr_response(resp.json())
+    except Exception as e:
+        print(f"[ocr-claim] ERROR: {e}")
+        return _error(str(e), 500)
+
+
+# ─────────────────────────────────────────────────────────────────
+# WALLET + IMPACT BLUEPRINTS  (Flask, via the WSGI bridge)
+# Mounted last so every native route above takes precedence. Still
+# blocking WSGI on psycopg2, and a little slower here than under app.py.
+# ─────────────────────────────────────────────────────────────────
+
+_blueprints = Flask(__name__)
+_blueprints.register_blueprint(wallet_bp)
+_blueprints.register_blueprint(impact_bp)
+metrics.init_app(_blueprints, path=None)
+query_audit.init_app(_blueprints)
 
+app.mount("/", WSGIMiddleware(_blueprints))
@@ -1,19 +1,39 @@
 import os
 import math
 import json
-import re
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 
 from database import get_db_connection
-from engine import calculate_lifecycle
-from recommendation import recommend_vehicle
+from engine import calculate_lifecycle, grid_version
+from recommendation import recommend_vehicle, cache_version as recommend_version
 from break_even import break_even_km
 from greenwashing import evaluate_claims
+from greenwashing_pipeline import (
+    start_web_search,
+    wait_for_web_search,
+    register_base_report,
+    get_web_search,
+    normalise_inputs,
+    build_response,
+    parse_deadline,
+)
 from carbon_index import carbon_score
 from annual_impact import annual_emissions
-from ai_summary import generate_summary, get_vehicle_image
+from ai_summary import (
+    generate_summary,
+    get_vehicle_image,
+    GEMINI_VISION_URL,
+    ocr_request_body,
+    parse_ocr_response,
+)
+from grid_format import build_grid, FORMATS as GRID_FORMATS
+from http_cache import get_or_build, lookup, store, negotiate, WatchedJSONFile
+import data_access
+import data_versions
+import metrics
+import query_audit
 from wallet_routes import wallet_bp
 from impact_routes import impact_bp          # ← ADD THIS
 
@@ -21,38 +41,41 @@ app = Flask(__name__)
 CORS(app)
 app.register_blueprint(wallet_bp)
 app.register_blueprint(impact_bp)            # ← ADD THIS
+metrics.init_app(app)                        # request timing + GET /metrics
+query_audit.init_app(app)                    # slow-query / N+1 report
+
+MAX_PAGE_LIMIT = 500                         # /vehicles rows per page
+
+
+@app.before_request
+def _open_data_scope():
+    # identical vehicle / image / grid lookups within one request hit the DB once
+    g.data_access_token = data_access.begin_request()
+
+
+@app.teardown_request
+def _close_data_scope(exc):
+    token = g.pop("data_access_token", None)
+    if token is not None:
+        data_access.end_request(token)
 
 
 # ─────────────────────────────────────────────────────────────────
 # HELPERS
 # ─────────────────────────────────────────────────────────────────
 
-RISK_ORDER = ["SAFE", "CAUTION", "WARNING", "VIOLATION"]
+def _cached_json(key, version, build):
+    """Serve build()'s payload with ETag / 304 / precompressed bodies."""
+    return _respond(get_or_build(key, version, build))
 
-def _worst_risk(risks):
-    ranked = [r for r in risks if r in RISK_ORDER]
-    return max(ranked, key=lambda r: RISK_ORDER.index(r)) if ranked else "SAFE"
 
-def _get(d, *keys, default=0.0):
-    for k in keys:
-        if k in d and d[k] is not None:
-            try:
-                return float(d[k])
-            except (TypeError, ValueError):
-                pass
-    return float(default)
-
-def _fetch_vehicle(cur, brand, model, year):
-    cur.execute(
-        "SELECT * FROM vehicles WHERE brand=%s AND model=%s AND year=%s LIMIT 1",
-        (brand, model, year),
+def _respond(entry):
+    status, body, headers = negotiate(
+        entry,
+        request.headers.get("If-None-Match"),
+        request.headers.get("Accept-Encoding"),
     )
-    row = cur.fetchone()
-    if not row:
-        return None
-    columns = [desc[0] for desc in cur.description]
-    return dict(zip(columns, row))
-
+    return Response(body, status=status, headers=headers, mimetype="application/json")
 
 # ─────────────────────────────────────────────────────────────────
 # HEALTH CHECK
@@ -69,10 +92,22 @@ def home():
 
 @app.route("/vehicles")
 def get_vehicles():
-    page         = int(request.args.get("page", 1))
-    limit        = int(request.args.get("limit", 200))
+    try:
+        page  = max(1, int(request.args.get("page", 1)))
+        limit = max(1, min(int(request.args.get("limit", 200)), MAX_PAGE_LIMIT))
+    except ValueError:
+        return jsonify({"error": "page and limit must be integers"}), 400
     vehicle_type = request.args.get("vehicle_type", "")
-    offset       = (page - 1) * limit
+
+    return _cached_json(
+        ("vehicles", page, limit, vehicle_type),
+        data_versions.current(data_versions.VEHICLES),
+        lambda: _vehicles_page(page, limit, vehicle_type),
+    )
+
+
+def _vehicles_page(page, limit, vehicle_type):
+    offset = (page - 1) * limit
 
     conn = get_db_connection()
     cur  = conn.cursor()
@@ -110,7 +145,7 @@ def get_vehicles():
     cur.close()
     conn.close()
 
-    return jsonify({
+    return {
         "vehicles": [
             {"brand": r[0], "model": r[1], "year": r[2], "vehicle_type": r[3]}
             for r in rows
@@ -118,7 +153,7 @@ def get_vehicles():
         "total": total,
         "page":  page,
         "pages": math.ceil(total / limit),
-    })
+    }
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -162,12 +197,7 @@ def vehicle_detail():
     if not all([brand, model, year]):
         return jsonify({"error": "brand, model, year required"}), 400
 
-    conn    = get_db_connection()
-    cur     = conn.cursor()
-    vehicle = _fetch_vehicle(cur, brand, model, year)
-    cur.close()
-    conn.close()
-
+    vehicle = data_access.vehicle(brand, model, year)
     if not vehicle:
         return jsonify({"error": "Vehicle not found"}), 404
     return jsonify(vehicle)
@@ -187,29 +217,7 @@ def winner_detail():
     if not brand or not model:
         return jsonify({"image_url": None, "specs": None}), 200
 
-    conn = get_db_connection()
-    cur  = conn.cursor()
-
-    cur.execute(
-        "SELECT image_url, manufacturer_url FROM afdc_vehicles "
-        "WHERE LOWER(brand)=LOWER(%s) AND LOWER(model) LIKE LOWER(%s) "
-        "AND year=%s AND image_url IS NOT NULL AND image_url != 'NaN' LIMIT 1",
-        (brand, f"%{model}%", year),
-    )
-    row = cur.fetchone()
-
-    if not row:
-        cur.execute(
-            "SELECT image_url, manufacturer_url FROM afdc_vehicles "
-            "WHERE LOWER(brand)=LOWER(%s) AND LOWER(model) LIKE LOWER(%s) "
-            "AND image_url IS NOT NULL AND image_url != 'NaN' "
-            "ORDER BY ABS(year - %s) LIMIT 1",
-            (brand, f"%{model}%", year),
-        )
-        row = cur.fetchone()
-
-    cur.close()
-    conn.close()
+    row = data_access.vehicle_image(brand, model, year)
 
     manufacturer_url = None
     if row:
@@ -239,16 +247,17 @@ def lifecycle():
     if not all([brand, model, year, country]):
         return jsonify({"error": "Missing parameters"}), 400
 
-    conn    = get_db_connection()
-    cur     = conn.cursor()
-    vehicle = _fetch_vehicle(cur, brand, model, year)
-    cur.close()
-    conn.close()
-
-    if not vehicle:
-        return jsonify({"error": "Vehicle not found"}), 404
+    # cached until this country's grid rows or the catalogue change
+    key     = ("lifecycle", json.dumps([brand, model, year, country, grid_year], default=str))
+    version = (grid_version(country), data_versions.current(data_versions.VEHICLES))
+    entry   = lookup(key, version)
+    if entry is None:
+        vehicle = data_access.vehicle(brand, model, year)
+        if not vehicle:
+            return jsonify({"error": "Vehicle not found"}), 404
+        entry = store(key, version, calculate_lifecycle(vehicle, country, grid_year))
 
-    return jsonify(calculate_lifecycle(vehicle, country, grid_year))
+    return _respond(entry)
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -266,12 +275,10 @@ def compare_multiple():
     if not vehicles_input:
         return jsonify({"error": "vehicles required"}), 400
 
-    conn    = get_db_connection()
-    cur     = conn.cursor()
+    found   = data_access.vehicles([(v["brand"], v["model"], v["year"]) for v in vehicles_input])
     results = []
 
-    for v in vehicles_input:
-        vehicle = _fetch_vehicle(cur, v["brand"], v["model"], v["year"])
+    for v, vehicle in zip(vehicles_input, found):
         if not vehicle:
             results.append({
                 "brand": v["brand"], "model": v["model"], "year": v["year"],
@@ -286,8 +293,6 @@ def compare_multiple():
             **lc,
         })
 
-    cur.close()
-    conn.close()
     return jsonify(results)
 
 
@@ -298,14 +303,19 @@ def compare_multiple():
 @app.route("/recommend", methods=["POST"])
 def recommend():
     data = request.json or {}
-    return jsonify(recommend_vehicle(
+    args = dict(
         daily_km     = data.get("daily_km"),
         years        = data.get("years"),
         body_type    = data.get("filters", {}).get("bodyType"),
         vehicle_type = data.get("filters", {}).get("vehicle_type"),
         country      = data.get("country", "US"),
         grid_year    = data.get("grid_year", 2023),
-    ))
+    )
+    return _cached_json(
+        ("recommend", json.dumps(args, sort_keys=True, default=str)),
+        recommend_version(args["country"], args["grid_year"]),
+        lambda: recommend_vehicle(**args),
+    )
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -323,12 +333,10 @@ def break_even():
     if not v_a or not v_b:
         return jsonify({"error": "vehicle_a and vehicle_b are required"}), 400
 
-    conn      = get_db_connection()
-    cur       = conn.cursor()
-    vehicle_a = _fetch_vehicle(cur, v_a["brand"], v_a["model"], v_a["year"])
-    vehicle_b = _fetch_vehicle(cur, v_b["brand"], v_b["model"], v_b["year"])
-    cur.close()
-    conn.close()
+    vehicle_a, vehicle_b = data_access.vehicles([
+        (v_a["brand"], v_a["model"], v_a["year"]),
+        (v_b["brand"], v_b["model"], v_b["year"]),
+    ])
 
     if not vehicle_a or not vehicle_b:
         return jsonify({"error": "One or both vehicles not found"}), 404
@@ -352,57 +360,13 @@ def greenwashing():
     if not vehicle_meta:
         return jsonify({"error": "vehicle is required"}), 400
 
-    lc = {
-        "total_g_per_km":         _get(lifecycle, "total_g_per_km"),
-        "operational_g_per_km":   _get(lifecycle, "operational_g_per_km"),
-        "manufacturing_g_per_km": _get(lifecycle, "manufacturing_g_per_km"),
-        "manufacturing_total_kg": _get(lifecycle, "manufacturing_total_kg"),
-        "recycling_kg":           _get(lifecycle, "recycling_kg", default=0.0),
-    }
+    lc, vm = normalise_inputs(lifecycle, vehicle_meta)
 
-    TYPE_MAP = {
-        "BEV": "EV",  "ELECTRIC": "EV",      "BATTERY": "EV",
-        "HYBRID": "HEV", "MILD_HYBRID": "HEV", "MHEV": "HEV",
-        "PLUGIN": "PHEV", "PLUGIN_HYBRID": "PHEV", "PLUG_IN": "PHEV",
-        "GASOLINE": "ICE", "PETROL": "ICE",   "DIESEL": "ICE",
-        "GAS": "ICE",  "CONVENTIONAL": "ICE",
-    }
-    raw_type = (
-        vehicle_meta.get("vehicle_type") or
-        vehicle_meta.get("type") or
-        vehicle_meta.get("fuel_type") or "ICE"
-    ).upper().strip()
-    vtype = TYPE_MAP.get(raw_type, raw_type)
-    if vtype not in ("EV", "HEV", "PHEV", "ICE"):
-        vtype = "ICE"
-
-    vm = {
-        "brand":        str(vehicle_meta.get("brand") or "Unknown"),
-        "model":        str(vehicle_meta.get("model") or "Unknown"),
-        "year":         vehicle_meta.get("year"),
-        "vehicle_type": vtype,
-        "electric":     vtype in ("EV", "PHEV"),
-    }
+    proposed_claims = data.get("claims", [])
+    deadline_s      = parse_deadline(data.get("web_deadline_s"))
 
-    proposed_claims  = data.get("claims", [])
-    web_claims_raw   = []
-    web_search_error = None
-
-    if search_web:
-        try:
-            from greenwashing import search_marketing_claims
-            web_claims_raw = search_marketing_claims(
-                brand                = vm["brand"],
-                model                = vm["model"],
-                year                 = vm.get("year"),
-                actual_total         = lc["total_g_per_km"],
-                actual_operational   = lc["operational_g_per_km"],
-                actual_manufacturing = lc["manufacturing_g_per_km"],
-                vehicle_type         = vm["vehicle_type"],
-            )
-        except Exception as e:
-            print(f"[greenwashing] web_search error: {e}")
-            web_search_error = str(e)
+    # Kick off the slow web search first so it overlaps the rule engine.
+    web_job = start_web_search(lc, vm) if search_web else None
 
     try:
         report = evaluate_claims(
@@ -414,71 +378,23 @@ def greenwashing():
         print(f"[greenwashing] evaluate_claims error: {e}")
         return jsonify({"error": str(e)}), 422
 
-    web_findings = []
-    if web_claims_raw:
-        try:
-            web_report = evaluate_claims(
-                lifecycle       = lc,
-                vehicle_meta    = vm,
-                proposed_claims = [c["claim_text"] for c in web_claims_raw],
-            )
-            for finding, meta in zip(web_report.findings, web_claims_raw):
-                web_findings.append({
-                    "claim":           finding.claim,
-                    "risk_level":      finding.risk_level.value,
-                    "reason":          finding.reason,
-                    "suggestion":      finding.suggestion,
-                    "is_aspirational": finding.is_aspirational,
-                    "is_unverified":   finding.is_unverified,
-                    "source":          meta["source"],
-                    "source_url":      meta["source_url"],
-                    "claim_type":      meta["claim_type"],
-                    "context":         meta["context"],
-                })
-        except Exception as e:
-            web_search_error = (web_search_error or "") + f" | Rule engine: {e}"
-
-    all_risks  = [report.overall_risk.value] + [w["risk_level"] for w in web_findings]
-    worst_risk = _worst_risk(all_risks)
-    web_penalty = sum(
-        25 if w["risk_level"] == "VIOLATION"
-        else 15 if w["risk_level"] == "WARNING"
-        else 5
-        for w in web_findings
-        if w["risk_level"] not in ("SAFE",)
-        and not w.get("is_aspirational")
-        and not w.get("is_unverified")
-    )
-    combined_score = max(10, report.transparency_score - web_penalty)
+    web_result = None
+    pending_id = None
+    if web_job:
+        register_base_report(web_job, report.overall_risk.value, report.transparency_score)
+        web_result = wait_for_web_search(web_job, deadline_s)
+        if web_result is None:
+            pending_id = web_job["id"]
+
+    return jsonify(build_response(lc, vm, report, web_result, search_web, pending_id))
 
-    return jsonify({
-        "brand":                  vm["brand"],
-        "model":                  vm["model"],
-        "vehicle_type":           vm["vehicle_type"],
-        "total_g_per_km":         lc["total_g_per_km"],
-        "operational_g_per_km":   lc["operational_g_per_km"],
-        "manufacturing_g_per_km": lc["manufacturing_g_per_km"],
-        "manufacturing_total_kg": lc["manufacturing_total_kg"],
-        "recycling_kg":           lc["recycling_kg"],
-        "overall_risk":           worst_risk,
-        "transparency_score":     combined_score,
-        "structural_flags":       report.structural_flags,
-        "misleading_claims":      report.misleading_claims,
-        "findings": [
-            {
-                "claim":           f.claim,
-                "risk_level":      f.risk_level.value,
-                "reason":          f.reason,
-                "suggestion":      f.suggestion,
-                "is_aspirational": f.is_aspirational,
-                "is_unverified":   f.is_unverified,
-            }
-            for f in report.findings
-        ],
-        "web_findings":     web_findings,
-        "web_search_error": web_search_error,
-        "web_search_ran":   search_web,
-    })
+
+@app.route("/greenwashing/web/<job_id>")
+def greenwashing_web(job_id):
+    result = get_web_search(job_id)
+    if result is None:
+        return jsonify({"error": "Unknown or expired web_search_id"}), 404
+    return jsonify(result)
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -514,6 +430,17 @@ def annual_impact_route():
 
 @app.route("/grid")
 def get_grid_data():
+    fmt = request.args.get("format", "nested")
+    if fmt not in GRID_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(GRID_FORMATS)}"}), 400
+    return _cached_json(
+        ("grid", fmt),
+        data_versions.current(data_versions.GRID),
+        lambda: build_grid(_grid_rows(), fmt),
+    )
+
+
+def _grid_rows():
     conn = get_db_connection()
     cur  = conn.cursor()
     cur.execute(
@@ -523,26 +450,30 @@ def get_grid_data():
     rows = cur.fetchall()
     cur.close()
     conn.close()
+    return rows
 
-    grid = {}
-    for country, year, raw, corrected in rows:
-        grid.setdefault(country, {})[str(year)] = {"raw": raw, "corrected": corrected}
-    return jsonify(grid)
+
+GRID_FILE = WatchedJSONFile(os.path.join(
+    os.path.dirname(__file__), "..", "data", "grid_master_v2_2026_clean.json"
+))
 
 
 @app.route("/grid-data")
 def grid_data():
-    grid_file = os.path.join(
-        os.path.dirname(__file__), "..", "data", "grid_master_v2_2026_clean.json"
-    )
     try:
-        with open(grid_file) as f:
-            return jsonify(json.load(f))
+        entry = GRID_FILE.entry()
     except FileNotFoundError:
         return jsonify({"error": "Grid data file not found"}), 404
     except json.JSONDecodeError:
         return jsonify({"error": "Invalid grid data format"}), 500
 
+    status, body, headers = negotiate(
+        entry,
+        request.headers.get("If-None-Match"),
+        request.headers.get("Accept-Encoding"),
+    )
+    return Response(body, status=status, headers=headers, mimetype="application/json")
+
 
 # ─────────────────────────────────────────────────────────────────
 # COUNTRIES
@@ -550,13 +481,17 @@ def grid_data():
 
 @app.route("/countries")
 def countries():
+    return _cached_json(("countries",), data_versions.current(data_versions.GRID), _countries_from_db)
+
+
+def _countries_from_db():
     conn = get_db_connection()
     cur  = conn.cursor()
     cur.execute("SELECT DISTINCT country_code FROM grid_intensity ORDER BY country_code")
     result = [row[0] for row in cur.fetchall()]
     cur.close()
     conn.close()
-    return jsonify(result)
+    return result
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -596,62 +531,14 @@ def ocr_claim():
     if not gemini_key:
         return jsonify({"error": "GEMINI_API_KEY not configured"}), 500
 
-    payload = {
-        "contents": [{
-            "parts": [
-                {"inline_data": {"mime_type": mime_type, "data": image_b64}},
-                {"text": _OCR_PROMPT},
-            ]
-        }],
-        "generationConfig": {"temperature": 0.1, "maxOutputTokens": 1000},
-    }
-
     try:
         resp = req_lib.post(
-            f"{_GEMINI_VISION_URL}?key={gemini_key}",
-            json=payload,
+            f"{GEMINI_VISION_URL}?key={gemini_key}",
+            json=ocr_request_body(image_b64, mime_type),
             timeout=30,
         )
         resp.raise_for_status()
-        raw = resp.json()
-
-        text = "".join(
-            p.get("text", "")
-            for p in raw.get("candidates", [{}])[0]
-                        .get("content", {})
-                        .get("parts", [])
-        ).strip()
-
-        print(f"[ocr-claim] Gemini raw: {text}")
-
-        text = text.replace("```json", "").replace("```", "").strip()
-
-        try:
-            return jsonify(json.loads(text))
-        except json.JSONDecodeError:
-            pass
-
-        match = re.search(r"\{[\s\S]*\}", text)
-        if match:
-            fragment = match.group(0)
-            if fragment.count("{") > fragment.count("}"):
-                fragment += "}"
-            if fragment.count('"') % 2 == 1:
-                fragment += '"'
-            try:
-                return jsonify(json.loads(fragment))
-            except json.JSONDecodeError:
-                pass
-
-        print("[ocr-claim] JSON recovery failed")
-        return jsonify({
-            "found":       False,
-            "claim_text":  "",
-            "risk_level":  None,
-            "verdict":     "Unable to analyse screenshot",
-            "explanation": "The AI response was malformed or truncated.",
-            "suggestion":  None,
-        })
+        return jsonify(parse_ocr_response(resp.json()))
 
     except Exception as e:
         print(f"[ocr-claim] ERROR: {e}")
@@ -8,25 +8,50 @@ Register this blueprint in app.py:
 
 Requires:
     pip install flask bcrypt
+
+Password hashing runs in a bounded process pool (password_hashing.py);
+signup/login answer 429 when it is saturated.
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from database import get_db_connection
 from carbon_wallet import create_wallet
-import bcrypt
+from password_hashing import (
+    hash_password,
+    check_password,
+    HashPoolSaturated,
+    TIMINGS,
+    metrics as hash_metrics,
+)
 from datetime import datetime
+import time
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 
 # ── helpers ────────────────────────────────────────────────────────────────
 
-def _hash_password(plain: str) -> str:
-    return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+def _busy():
+    """429 when the hashing pool is saturated or a hash timed out; clients should back off."""
+    resp = jsonify({"error": "Too many sign-in attempts right now — please retry shortly"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 429
+
+
+@auth_bp.before_request
+def _start_timer():
+    g.auth_t0   = time.perf_counter()
+    g.hash_ms   = 0.0
 
 
-def _check_password(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
+@auth_bp.after_request
+def _record_timing(response):
+    if request.endpoint == "auth.auth_metrics":
+        return response
+    total_ms = (time.perf_counter() - g.auth_t0) * 1000
+    TIMINGS["request"].add(total_ms)
+    response.headers["Server-Timing"] = f"hash;dur={g.hash_ms:.1f}, total;dur={total_ms:.1f}"
+    return response
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -47,7 +72,10 @@ def signup():
     if len(password) < 6:
         return jsonify({"error": "Password must be at least 6 characters"}), 400
 
-    password_hash = _hash_password(password)
+    try:
+        password_hash, g.hash_ms = hash_password(password)
+    except HashPoolSaturated:
+        return _busy()
 
     conn = get_db_connection()
     cur  = conn.cursor()
@@ -113,8 +141,14 @@ def login():
         cur.close()
         conn.close()
 
+    if row:
+        try:
+            matches, g.hash_ms = check_password(password, row[3])
+        except HashPoolSaturated:
+            return _busy()
+
     # Use a generic message to prevent user enumeration
-    if not row or not _check_password(password, row[3]):
+    if not row or not matches:
         return jsonify({"error": "Invalid email or password"}), 401
 
     return jsonify({
@@ -152,3 +186,12 @@ def get_user(user_id):
         "email":      row[2],
         "created_at": row[3].isoformat() if row[3] else None,
     })
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# GET /auth/metrics  — hashing pool load and latency (hash vs whole request)
+# ══════════════════════════════════════════════════════════════════════════════
+
+@auth_bp.route("/metrics", methods=["GET"])
+def auth_metrics():
+    return jsonify(hash_metrics())
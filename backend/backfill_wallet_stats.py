@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+backfill_wallet_stats.py  —  Rebuild the travel_stats_* rollups from travel_log
+===============================================================================
+travel_stats_daily / _weekly / _monthly are maintained incrementally by
+every wallet spend (carbon_wallet.ROLLUPS).
+Run this once after creating the table on an existing database, or any time
+the aggregates are suspected to have drifted:
+
+    python backfill_wallet_stats.py              # every user
+    python backfill_wallet_stats.py --user 42    # one user
+
+travel_log and wallet_ledger are locked against writes (SHARE mode) for
+the duration, so concurrent trips and ledger compaction wait instead of
+being counted twice or missed. Trips still pending in wallet_ledger are
+left out; compaction adds them.
+"""
+
+import argparse
+import time
+
+from database import get_db_connection
+from carbon_wallet import ROLLUPS
+
+
+def backfill(user_id: int | None = None) -> dict:
+    """Recompute every rollup from travel_log; returns rows written per table."""
+    scope, params = ("WHERE user_id = %s", (user_id,)) if user_id else ("", ())
+
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        cur.execute("LOCK TABLE travel_log, wallet_ledger IN SHARE MODE")
+        written = {}
+        for table, keys, exprs, _ in ROLLUPS.values():
+            # key expressions are written against the `l` alias
+            cur.execute(f"DELETE FROM {table} {scope}", params)
+            cur.execute(f"""
+                INSERT INTO {table}
+                    (user_id, {', '.join(keys)}, trips, total_km, total_emissions_kg)
+                SELECT
+                    l.user_id,
+                    {', '.join(exprs)},
+                    COUNT(*),
+                    COALESCE(SUM(l.distance_km), 0),
+                    COALESCE(SUM(l.emissions_kg), 0)
+                FROM travel_log l
+                WHERE NOT EXISTS (SELECT 1 FROM wallet_ledger p WHERE p.log_id = l.id)
+                {scope.replace("WHERE user_id", "AND l.user_id")}
+                GROUP BY {', '.join(str(i) for i in range(1, len(keys) + 2))}
+            """, params)
+            written[table] = cur.rowcount
+        conn.commit()
+        return written
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the travel_stats_* rollups from travel_log")
+    parser.add_argument("--user", type=int, help="only rebuild this user_id")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    written = backfill(args.user)
+    for table, n in written.items():
+        print(f"✅ {table}: {n} rows rebuilt")
+    print(f"done in {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,49 @@
+"""
+_stats.py  —  Latency summaries shared by the benchmark scripts
+================================================================
+    from _stats import latency_summary, run_threaded
+
+    latencies, elapsed = run_threaded(lambda: log_trip(...), 2000, concurrency=8)
+    {"trips": 2000, "elapsed_s": elapsed, **latency_summary(latencies)}
+
+Percentiles are nearest-rank over the sorted sample, which is what every
+script here reported before this module existed, so old and new results
+compare directly.
+"""
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(sorted_vals, pct):
+    """Nearest-rank percentile of an already sorted list; 0.0 when it is empty."""
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, int(round(pct / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+
+def latency_summary(latencies_ms, digits: int = 2) -> dict:
+    """mean / p50 / p95 / p99 / max of latencies in ms (any order)."""
+    lat = sorted(latencies_ms)
+    return {
+        "mean_ms": round(statistics.fmean(lat), digits) if lat else 0.0,
+        "p50_ms":  round(percentile(lat, 50), digits),
+        "p95_ms":  round(percentile(lat, 95), digits),
+        "p99_ms":  round(percentile(lat, 99), digits),
+        "max_ms":  round(lat[-1], digits) if lat else 0.0,
+    }
+
+
+def run_threaded(call, count: int, concurrency: int) -> tuple[list[float], float]:
+    """Run call() `count` times on `concurrency` threads → (latencies in ms, elapsed s)."""
+    def one(_):
+        t0 = time.perf_counter()
+        call()
+        return (time.perf_counter() - t0) * 1000
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(count)))
+    return latencies, time.perf_counter() - t_start
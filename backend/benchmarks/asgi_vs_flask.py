@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+asgi_vs_flask.py  —  Concurrent-request throughput: Flask app vs async api.py
+=============================================================================
+Fires the same request mix at both servers with a fixed number of in-flight
+requests and prints requests/second plus p50 / p95 / p99 latency.
+
+Start both servers against the same database first:
+
+    cd backend
+    python app.py                                   # Flask  → :5000
+    uvicorn api:app --port 8000 --workers 1         # ASGI   → :8000
+
+then:
+
+    python benchmarks/asgi_vs_flask.py --concurrency 64 --requests 2000
+
+Use --route to benchmark a single route, e.g. a slow outbound one:
+
+    python benchmarks/asgi_vs_flask.py --route "POST /winner-detail" \\
+        --body '{"brand": "Tesla", "model": "Model 3", "year": 2023}'
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from _stats import latency_summary
+
+# Mix roughly matching a Compare / Explorer page load.
+DEFAULT_MIX = [
+    ("GET",  "/vehicles?page=1&limit=50", None),
+    ("GET",  "/vehicle-search?q=tesla",   None),
+    ("GET",  "/countries",                None),
+    ("POST", "/carbon-score",             {"total_g_per_km": 120}),
+    ("POST", "/lifecycle", {
+        "brand": "Tesla", "model": "Model 3", "vehicle_year": 2023,
+        "country": "US", "grid_year": 2023,
+    }),
+]
+
+
+async def _run(base_url, mix, total, concurrency, timeout):
+    latencies = []
+    errors    = 0
+    counter   = iter(range(total))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                method, path, body = mix[i % len(mix)]
+                t0 = time.perf_counter()
+                try:
+                    r = await client.request(method, path, json=body)
+                    if r.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t_start
+
+    return {
+        "requests":   total,
+        "errors":     errors,
+        "elapsed_s":  round(elapsed, 3),
+        "rps":        round(total / elapsed, 1) if elapsed else 0.0,
+        **latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--flask-url",   default="http://127.0.0.1:5000")
+    parser.add_argument("--asgi-url",    default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests",    type=int, default=1000)
+    parser.add_argument("--timeout",     type=float, default=60.0)
+    parser.add_argument("--route",  help='single route instead of the mix, e.g. "GET /countries"')
+    parser.add_argument("--body",   help="JSON body for --route")
+    parser.add_argument("--json",   action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    if args.route:
+        method, path = args.route.split(maxsplit=1)
+        mix = [(method.upper(), path, json.loads(args.body) if args.body else None)]
+    else:
+        mix = DEFAULT_MIX
+
+    results = {}
+    for name, url in (("flask", args.flask_url), ("asgi", args.asgi_url)):
+        # short warm-up so connection setup / caches don't skew the first server
+        asyncio.run(_run(url, mix, min(50, args.requests), min(8, args.concurrency), args.timeout))
+        results[name] = asyncio.run(_run(url, mix, args.requests, args.concurrency, args.timeout))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'server':<8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:<8}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}")
+    if results["flask"]["rps"]:
+        print(f"\nspeed-up: {results['asgi']['rps'] / results['flask']['rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+engine_suite.py  —  CPU benchmarks for the engine, recommender, rules and forecasting
+=====================================================================================
+Runs against fake_data (a seeded snapshot bundle, no database), so the numbers
+measure our own code, not Postgres. Every benchmark runs a warm-up and then
+`--rounds` timed rounds. Each round calls the operation enough times to last
+at least --min-round-s. Results go to JSON and can be compared with an earlier
+run:
+
+    cd backend
+    python benchmarks/engine_suite.py --out bench_base.json
+    ... change something ...
+    python benchmarks/engine_suite.py --compare bench_base.json
+    python benchmarks/engine_suite.py --only lifecycle,recommend --rounds 10
+
+Benchmarks:
+    lifecycle             engine.calculate_lifecycle, 200 vehicle/country pairs
+    recommend             recommendation.recommend_vehicle (snapshot / NumPy path)
+    break_even            break_even.break_even_km, BEV vs ICE pairs
+    evaluate_claims       greenwashing.evaluate_claims, one vehicle, 5 claims
+    batch_evaluate        greenwashing.batch_evaluate, 50 vehicles
+    extract_claims        ClaimScraper._extract_claims on 40 search snippets
+    forecast_country      forecast.forecast_country, one 24-year series
+    forecast_all_cold     forecast.forecast_all, 15 countries, cache cleared
+    forecast_all_warm     forecast.forecast_all, served from its cache
+    wallet_rate           the in-process half of the wallet spend path:
+                          wallet_rates.grid_g_per_kwh + rate_for (the SQL
+                          half is benchmarks/wallet_trip_logging.py)
+
+Per-call times are reported in microseconds: min, median, mean and stdev
+over rounds. Compare runs on the same machine; use min/median, not mean.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_data                                             # noqa: E402
+
+# ── Constants ──────────────────────────────────────────────────────────────
+SEED        = 42
+VEHICLES    = 2000
+ROUNDS      = 7
+WARMUP_S    = 0.2
+MIN_ROUND_S = 0.1
+SCHEMA      = 1
+
+CLAIMS = [
+    "transition to a zero-emissions future",
+    "Our first all-electric model",
+    "zero-emissions engineering",
+    "commitment to achieving carbon neutrality",
+    "offering high-performance thrills with zero emissions",
+]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BENCHMARKS  — each takes (rng, data) and returns a zero-argument callable
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _quiet(fn):
+    """Swallow the print() output some engine paths produce, so it isn't timed as terminal I/O."""
+    sink = io.StringIO()
+
+    def run():
+        sink.seek(0)
+        sink.truncate()
+        with contextlib.redirect_stdout(sink):
+            return fn()
+    return run
+
+
+def _cycle(items):
+    state = {"i": 0}
+
+    def nxt():
+        state["i"] = (state["i"] + 1) % len(items)
+        return items[state["i"]]
+    return nxt
+
+
+def _vehicles(data, types=None):
+    cols, rows = data["vehicles"]
+    out = [dict(zip(cols, r)) for r in rows]
+    return [v for v in out if types is None or v["vehicle_type"] in types]
+
+
+def bench_lifecycle(rng, data):
+    from engine import calculate_lifecycle
+    countries = list(fake_data.COUNTRIES)
+    pairs = [(v, rng.choice(countries), rng.choice([2020, 2023]))
+             for v in rng.sample(_vehicles(data), 200)]
+    nxt = _cycle(pairs)
+    return lambda: calculate_lifecycle(*nxt())
+
+
+def bench_recommend(rng, data):
+    from recommendation import recommend_vehicle
+    cases = [dict(daily_km=rng.choice([15, 40, 80]), years=rng.choice([5, 10, 15]),
+                  country=rng.choice(["US", "DE", "FR", "IN"]), grid_year=2023,
+                  vehicle_type=rng.choice([None, "BEV", "ICE"]))
+             for _ in range(20)]
+    nxt = _cycle(cases)
+    return _quiet(lambda: recommend_vehicle(**nxt()))
+
+
+def bench_break_even(rng, data):
+    from break_even import break_even_km
+    bevs, ices = _vehicles(data, {"BEV"}), _vehicles(data, {"ICE"})
+    pairs = [(rng.choice(bevs), rng.choice(ices), rng.choice(["DEU", "USA", "FRA"]), 2023)
+             for _ in range(50)]
+    nxt = _cycle(pairs)
+    return _quiet(lambda: break_even_km(*nxt()))
+
+
+def _claim_cases(rng, data, n):
+    """(lifecycle, vehicle_meta, claims) as /greenwashing passes them to the rule engine."""
+    from engine import calculate_lifecycle
+    from greenwashing_pipeline import normalise_inputs
+    cases = []
+    for v in rng.sample(_vehicles(data), n):
+        lc = calculate_lifecycle(v, "DEU", 2023)
+        if "error" in lc:
+            continue
+        cases.append((*normalise_inputs(lc, v), rng.sample(CLAIMS, 3)))
+    return cases
+
+
+def bench_evaluate_claims(rng, data):
+    from greenwashing import evaluate_claims
+    lc, meta, _ = _claim_cases(rng, data, 5)[0]
+    return lambda: evaluate_claims(lc, meta, CLAIMS)
+
+
+def bench_batch_evaluate(rng, data):
+    from greenwashing import batch_evaluate
+    cases = _claim_cases(rng, data, 50)
+    return lambda: batch_evaluate(cases)
+
+
+def bench_extract_claims(rng, data):
+    from claim_scraper import ClaimScraper, CLAIM_VOCABULARY
+    terms = [t for ts in CLAIM_VOCABULARY.values() for t in ts]
+    filler = ["The new model arrives next spring", "Prices start at 39,000 euros",
+              "Range is quoted at 510 km on the WLTP cycle", "Deliveries begin in March"]
+    results = []
+    for i in range(40):
+        sentences = [rng.choice(filler) for _ in range(3)]
+        sentences.insert(rng.randrange(4), f"It is a {rng.choice(terms)} car for everyday driving")
+        results.append({"url": f"https://example.com/{i}", "snippet": ". ".join(sentences) + "."})
+    scraper = ClaimScraper(backend=None, request_delay_s=0)
+    return lambda: scraper._extract_claims(results)
+
+
+def bench_forecast_country(rng, data):
+    from forecast import forecast_country
+    series = fake_data.grid_data(data)["DEU"]
+    years  = sorted(int(y) for y in series)
+    values = [series[str(y)]["corrected"] for y in years]
+    return lambda: forecast_country(years, values)
+
+
+def bench_forecast_all_cold(rng, data):
+    import forecast
+    grid = fake_data.grid_data(data)
+
+    def run():
+        forecast._forecasts.clear()
+        return forecast.forecast_all(grid)
+    return run
+
+
+def bench_forecast_all_warm(rng, data):
+    import forecast
+    grid = fake_data.grid_data(data)
+    forecast.forecast_all(grid)
+    return lambda: forecast.forecast_all(grid)
+
+
+def bench_wallet_rate(rng, data):
+    import wallet_rates
+    vehicles  = rng.sample(_vehicles(data), 200)
+    countries = ["DE", "US", "FR", "GB", None]
+    trips = [(rng.choice(vehicles), rng.choice(countries)) for _ in range(500)]
+    nxt  = _cycle(trips)
+    year = datetime.now(timezone.utc).year
+
+    def run():
+        vehicle, country = nxt()
+        wallet_rates.grid_g_per_kwh(country, year)
+        return wallet_rates.rate_for(vehicle, country, year)
+    return run
+
+
+BENCHMARKS = {
+    "lifecycle":         bench_lifecycle,
+    "recommend":         bench_recommend,
+    "break_even":        bench_break_even,
+    "evaluate_claims":   bench_evaluate_claims,
+    "batch_evaluate":    bench_batch_evaluate,
+    "extract_claims":    bench_extract_claims,
+    "forecast_country":  bench_forecast_country,
+    "forecast_all_cold": bench_forecast_all_cold,
+    "forecast_all_warm": bench_forecast_all_warm,
+    "wallet_rate":       bench_wallet_rate,
+}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# RUNNER
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _calls_per_round(fn, min_round_s):
+    """Like timeit.autorange: the smallest 1/2/5×10^k call count that lasts min_round_s."""
+    number = 1
+    while True:
+        for factor in (1, 2, 5):
+            n  = number * factor
+            t0 = time.perf_counter()
+            for _ in range(n):
+                fn()
+            if time.perf_counter() - t0 >= min_round_s:
+                return n
+        number *= 10
+
+
+def measure(fn, rounds=ROUNDS, warmup_s=WARMUP_S, min_round_s=MIN_ROUND_S) -> dict:
+    deadline = time.perf_counter() + warmup_s
+    while time.perf_counter() < deadline:
+        fn()
+
+    number = _calls_per_round(fn, min_round_s)
+    per_call = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - t0) / number * 1e6)
+
+    return {
+        "calls_per_round": number,
+        "rounds":          rounds,
+        "min_us":          round(min(per_call), 3),
+        "median_us":       round(statistics.median(per_call), 3),
+        "mean_us":         round(statistics.fmean(per_call), 3),
+        "stdev_us":        round(statistics.stdev(per_call), 3) if rounds > 1 else 0.0,
+        "ops_per_s":       round(1e6 / statistics.median(per_call), 1),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, seed=SEED, vehicles=VEHICLES, rounds=ROUNDS, warmup_s=WARMUP_S,
+        min_round_s=MIN_ROUND_S) -> dict:
+    # GPR fits on short series warn about kernel bounds; printing them would be timed too
+    warnings.filterwarnings("ignore", category=UserWarning, module="sklearn")
+    dataset = fake_data.install(seed=seed, vehicles=vehicles)
+    data    = fake_data.build(seed, vehicles)
+
+    results = {}
+    for name in names:
+        rng = random.Random(f"{seed}:{name}")        # inputs don't depend on which benchmarks ran
+        fn  = BENCHMARKS[name](rng, data)
+        results[name] = measure(fn, rounds, warmup_s, min_round_s)
+        r = results[name]
+        print(f"   {name:<20}{r['median_us']:>14,.1f} µs{r['ops_per_s']:>14,.1f} /s"
+              f"   ±{r['stdev_us'] / r['median_us'] * 100 if r['median_us'] else 0:.1f}%",
+              file=sys.stderr)
+
+    return {
+        "schema": SCHEMA,
+        "meta": {
+            "commit":     _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python":     platform.python_version(),
+            "platform":   platform.platform(),
+            "seed":       seed,
+            "dataset":    {k: v for k, v in dataset.items() if k != "root"},
+            "rounds":     rounds,
+            "warmup_s":   warmup_s,
+        },
+        "results": results,
+    }
+
+
+def compare(base: dict, new: dict):
+    print(f"{'benchmark':<20}{'base µs':>14}{'new µs':>14}{'change':>10}")
+    for name, r in new["results"].items():
+        old = base.get("results", {}).get(name)
+        if not old:
+            print(f"{name:<20}{'—':>14}{r['median_us']:>14,.1f}{'new':>10}")
+            continue
+        change = (r["median_us"] / old["median_us"] - 1) * 100 if old["median_us"] else 0.0
+        print(f"{name:<20}{old['median_us']:>14,.1f}{r['median_us']:>14,.1f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--only", help="comma-separated benchmark names (default: all)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--vehicles", type=int, default=VEHICLES, help="fake catalogue size")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--warmup-s", type=float, default=WARMUP_S)
+    parser.add_argument("--min-round-s", type=float, default=MIN_ROUND_S)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    with contextlib.redirect_stdout(sys.stderr):      # keep stdout for the JSON
+        results = run(names, args.seed, args.vehicles, args.rounds, args.warmup_s, args.min_round_s)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ results written to {args.out}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    elif not args.out:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
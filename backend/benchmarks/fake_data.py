@@ -0,0 +1,135 @@
+"""
+fake_data.py  —  Deterministic in-memory reference data for benchmarks
+======================================================================
+Builds a small, seeded catalogue (vehicles, grid intensities, GREET tables)
+and serves it through the engine's offline path. The tables are written to
+a snapshot bundle in a temp directory, DATA_SOURCE=snapshot is set, and
+data_access uses the matching SnapshotBackend. No database is touched, and
+the same seed always gives the same rows.
+
+install() must run before any backend module is imported, because
+snapshot.py reads SNAPSHOT_DIR / DATA_SOURCE at import time:
+
+    import fake_data
+    info = fake_data.install(seed=42, vehicles=2000)
+    import engine                      # GRID_CACHE now comes from the bundle
+"""
+
+import os
+import atexit
+import random
+import shutil
+import tempfile
+
+# ── Constants ──────────────────────────────────────────────────────────────
+BRANDS = {
+    "Tesla":      ["Model 3", "Model Y", "Model S", "Model X"],
+    "Volkswagen": ["Golf", "Polo", "ID.3", "ID.4", "Passat", "Tiguan"],
+    "Toyota":     ["Corolla", "Yaris", "Prius", "RAV4", "C-HR", "bZ4X"],
+    "BMW":        ["3 Series", "X3", "i4", "iX", "330e", "X5 xDrive50e"],
+    "Renault":    ["Clio", "Captur", "Megane E-Tech", "Zoe"],
+    "Hyundai":    ["Kona", "Ioniq 5", "Tucson", "i20"],
+    "Kia":        ["Niro", "EV6", "Sportage", "Ceed"],
+    "Ford":       ["Focus", "Puma", "Kuga", "Mustang Mach-E"],
+}
+BODY_TYPES = ["Sedan", "SUV", "Hatchback", "Wagon", "Coupe"]
+
+# share of the catalogue, (WLTP g/km mean, sd), (Wh/km mean, sd)
+TYPE_MIX = {
+    "ICE":  (0.45, (140, 25), None),
+    "HEV":  (0.20, (105, 15), None),
+    "PHEV": (0.15, (35, 10),  (190, 25)),
+    "BEV":  (0.20, None,      (170, 25)),
+}
+
+COUNTRIES = {          # ISO3 → (2000 intensity, yearly decline g/kWh)
+    "USA": (600, 9), "DEU": (560, 9), "FRA": (80, 1), "GBR": (520, 14),
+    "CHN": (900, 10), "JPN": (520, 4), "IND": (800, 5), "CAN": (200, 3),
+    "AUS": (900, 12), "BRA": (110, 1), "POL": (950, 10), "NOR": (20, 0),
+    "SWE": (40, 0.5), "ESP": (420, 10), "ITA": (500, 9),
+}
+YEARS = range(2000, 2024)
+
+
+def build(seed: int = 42, vehicles: int = 2000) -> dict:
+    """{table: (column_names, row_tuples)}, reproducible for a given seed."""
+    rng = random.Random(seed)
+    types, weights = zip(*[(t, mix[0]) for t, mix in TYPE_MIX.items()])
+
+    v_cols = ["id", "brand", "model", "year", "vehicle_type", "co2_wltp_gpkm",
+              "electric_wh_per_km", "battery_weight_kg", "body_type",
+              "norm_type", "manufacturing_kg", "recycling_kg"]
+    v_rows = []
+    for i in range(1, vehicles + 1):
+        brand = rng.choice(list(BRANDS))
+        vtype = rng.choices(types, weights)[0]
+        _, co2, wh = TYPE_MIX[vtype]
+        battery = None
+        if vtype == "BEV" and rng.random() < 0.6:
+            battery = round(rng.uniform(300, 650), 1)
+        v_rows.append((
+            i, brand, rng.choice(BRANDS[brand]), rng.randint(2015, 2024), vtype,
+            round(max(0.0, rng.gauss(*co2)), 1) if co2 else 0.0,
+            round(max(90.0, rng.gauss(*wh)), 1) if wh else None,
+            battery, rng.choice(BODY_TYPES), None, None, None,
+        ))
+
+    g_rows = []
+    for code, (start, decline) in COUNTRIES.items():
+        for year in YEARS:
+            raw = max(10.0, start - decline * (year - YEARS.start) + rng.gauss(0, start * 0.03))
+            g_rows.append((code, year, round(raw, 3), round(raw / 0.93, 3)))
+
+    return {
+        "vehicles": (v_cols, v_rows),
+        "grid_intensity": (
+            ["country_code", "year", "raw_intensity", "carbon_intensity_gco2_per_kwh"], g_rows,
+        ),
+        "glider_emissions": (
+            ["vehicle_type", "structure", "kg_co2"],
+            [("ICEV", "conventional", 5000.0), ("EV", "conventional", 5500.0),
+             ("HEV", "conventional", 5100.0), ("PHEV", "conventional", 5300.0),
+             ("FCV", "conventional", 6000.0)],
+        ),
+        "battery_weights": (
+            ["vehicle_type", "chemistry", "structure", "weight_lb"],
+            [("EV", "LiIon", "conventional", 938.3), ("PHEV", "LiIon", "conventional", 226.2),
+             ("HEV", "NiMH", "conventional", 100.0), ("ICEV", "LeadAcid", "conventional", 30.0),
+             ("FCV", "LiIon", "conventional", 50.0)],
+        ),
+        "battery_emission_factors": (
+            ["chemistry", "kg_co2_per_kg"],
+            [("LiIon", 10.0), ("NiMH", 5.0), ("LeadAcid", 2.0)],
+        ),
+        "fluids_weights": (
+            ["vehicle_type", "grams_co2"],
+            [("ICEV", 20000.0), ("EV", 10000.0), ("HEV", 20000.0), ("PHEV", 20000.0), ("FCV", 10000.0)],
+        ),
+        "afdc_vehicles": (
+            ["brand", "model", "year", "image_url", "manufacturer_url"],
+            [(b, m, 2023, f"https://img.example/{b}/{m}.jpg", f"https://{b.lower()}.example")
+             for b, models in BRANDS.items() for m in models],
+        ),
+    }
+
+
+def install(seed: int = 42, vehicles: int = 2000, root: str | None = None) -> dict:
+    """Write the bundle and point the backend at it; call before importing engine."""
+    if root is None:
+        root = tempfile.mkdtemp(prefix="carbonwise-bench-")
+        atexit.register(shutil.rmtree, root, ignore_errors=True)
+    os.environ["SNAPSHOT_DIR"] = root
+    os.environ["DATA_SOURCE"]  = "snapshot"
+
+    import snapshot
+    data = build(seed, vehicles)
+    snapshot.write_bundle(data, root, keep=1)
+    return {"root": root, "seed": seed, **{t: len(rows) for t, (_, rows) in data.items()}}
+
+
+def grid_data(data: dict) -> dict:
+    """grid_intensity rows in forecast_all()'s input shape."""
+    out = {}
+    for code, year, raw, corrected in data["grid_intensity"][1]:
+        out.setdefault(code, {})[str(year)] = {"raw": raw, "corrected": corrected}
+    return out
@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+load_mix.py  —  Traffic-mix load test with local stand-ins for Gemini, Wikimedia and search
+===========================================================================================
+Replays the request patterns of the React app against a running backend and
+reports throughput plus p50 / p95 / p99 per route. No request leaves the
+machine. Gemini, Wikimedia and Brave search are served by a local stub
+server with configurable latency and error rates, so /ai-summary,
+/ocr-claim, /greenwashing (search_web) and the image fallbacks can be
+load-tested without quota or cost.
+
+Point the backend at the stubs through its environment. The harness can
+start it for you (--spawn), or print the variables with --stubs-only:
+
+    cd backend
+    python benchmarks/load_mix.py --spawn "python -m flask --app app run --port 5000 --with-threads" \\
+        --concurrency 32 --duration 60
+    python benchmarks/load_mix.py --stubs-only --stub-port 9900        # then start the server yourself
+    python benchmarks/load_mix.py --target http://127.0.0.1:8000 --mix search=8,lifecycle=3 \\
+        --stub gemini:latency_ms=2500,error_rate=0.05 --stub wikimedia:timeout_rate=0.02
+
+Scenarios (one virtual user runs one scenario, start to finish, then picks
+the next by weight):
+
+    explorer      GET /vehicles pages 1–3, as the Explorer's infinite scroll does
+    search        search-as-you-type: /vehicle-search for the prefixes that outlive
+                  the 280 ms debounce, always including the final query
+    lifecycle     POST /lifecycle, then /carbon-score and /annual-impact
+    compare       POST /compare-multiple (2–4 vehicles), /ai-summary, /winner-detail
+    recommend     POST /recommend
+    break_even    POST /break-even (BEV vs ICE)
+    greenwashing  POST /greenwashing; 20 % with search_web (Gemini grounded search)
+    ocr           POST /ocr-claim with a small PNG
+    wallet        POST /wallet/travel/by-name (needs --user-id with a wallet)
+
+Virtual users are closed-loop with no think time, so --concurrency is the
+number of requests in flight, not a user count.
+Routes are reported by template (e.g. "GET /vehicle-search"), and any
+status >= 400 or transport error counts as an error. Stubs draw latency
+from a log-normal distribution around latency_ms (spread: sigma). They
+fail error_rate of calls with a 503, and hang past the client timeout on
+timeout_rate of calls.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+import shlex
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import httpx
+
+from _stats import latency_summary
+
+# ── Constants ──────────────────────────────────────────────────────────────
+TARGET      = "http://127.0.0.1:5000"
+CONCURRENCY = 16
+DURATION_S  = 30
+TIMEOUT_S   = 60
+SEED        = 42
+
+DEFAULT_MIX = {
+    "explorer":     4,
+    "search":       6,
+    "lifecycle":    4,
+    "compare":      2,
+    "recommend":    2,
+    "break_even":   1,
+    "greenwashing": 1,
+    "ocr":          0.3,
+    "wallet":       1,
+}
+
+SEARCH_TERMS = ["tesla model 3", "volkswagen id.4", "toyota prius", "bmw i4", "kia niro",
+                "hyundai ioniq", "ford puma", "renault zoe", "golf", "corolla hybrid"]
+COUNTRIES    = ["US", "DE", "FR", "UK", "IN", "CN", "JP", "CA", "AU", "BR"]
+
+# 1×1 transparent PNG
+TINY_PNG = base64.b64encode(bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)).decode()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# STUB SERVER  (Gemini, Wikimedia, Brave search)
+# ══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class StubConfig:
+    latency_ms:   float = 200.0
+    sigma:        float = 0.5
+    error_rate:   float = 0.0
+    timeout_rate: float = 0.0
+    hang_s:       float = 65.0          # longer than every client timeout in the backend
+
+
+STUB_DEFAULTS = {
+    "gemini":    StubConfig(latency_ms=1800, sigma=0.4),
+    "wikimedia": StubConfig(latency_ms=150,  sigma=0.5),
+    "search":    StubConfig(latency_ms=400,  sigma=0.6),
+}
+
+
+def _gemini_text(body: dict) -> str:
+    """A plausible model answer for whichever backend prompt this is."""
+    parts = body.get("contents", [{}])[0].get("parts", [])
+    if any("inline_data" in p for p in parts):
+        return json.dumps({
+            "found": True, "claim_text": "Zero emissions driving", "risk_level": "WARNING",
+            "verdict": "Tailpipe-only claim presented as lifecycle", "explanation": "Stub verdict.",
+            "suggestion": "Zero tailpipe emissions",
+        })
+    prompt = " ".join(p.get("text", "") for p in parts)
+    if body.get("tools"):
+        name = (re.search(r'"vehicle": "([^"]+)"', prompt) or re.search(r"(\w[\w .-]+)", prompt)).group(1)
+        return json.dumps({
+            "vehicle": name, "search_summary": "Stub search results.",
+            "claims_found": [
+                {"claim_text": "Zero emissions. Maximum fun.", "source": "Stub brochure",
+                 "source_url": "https://example.test/brochure", "claim_type": "emissions",
+                 "context": "Homepage hero banner"},
+                {"claim_text": "Our most sustainable car yet", "source": "Stub press release",
+                 "source_url": None, "claim_type": "environmental", "context": "Launch press"},
+            ],
+        })
+
+    names = re.findall(r"^- (.+?) \((\d{4})\) \[(\w+)\]$", prompt, re.M)
+    breakdown = [{
+        "name": f"{n} {y}", "type": t, "total_kg": 1000.0 + 100 * i, "rate_g_per_km": 50.0 + 10 * i,
+        "is_winner": i == 0, "image_query": f"{n} car", "note": "Stub assessment",
+    } for i, (n, y, t) in enumerate(names)] or [{"name": "Unknown", "type": "ICE", "total_kg": 0,
+                                              "rate_g_per_km": 0, "is_winner": True,
+                                              "image_query": "car", "note": "Stub"}]
+    return json.dumps({
+        "winner": breakdown[0]["name"], "winner_type": breakdown[0]["type"],
+        "winner_image_query": breakdown[0]["image_query"],
+        "verdict": "Lowest lifecycle emissions over the distance", "reasons": ["a", "b", "c"],
+        "breakdown": breakdown,
+    })
+
+
+class StubServer:
+    """One threaded HTTP server answering all three services, routed by path."""
+
+    def __init__(self, port: int = 0, configs: dict | None = None, seed: int = SEED):
+        self.configs = {**STUB_DEFAULTS, **(configs or {})}
+        self.stats   = {name: {"calls": 0, "errors": 0, "timeouts": 0} for name in self.configs}
+        self._rng    = random.Random(seed)
+        self._lock   = threading.Lock()
+        self.httpd   = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self.port    = self.httpd.server_address[1]
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def env(self) -> dict:
+        """Environment for the backend under test."""
+        return {
+            "GEMINI_API_BASE":  self.base,
+            "GEMINI_API_KEY":   os.getenv("GEMINI_API_KEY") or "stub-key",
+            "WIKI_API_URL":     f"{self.base}/w/api.php",
+            "BRAVE_SEARCH_URL": f"{self.base}/res/v1/web/search",
+        }
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def _fate(self, service: str) -> str:
+        """Decide this call's latency / outcome; returns "ok", "error" or "timeout"."""
+        cfg = self.configs[service]
+        with self._lock:
+            roll  = self._rng.random()
+            delay = cfg.latency_ms / 1000 * self._rng.lognormvariate(0, cfg.sigma)
+            fate  = "timeout" if roll < cfg.timeout_rate else (
+                    "error" if roll < cfg.timeout_rate + cfg.error_rate else "ok")
+            self.stats[service]["calls"] += 1
+            if fate != "ok":
+                self.stats[service][fate + "s"] += 1
+        time.sleep(cfg.hang_s if fate == "timeout" else delay)
+        return fate
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _serve(self, service: str, build):
+                fate = server._fate(service)
+                if fate == "ok":
+                    self._send(200, build())
+                else:
+                    self._send(503 if fate == "error" else 504, {"error": f"stub {fate}"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body   = json.loads(self.rfile.read(length) or b"{}")
+                if ":generateContent" in self.path:
+                    self._serve("gemini", lambda: {"candidates": [{
+                        "content": {"parts": [{"text": _gemini_text(body)}]}, "finishReason": "STOP",
+                    }]})
+                else:
+                    self._send(404, {"error": "no stub for " + self.path})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                q   = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path == "/w/api.php":
+                    if q.get("list") == "search":
+                        self._serve("wikimedia", lambda: {"query": {"search": [{"title": q.get("srsearch", "Car")}]}})
+                    else:
+                        title = q.get("titles", "Car").replace(" ", "_")
+                        self._serve("wikimedia", lambda: {"query": {"pages": {"1": {
+                            "title": title, "thumbnail": {"source": f"{server.base}/thumb/{title}.jpg"},
+                        }}}})
+                elif url.path == "/res/v1/web/search":
+                    query = q.get("q", "")
+                    self._serve("search", lambda: {"web": {"results": [
+                        {"url": f"https://example.test/{i}",
+                         "description": f"The {query} is a zero emission, eco-friendly car. Prices vary."}
+                        for i in range(int(q.get("count", 5)))
+                    ]}})
+                else:
+                    self._send(404, {"error": "no stub for " + url.path})
+
+        return Handler
+
+
+def parse_stub_arg(text: str) -> tuple[str, StubConfig]:
+    """"gemini:latency_ms=2500,error_rate=0.05" → ("gemini", StubConfig(...))."""
+    service, _, spec = text.partition(":")
+    if service not in STUB_DEFAULTS:
+        raise ValueError(f"unknown stub service {service!r} (one of {', '.join(STUB_DEFAULTS)})")
+    values = asdict(STUB_DEFAULTS[service])
+    for item in filter(None, spec.split(",")):
+        key, _, value = item.partition("=")
+        if key not in values:
+            raise ValueError(f"unknown stub setting {key!r}")
+        values[key] = float(value)
+    return service, StubConfig(**values)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SCENARIOS  — each is an async function (client, rng, ctx) that issues requests via ctx.call
+# ══════════════════════════════════════════════════════════════════════════════
+
+class Context:
+    def __init__(self, client, vehicles: list[dict], user_id: int | None, recorder):
+        self.client   = client
+        self.vehicles = vehicles
+        self.user_id  = user_id
+        self.record   = recorder
+
+    async def call(self, route: str, method: str, path: str, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            res = await self.client.request(method, path, **kwargs)
+            ok  = res.status_code < 400
+            body = res.json() if ok and res.headers.get("content-type", "").startswith("application/json") else None
+        except (httpx.HTTPError, ValueError):
+            ok, body = False, None
+        self.record(route, (time.perf_counter() - t0) * 1000, ok)
+        return body
+
+    def vehicle(self, rng, types=None) -> dict:
+        pool = [v for v in self.vehicles if not types or v.get("vehicle_type") in types] or self.vehicles
+        return rng.choice(pool)
+
+
+async def explorer(rng, ctx):
+    await ctx.call("GET /vehicles", "GET", "/vehicles", params={"page": 1, "limit": 100})
+    for page in range(2, rng.randint(2, 4)):
+        await ctx.call("GET /vehicles", "GET", "/vehicles", params={"page": page, "limit": 200})
+
+
+async def search(rng, ctx):
+    term = rng.choice(SEARCH_TERMS)[: rng.randint(4, 16)]
+    for i in range(2, len(term) + 1):
+        # ~150 ms between keystrokes; only pauses longer than the debounce fire a request
+        if i == len(term) or rng.random() < 0.15:
+            await ctx.call("GET /vehicle-search", "GET", "/vehicle-search", params={"q": term[:i]})
+
+
+async def lifecycle(rng, ctx):
+    v  = ctx.vehicle(rng)
+    lc = await ctx.call("POST /lifecycle", "POST", "/lifecycle", json={
+        "brand": v["brand"], "model": v["model"], "vehicle_year": v["year"],
+        "country": rng.choice(COUNTRIES), "grid_year": 2023,
+    })
+    total = (lc or {}).get("total_g_per_km", 120)
+    await ctx.call("POST /carbon-score", "POST", "/carbon-score", json={"total_g_per_km": total})
+    await ctx.call("POST /annual-impact", "POST", "/annual-impact",
+                   json={"total_g_per_km": total, "annual_km": rng.choice([8000, 12000, 20000])})
+
+
+async def compare(rng, ctx):
+    picks   = [ctx.vehicle(rng) for _ in range(rng.randint(2, 4))]
+    country = rng.choice(COUNTRIES)
+    results = await ctx.call("POST /compare-multiple", "POST", "/compare-multiple", json={
+        "country": country, "year": 2023, "distance_km": 100_000,
+        "vehicles": [{"brand": v["brand"], "model": v["model"], "year": v["year"]} for v in picks],
+    }) or []
+    lifecycles = [r for r in results if isinstance(r, dict) and "error" not in r]
+    if lifecycles:
+        await ctx.call("POST /ai-summary", "POST", "/ai-summary", json={"distance_km": 100_000, "vehicles": [
+            {"brand": r["brand"], "model": r["model"], "year": r["year"],
+             "vehicle_type": r.get("vehicle_type", "ICE"), "lifecycle": r} for r in lifecycles
+        ]})
+        w = lifecycles[0]
+        await ctx.call("POST /winner-detail", "POST", "/winner-detail",
+                       json={"brand": w["brand"], "model": w["model"], "year": w["year"]})
+
+
+async def recommend(rng, ctx):
+    await ctx.call("POST /recommend", "POST", "/recommend", json={
+        "daily_km": rng.choice([10, 25, 40, 80]), "years": rng.choice([5, 8, 10]),
+        "filters": rng.choice([{}, {"vehicle_type": "BEV"}, {"bodyType": "SUV"}]),
+        "country": rng.choice(COUNTRIES), "grid_year": 2023,
+    })
+
+
+async def break_even(rng, ctx):
+    a, b = ctx.vehicle(rng, {"BEV", "EV"}), ctx.vehicle(rng, {"ICE"})
+    await ctx.call("POST /break-even", "POST", "/break-even", json={
+        "vehicle_a": {k: a[k] for k in ("brand", "model", "year")},
+        "vehicle_b": {k: b[k] for k in ("brand", "model", "year")},
+        "country": rng.choice(COUNTRIES), "grid_year": 2023,
+    })
+
+
+async def greenwashing(rng, ctx):
+    v = ctx.vehicle(rng)
+    web = rng.random() < 0.2
+    await ctx.call("POST /greenwashing" + (" (search_web)" if web else ""), "POST", "/greenwashing", json={
+        "lifecycle": {"total_g_per_km": 95, "operational_g_per_km": 40, "manufacturing_g_per_km": 50},
+        "vehicle": {"brand": v["brand"], "model": v["model"], "year": v["year"],
+                    "vehicle_type": v.get("vehicle_type", "ICE")},
+        "claims": ["zero emissions", "eco-friendly driving"], "search_web": web,
+    })
+
+
+async def ocr(rng, ctx):
+    await ctx.call("POST /ocr-claim", "POST", "/ocr-claim", json={"image_b64": TINY_PNG, "mime_type": "image/png"})
+
+
+async def wallet(rng, ctx):
+    if ctx.user_id is None:
+        return
+    v = ctx.vehicle(rng)
+    await ctx.call("POST /wallet/travel/by-name", "POST", "/wallet/travel/by-name", json={
+        "user_id": ctx.user_id, "brand": v["brand"], "model": v["model"], "year": v["year"],
+        "distance_km": round(rng.lognormvariate(2.4, 0.7), 1),
+    })
+
+
+SCENARIOS = {
+    "explorer": explorer, "search": search, "lifecycle": lifecycle, "compare": compare,
+    "recommend": recommend, "break_even": break_even, "greenwashing": greenwashing,
+    "ocr": ocr, "wallet": wallet,
+}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# RUNNER
+# ══════════════════════════════════════════════════════════════════════════════
+
+async def _vehicle_pool(client) -> list[dict]:
+    res = await client.get("/vehicles", params={"page": 1, "limit": 200})
+    res.raise_for_status()
+    data = res.json()
+    rows = data.get("vehicles") if isinstance(data, dict) else data
+    if not rows:
+        raise RuntimeError("target returned no vehicles; load the catalogue first")
+    return rows
+
+
+async def run(target: str, mix: dict, concurrency: int, duration_s: float,
+              user_id: int | None = None, seed: int = SEED, timeout_s: float = TIMEOUT_S) -> dict:
+    samples: dict[str, list] = {}
+
+    def record(route, ms, ok):
+        samples.setdefault(route, []).append((ms, ok))
+
+    names   = [n for n, w in mix.items() if w > 0 and (n != "wallet" or user_id is not None)]
+    weights = [mix[n] for n in names]
+    limits  = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=target, timeout=timeout_s, limits=limits) as client:
+        ctx = Context(client, await _vehicle_pool(client), user_id, record)
+        deadline = time.perf_counter() + duration_s
+
+        async def user(i):
+            rng = random.Random(f"{seed}:{i}")
+            while time.perf_counter() < deadline:
+                await SCENARIOS[rng.choices(names, weights)[0]](rng, ctx)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    routes = {}
+    for route, rows in sorted(samples.items()):
+        routes[route] = {
+            "requests": len(rows),
+            "errors":   sum(1 for _, ok in rows if not ok),
+            "rps":      round(len(rows) / elapsed, 2),
+            **latency_summary([ms for ms, _ in rows], digits=1),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "target": target, "concurrency": concurrency, "elapsed_s": round(elapsed, 2),
+        "requests": total, "rps": round(total / elapsed, 1),
+        "errors": sum(r["errors"] for r in routes.values()),
+        "mix": {n: mix[n] for n in names}, "routes": routes,
+    }
+
+
+def _wait_for(target: str, proc, timeout_s: float = 60):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode} before accepting requests")
+        try:
+            httpx.get(target + "/", timeout=2)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise RuntimeError(f"{target} did not come up within {timeout_s:.0f}s")
+
+
+def _parse_mix(text: str | None) -> dict:
+    mix = dict(DEFAULT_MIX)
+    if text:
+        mix = {name: 0 for name in mix}
+        for item in text.split(","):
+            name, _, weight = item.partition("=")
+            if name.strip() not in SCENARIOS:
+                raise ValueError(f"unknown scenario {name!r}")
+            mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--target", default=TARGET)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="virtual users")
+    parser.add_argument("--duration", type=float, default=DURATION_S, help="seconds")
+    parser.add_argument("--mix", help="scenario weights, e.g. search=6,lifecycle=4 (others off)")
+    parser.add_argument("--user-id", type=int, help="user with a wallet, enables the wallet scenario")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_S, help="client timeout per request")
+    parser.add_argument("--stub", action="append", default=[], metavar="SERVICE:k=v,...",
+                        help="stub behaviour, e.g. gemini:latency_ms=2500,error_rate=0.05")
+    parser.add_argument("--stub-port", type=int, default=0)
+    parser.add_argument("--stubs-only", action="store_true", help="run the stubs and print their env")
+    parser.add_argument("--spawn", help="command that starts the backend (gets the stub env)")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    try:
+        mix   = _parse_mix(args.mix)
+        stubs = StubServer(args.stub_port, dict(parse_stub_arg(s) for s in args.stub), args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    stubs.start()
+    print(f"✅ stubs on {stubs.base}: " + ", ".join(
+        f"{name} {c.latency_ms:.0f} ms / {c.error_rate:.0%} err / {c.timeout_rate:.0%} hang"
+        for name, c in stubs.configs.items()))
+
+    if args.stubs_only:
+        for k, v in stubs.env().items():
+            print(f"export {k}={shlex.quote(v)}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    proc = None
+    if args.spawn:
+        proc = subprocess.Popen(shlex.split(args.spawn), env={**os.environ, **stubs.env()},
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _wait_for(args.target, proc)
+    else:
+        print("⚠️  not spawning the backend: make sure it runs with the stub env "
+              "(--stubs-only prints it), or outbound calls will hit the real services")
+
+    try:
+        report = asyncio.run(run(args.target, mix, args.concurrency, args.duration,
+                                 args.user_id, args.seed, args.timeout))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        stubs.stop()
+    report["stubs"] = {name: {**asdict(stubs.configs[name]), **stubs.stats[name]} for name in stubs.stats}
+
+    print(f"\n{report['requests']} requests in {report['elapsed_s']}s, "
+          f"{report['rps']} req/s, {report['errors']} errors, concurrency {report['concurrency']}")
+    print(f"{'route':<34}{'reqs':>7}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, r in report["routes"].items():
+        print(f"{route:<34}{r['requests']:>7}{r['errors']:>6}{r['rps']:>9}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+    print("stub calls: " + ", ".join(
+        f"{n} {s['calls']} ({s['errors']} err, {s['timeouts']} hung)" for n, s in report["stubs"].items()))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
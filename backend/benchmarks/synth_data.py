@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+synth_data.py  —  Scale-test data: vehicles, grid series, users and trip histories
+==================================================================================
+Generates a statistically plausible dataset at any size and writes it to
+Postgres (COPY), CSV files, or a snapshot bundle. At --scale 1:
+
+    vehicles        1,000,000     type mix shifts toward BEV/PHEV by model year
+    grid_intensity  250 × 40      countries × years (--countries / --years, not scaled)
+    users           500,000       each with a carbon_wallet
+    travel_log      100,000,000   trips over the last --days days
+
+Distributions:
+  - vehicles: model year skewed to recent years. Powertrain shares are
+    logistic in the model year. Body types carry a consumption multiplier.
+    ICE WLTP is log-normal around 150 g/km, falling 1.5 %/year; HEV is
+    ~0.72× ICE; PHEV is log-normal around 38 g/km. BEV Wh/km is normal
+    around 150. BEV pack mass comes from range × consumption; 20 % are left
+    NULL so the GREET fallback is exercised.
+  - grid: each country starts at a log-normal intensity (15–1100 g/kWh).
+    It then follows its own decline rate with AR(1) noise, and the plug
+    intensity adds a 3–18 % T&D loss. The first codes are real ISO3
+    countries; the rest use the ISO 3166 user-assigned range XAA–XZZ.
+  - trips: user activity is log-normal (a few heavy users). Each user has
+    one vehicle (popularity skewed) and a home country. Distances are
+    log-normal, median 11 km. Times follow a commute-shaped hour profile.
+    emissions_kg uses wallet_rates' formula at the latest grid year.
+
+Everything is generated in NumPy batches of --batch-rows. Memory is bounded
+by the vehicle and user arrays, not by the trip count. The same seed, scale
+and --tables always produce the same rows.
+
+    cd backend
+    python benchmarks/synth_data.py --scale 0.01 --csv /tmp/synth
+    python benchmarks/synth_data.py --scale 1 --postgres --backfill    # DB_URI → scratch DB!
+    python benchmarks/synth_data.py --scale 0.1 --snapshot ../data/snapshots --tables vehicles,grid
+
+Postgres: ids continue after the current MAX(id) and existing
+(country_code, year) cells are skipped, so it appends rather than replaces.
+Each batch is its own COPY + commit. The vehicles' derived columns are
+filled by load_vehicles.recompute(), and data_versions is bumped.
+--backfill rebuilds the travel_stats_* rollups afterwards. The snapshot
+sink takes the reference tables only (vehicles, grid, GREET).
+"""
+
+import io
+import os
+import csv
+import sys
+import time
+import string
+import argparse
+import itertools
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_data                                             # noqa: E402
+
+# ── Constants ──────────────────────────────────────────────────────────────
+SEED       = 42
+BATCH_ROWS = 500_000
+PER_SCALE  = {"vehicles": 1_000_000, "users": 500_000, "trips": 100_000_000}
+COUNTRIES  = 250
+YEARS      = 40
+LAST_YEAR  = 2024
+DAYS       = 730
+TABLES     = ("vehicles", "grid", "users", "trips")
+
+MODEL_YEARS   = np.arange(2005, 2026)
+BODY_TYPES    = np.array(["SUV", "Sedan", "Hatchback", "Wagon", "Coupe"])
+BODY_SHARE    = np.array([0.40, 0.25, 0.25, 0.07, 0.03])
+BODY_FACTOR   = np.array([1.20, 1.00, 0.90, 1.05, 1.10])
+BEV_NAMEPLATES  = {"Model 3", "Model Y", "Model S", "Model X", "ID.3", "ID.4", "bZ4X", "i4", "iX",
+                   "Megane E-Tech", "Zoe", "Ioniq 5", "EV6", "Mustang Mach-E"}
+PHEV_NAMEPLATES = {"330e", "X5 xDrive50e"}
+TRIMS         = np.array(["", " Long Range", " Sport", " Comfort", " AWD", " Performance", " Eco", " Plus"])
+HOUR_PROFILE  = np.array([1, 1, 1, 1, 1, 2, 5, 9, 10, 6, 5, 5, 6, 5, 5, 6, 8, 10, 8, 5, 4, 3, 2, 1], dtype=float)
+WALLET_KG     = 2300.0
+PHEV_ELECTRIC_SHARE = 0.6           # engine.PHEV_ELECTRIC_SHARE, without importing engine
+
+VEHICLE_COLUMNS = ["id", "brand", "model", "year", "vehicle_type", "co2_wltp_gpkm",
+                   "electric_wh_per_km", "battery_weight_kg", "body_type"]
+GRID_COLUMNS    = ["country_code", "year", "raw_intensity", "carbon_intensity_gco2_per_kwh"]
+USER_COLUMNS    = ["id", "name", "email", "password_hash"]
+WALLET_COLUMNS  = ["user_id", "year", "total_credits_kg", "remaining_credits_kg"]
+TRIP_COLUMNS    = ["user_id", "vehicle_id", "distance_km", "emissions_kg", "created_at"]
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# GENERATORS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _model_pools():
+    """{powertrain: (brands, models, popularity)}; BEV-only and PHEV nameplates stay in their pool."""
+    pairs  = [(b, m) for b, models in fake_data.BRANDS.items() for m in models]
+    weight = 1.0 / np.arange(1, len(pairs) + 1) ** 0.6
+    pools  = {}
+    for vtype in ("BEV", "PHEV", "HEV", "ICE"):
+        idx = [i for i, (_, m) in enumerate(pairs) if _nameplate_fits(m, vtype)]
+        w   = weight[idx]
+        pools[vtype] = (np.array([pairs[i][0] for i in idx]), np.array([pairs[i][1] for i in idx]), w / w.sum())
+    return pools
+
+
+def _nameplate_fits(model: str, vtype: str) -> bool:
+    kind = "BEV" if model in BEV_NAMEPLATES else "PHEV" if model in PHEV_NAMEPLATES else None
+    if vtype == "BEV":
+        return kind == "BEV"
+    if vtype == "PHEV":
+        return kind != "BEV"
+    return kind is None
+
+
+def vehicle_batches(rng, count: int, first_id: int = 1, batch_rows: int = BATCH_ROWS):
+    """Yield vehicle DataFrames (VEHICLE_COLUMNS)."""
+    pools  = _model_pools()
+    year_w = np.linspace(1, 4, len(MODEL_YEARS))
+    year_w /= year_w.sum()
+
+    for start in range(0, count, batch_rows):
+        n     = min(batch_rows, count - start)
+        year  = rng.choice(MODEL_YEARS, n, p=year_w)
+        body  = rng.choice(len(BODY_TYPES), n, p=BODY_SHARE)
+        mult  = BODY_FACTOR[body]
+
+        p_bev  = 0.005 + 0.30 * _sigmoid((year - 2021) / 1.5)
+        p_phev = 0.01 + 0.10 * _sigmoid((year - 2019) / 1.5)
+        p_hev  = 0.03 + 0.15 * _sigmoid((year - 2015) / 3.0)
+        u      = rng.random(n)
+        vtype  = np.where(u < p_bev, "BEV",
+                 np.where(u < p_bev + p_phev, "PHEV",
+                 np.where(u < p_bev + p_phev + p_hev, "HEV", "ICE")))
+
+        ice_co2 = np.exp(rng.normal(np.log(150 * mult * (1 - 0.015 * (year - 2005))), 0.18))
+        co2 = np.select(
+            [vtype == "ICE", vtype == "HEV", vtype == "PHEV"],
+            [ice_co2, 0.72 * ice_co2, np.exp(rng.normal(np.log(38), 0.3, n))],
+            0.0,
+        ).clip(0, 350)
+
+        wh = np.select(
+            [vtype == "BEV", vtype == "PHEV"],
+            [rng.normal(150 * mult, 18), rng.normal(185 * mult, 25)],
+            np.nan,
+        ).clip(100, 320)
+
+        range_km = rng.normal(420, 90, n).clip(150, 700)
+        pack_kg  = np.select(
+            [vtype == "BEV", vtype == "PHEV"],
+            [range_km * wh / 1000 / 0.16, rng.normal(14, 3, n).clip(6, 25) / 0.12],
+            np.nan,
+        ).clip(60, 900)
+        pack_kg[(vtype == "BEV") & (rng.random(n) < 0.2)] = np.nan
+
+        brand = np.empty(n, dtype=object)
+        model = np.empty(n, dtype=object)
+        for t, (p_brands, p_models, popularity) in pools.items():
+            mask = vtype == t
+            pick = rng.choice(len(p_brands), int(mask.sum()), p=popularity)
+            brand[mask], model[mask] = p_brands[pick], p_models[pick]
+
+        yield pd.DataFrame({
+            "id":                 np.arange(first_id + start, first_id + start + n),
+            "brand":              brand,
+            "model":              pd.Series(model) + TRIMS[rng.integers(0, len(TRIMS), n)],
+            "year":               year,
+            "vehicle_type":       vtype,
+            "co2_wltp_gpkm":      co2.round(1),
+            "electric_wh_per_km": wh.round(1),
+            "battery_weight_kg":  pack_kg.round(1),
+            "body_type":          BODY_TYPES[body],
+        })
+
+
+def country_codes(count: int) -> list[str]:
+    real  = list(fake_data.COUNTRIES)
+    extra = ("X" + a + b for a, b in itertools.product(string.ascii_uppercase, repeat=2))
+    return (real + list(itertools.islice(extra, max(0, count - len(real)))))[:count]
+
+
+def grid_frame(rng, countries: int = COUNTRIES, years: int = YEARS, last_year: int = LAST_YEAR) -> pd.DataFrame:
+    codes = country_codes(countries)
+    span  = np.arange(last_year - years + 1, last_year + 1)
+    rows  = []
+    for code in codes:
+        start   = float(np.clip(np.exp(rng.normal(np.log(450), 0.6)), 15, 1100))
+        decline = rng.normal(0.015, 0.012)
+        loss    = rng.uniform(0.03, 0.18)
+        noise   = 0.0
+        for i, year in enumerate(span):
+            noise = 0.6 * noise + rng.normal(0, 0.04)
+            raw   = max(5.0, start * (1 - decline) ** i * (1 + noise))
+            rows.append((code, int(year), round(raw, 3), round(raw / (1 - loss), 3)))
+    return pd.DataFrame(rows, columns=GRID_COLUMNS)
+
+
+def user_frames(seed: int, count: int, first_id: int = 1, batch_rows: int = BATCH_ROWS):
+    for start in range(0, count, batch_rows):
+        ids = np.arange(first_id + start, first_id + start + min(batch_rows, count - start))
+        yield pd.DataFrame({
+            "id":            ids,
+            "name":          [f"Synthetic User {i}" for i in ids],
+            "email":         [f"synth-{seed}-{i}@example.test" for i in ids],
+            "password_hash": "!synthetic",          # matches no password
+        })
+
+
+class TripModel:
+    """Per-user state shared by every trip batch."""
+
+    def __init__(self, rng, user_ids: np.ndarray, vehicles: pd.DataFrame, grid: pd.DataFrame):
+        n_users = len(user_ids)
+        self.user_ids = user_ids
+        self.activity = np.exp(rng.normal(0, 1.0, n_users))
+        self.activity /= self.activity.sum()
+
+        # skewed vehicle popularity: a beta draw over the (randomly ordered) catalogue
+        pick = (rng.beta(0.7, 3.0, n_users) * len(vehicles)).astype(np.int64).clip(0, len(vehicles) - 1)
+        self.vehicle_id = vehicles["id"].to_numpy()[pick]
+        vtype  = vehicles["vehicle_type"].to_numpy()[pick]
+        co2    = vehicles["co2_wltp_gpkm"].to_numpy(dtype=float)[pick]
+        wh     = vehicles["electric_wh_per_km"].to_numpy(dtype=float)[pick]
+
+        latest = grid.sort_values("year").groupby("country_code").last()
+        codes  = latest.index.to_numpy()
+        weight = np.where(np.isin(codes, list(fake_data.COUNTRIES)), 20.0, 1.0)
+        home   = rng.choice(len(codes), n_users, p=weight / weight.sum())
+        g      = latest["carbon_intensity_gco2_per_kwh"].to_numpy()[home]
+
+        # wallet_rates._compute_rate(), vectorised (g CO₂/km)
+        elec = wh / 1000 * g
+        self.rate = np.where(vtype == "BEV", elec,
+                    np.where(vtype == "PHEV",
+                             PHEV_ELECTRIC_SHARE * elec + (1 - PHEV_ELECTRIC_SHARE) * co2, co2))
+        self.year_kg = np.zeros(n_users)
+
+    def batches(self, rng, count: int, days: int = DAYS, batch_rows: int = BATCH_ROWS):
+        now   = np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), "s")
+        today = now.astype("datetime64[D]").astype("datetime64[s]")
+        year0 = now.astype("datetime64[Y]").astype("datetime64[s]")
+        hours = HOUR_PROFILE / HOUR_PROFILE.sum()
+
+        for start in range(0, count, batch_rows):
+            n    = min(batch_rows, count - start)
+            who  = rng.choice(len(self.user_ids), n, p=self.activity)
+            km   = np.exp(rng.normal(np.log(11), 0.8, n)).clip(0.5, 800).round(1)
+            kg   = (self.rate[who] * km / 1000).round(4)
+            secs = (rng.integers(1, days + 1, n) * -86_400
+                    + rng.choice(24, n, p=hours) * 3600 + rng.integers(0, 3600, n))
+            when = today + secs.astype("timedelta64[s]")
+
+            this_year = when >= year0
+            self.year_kg += np.bincount(who[this_year], weights=kg[this_year], minlength=len(self.user_ids))
+            yield pd.DataFrame({
+                "user_id":      self.user_ids[who],
+                "vehicle_id":   self.vehicle_id[who],
+                "distance_km":  km,
+                "emissions_kg": kg,
+                "created_at":   when,
+            })
+
+    def wallets(self, year: int) -> pd.DataFrame:
+        return pd.DataFrame({
+            "user_id":              self.user_ids,
+            "year":                 year,
+            "total_credits_kg":     WALLET_KG,
+            "remaining_credits_kg": (WALLET_KG - self.year_kg).round(3),
+        })
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SINKS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class CsvSink:
+    """One CSV per table in `directory`, header written once."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._started: set[str] = set()
+
+    def first_id(self, table: str) -> int:
+        return 1
+
+    def existing_grid(self) -> set:
+        return set()
+
+    def write(self, table: str, df: pd.DataFrame):
+        path = os.path.join(self.directory, f"{table}.csv")
+        df.to_csv(path, mode="a" if table in self._started else "w",
+                  header=table not in self._started, index=False, quoting=csv.QUOTE_MINIMAL)
+        self._started.add(table)
+
+    def finish(self, tables_written: set):
+        pass
+
+
+class PostgresSink:
+    """COPY per batch, one commit per batch; appends after the current max ids."""
+
+    TARGETS = {
+        "vehicles":       ("vehicles", VEHICLE_COLUMNS),
+        "grid_intensity": ("grid_intensity", GRID_COLUMNS),
+        "users":          ("users", USER_COLUMNS),
+        "carbon_wallet":  ("carbon_wallet", WALLET_COLUMNS),
+        "travel_log":     ("travel_log", TRIP_COLUMNS),
+    }
+
+    def __init__(self):
+        from database import get_db_connection
+        self.conn = get_db_connection()
+        self.cur  = self.conn.cursor()
+        self.cur.execute("SET synchronous_commit = off")      # bulk load: durability per batch isn't needed
+
+    def first_id(self, table: str) -> int:
+        self.cur.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+        return self.cur.fetchone()[0]
+
+    def existing_grid(self) -> set:
+        self.cur.execute("SELECT UPPER(country_code), year FROM grid_intensity")
+        return set(self.cur.fetchall())
+
+    def write(self, table: str, df: pd.DataFrame):
+        name, cols = self.TARGETS[table]
+        buf = io.StringIO()
+        df[cols].to_csv(buf, header=False, index=False)
+        buf.seek(0)
+        try:
+            self.cur.copy_expert(f"COPY {name} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv)", buf)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def finish(self, tables_written: set):
+        import data_versions
+        try:
+            for table in ("vehicles", "users"):
+                if table in tables_written:
+                    self.cur.execute(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                    )
+            if "grid_intensity" in tables_written:
+                data_versions.bump_shared(self.cur, [data_versions.GRID])
+            self.conn.commit()
+        finally:
+            self.cur.close()
+            self.conn.close()
+
+        if "vehicles" in tables_written:
+            from load_vehicles import recompute
+            print(f"   derived columns filled for {recompute():,} vehicles")
+
+
+class SnapshotSink:
+    """Collects the reference tables and writes one bundle (with fake_data's GREET tables)."""
+
+    REFERENCE = {"vehicles", "grid_intensity"}
+
+    def __init__(self, root: str):
+        self.root   = root
+        self.frames: dict[str, list] = {}
+
+    def first_id(self, table: str) -> int:
+        return 1
+
+    def existing_grid(self) -> set:
+        return set()
+
+    def write(self, table: str, df: pd.DataFrame):
+        if table in self.REFERENCE:
+            self.frames.setdefault(table, []).append(df)
+
+    def finish(self, tables_written: set):
+        import snapshot
+        data = {t: v for t, v in fake_data.build(0, 0).items() if t not in self.REFERENCE}
+        for table, frames in self.frames.items():
+            df = pd.concat(frames, ignore_index=True)
+            df = df.astype(object).where(df.notna(), None)
+            data[table] = (list(df.columns), list(df.itertuples(index=False, name=None)))
+        print(f"   snapshot written to {snapshot.write_bundle(data, self.root)}")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# DRIVER
+# ══════════════════════════════════════════════════════════════════════════════
+
+def generate(sink, scale: float = 1.0, seed: int = SEED, tables=TABLES,
+             countries: int = COUNTRIES, years: int = YEARS, days: int = DAYS,
+             batch_rows: int = BATCH_ROWS) -> dict:
+    rng     = np.random.default_rng(seed)
+    counts  = {k: max(1, int(v * scale)) for k, v in PER_SCALE.items()}
+    written = {}
+    t0      = time.perf_counter()
+
+    def emit(table, df):
+        sink.write(table, df)
+        written[table] = written.get(table, 0) + len(df)
+
+    # vehicles are kept in memory (compact columns only) for trip generation
+    vehicles = []
+    for df in vehicle_batches(rng, counts["vehicles"], sink.first_id("vehicles") if "vehicles" in tables else 1, batch_rows):
+        if "vehicles" in tables:
+            emit("vehicles", df)
+        vehicles.append(df[["id", "vehicle_type", "co2_wltp_gpkm", "electric_wh_per_km"]])
+    vehicles = pd.concat(vehicles, ignore_index=True)
+    print(f"   vehicles        {len(vehicles):>14,}  ({time.perf_counter() - t0:.1f}s)")
+
+    grid = grid_frame(rng, countries, years)
+    if "grid" in tables:
+        existing = sink.existing_grid()
+        keep = [(c, y) not in existing for c, y in zip(grid["country_code"], grid["year"])]
+        emit("grid_intensity", grid[keep])
+        print(f"   grid_intensity  {int(sum(keep)):>14,}  ({time.perf_counter() - t0:.1f}s)")
+
+    if "users" in tables or "trips" in tables:
+        first_user = sink.first_id("users")
+        user_ids   = np.arange(first_user, first_user + counts["users"])
+        for df in user_frames(seed, counts["users"], first_user, batch_rows):
+            emit("users", df)
+        print(f"   users           {counts['users']:>14,}  ({time.perf_counter() - t0:.1f}s)")
+
+        model = TripModel(rng, user_ids, vehicles, grid)
+        if "trips" in tables:
+            t_trips = time.perf_counter()
+            for df in model.batches(rng, counts["trips"], days, batch_rows):
+                emit("travel_log", df)
+                done    = written["travel_log"]
+                elapsed = time.perf_counter() - t_trips
+                print(f"   travel_log      {done:>14,}  ({done / elapsed:,.0f} rows/s)")
+        emit("carbon_wallet", model.wallets(datetime.now(timezone.utc).year))
+
+    sink.finish(set(written))
+    return {"rows": written, "seconds": round(time.perf_counter() - t0, 1), "scale": scale, "seed": seed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate scale-test data (vehicles, grid, users, trips)")
+    parser.add_argument("--scale", type=float, default=0.01, help="1.0 = 1M vehicles / 500k users / 100M trips")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--tables", default=",".join(TABLES), help=f"subset of {','.join(TABLES)}")
+    parser.add_argument("--countries", type=int, default=COUNTRIES)
+    parser.add_argument("--years", type=int, default=YEARS)
+    parser.add_argument("--days", type=int, default=DAYS, help="trip history window")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--postgres", action="store_true", help="COPY into DB_URI (use a scratch database)")
+    target.add_argument("--csv", metavar="DIR", help="write one CSV per table")
+    target.add_argument("--snapshot", metavar="ROOT", help="write a snapshot bundle (reference tables only)")
+    parser.add_argument("--backfill", action="store_true", help="rebuild travel_stats_* afterwards (--postgres)")
+    args = parser.parse_args()
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        parser.error(f"unknown table(s): {', '.join(sorted(unknown))}")
+    if "trips" in tables and "vehicles" not in tables:
+        parser.error("trips reference the vehicles generated in the same run; add vehicles")
+
+    if args.postgres:
+        sink = PostgresSink()
+    elif args.csv:
+        sink = CsvSink(args.csv)
+    else:
+        sink = SnapshotSink(args.snapshot)
+
+    result = generate(sink, args.scale, args.seed, tables, args.countries, args.years,
+                      args.days, args.batch_rows)
+    print(f"✅ synthetic data (scale {result['scale']}, seed {result['seed']}) in {result['seconds']}s: "
+          + ", ".join(f"{t} {n:,}" for t, n in result["rows"].items()))
+
+    if args.backfill and args.postgres:
+        from backfill_wallet_stats import backfill
+        print(f"✅ rollups rebuilt: {backfill()}")
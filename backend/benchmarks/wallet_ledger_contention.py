@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+wallet_ledger_contention.py  —  Parallel writers on ONE wallet: row update vs ledger
+===================================================================================
+Every writer logs trips for the same user, the bursty fleet-upload case.
+
+direct  log_trip(ledger=False). Each trip UPDATEs that user's carbon_wallet
+        and rollup rows, so writers queue on the row locks.
+ledger  log_trip(ledger=True). Each trip only INSERTs (travel_log +
+        wallet_ledger). The ledger is then compacted once, and that time
+        is reported separately.
+
+Both modes write real rows. Use a scratch database and a test user with a
+wallet, and keep --concurrency <= DB_POOL_MAX:
+
+    cd backend
+    DB_POOL_MAX=32 python benchmarks/wallet_ledger_contention.py \\
+        --user-id 1 --vehicle-id 42 --trips 4000 --concurrency 32
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from carbon_wallet import log_trip, get_wallet      # noqa: E402
+from wallet_ledger import compact                   # noqa: E402
+from _stats import latency_summary, run_threaded    # noqa: E402
+
+
+def _run(args, trips, ledger):
+    latencies, elapsed = run_threaded(
+        lambda: log_trip(args.user_id, args.distance_km, vehicle_id=args.vehicle_id, ledger=ledger),
+        trips, args.concurrency,
+    )
+    return {
+        "trips":       trips,
+        "elapsed_s":   round(elapsed, 3),
+        "trips_per_s": round(trips / elapsed, 1),
+        **latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--user-id",     type=int, required=True)
+    parser.add_argument("--vehicle-id",  type=int, required=True)
+    parser.add_argument("--distance-km", type=float, default=12.5)
+    parser.add_argument("--trips",       type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for name, ledger in (("direct", False), ("ledger", True)):
+        _run(args, min(50, args.trips), ledger)                  # warm-up
+        compact()
+        results[name] = _run(args, args.trips, ledger)
+
+    t0 = time.perf_counter()
+    applied = compact()
+    results["ledger"]["compaction_s"]   = round(time.perf_counter() - t0, 3)
+    results["ledger"]["compacted_rows"] = applied
+    results["remaining_credits_kg"]     = get_wallet(args.user_id)["remaining_credits_kg"]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.trips} trips for user {args.user_id}, {args.concurrency} parallel writers")
+    print(f"{'mode':<8}{'trips/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name in ("direct", "ledger"):
+        r = results[name]
+        print(f"{name:<8}{r['trips_per_s']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    print(f"\nspeed-up: {results['ledger']['trips_per_s'] / results['direct']['trips_per_s']:.2f}x"
+          f"  (+ {results['ledger']['compaction_s']}s to compact {applied} ledger rows)")
+
+
+if __name__ == "__main__":
+    main()
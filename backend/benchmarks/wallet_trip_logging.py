@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+wallet_trip_logging.py  —  Trips/second: two-connection vs single-statement logging
+===================================================================================
+before  the old /wallet/travel path. One connection runs SELECT * FROM
+        vehicles, then a second connection runs UPDATE carbon_wallet,
+        INSERT travel_log and the rollup upserts as separate
+        statements.
+after   carbon_wallet.log_trip(). The vehicle and its rate come from the
+        data_access / wallet_rates caches, then one pooled connection
+        runs one PREPAREd statement.
+
+Both paths write real rows, so point DB_URI at a scratch database and use a
+test user that has a wallet:
+
+    cd backend
+    python benchmarks/wallet_trip_logging.py --user-id 1 --vehicle-id 42 \\
+        --trips 2000 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wallet_rates                                          # noqa: E402
+from database import get_db_connection                       # noqa: E402
+from carbon_wallet import log_trip, _bump_rollups            # noqa: E402
+from _stats import latency_summary, run_threaded             # noqa: E402
+
+
+def before(user_id, vehicle_id, distance_km, country):
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        cur.execute("SELECT * FROM vehicles WHERE id = %s", (vehicle_id,))
+        columns = [d[0] for d in cur.description]
+        vehicle = dict(zip(columns, cur.fetchone()))
+    finally:
+        cur.close()
+        conn.close()
+
+    emissions_kg = wallet_rates.rate_for(vehicle, country, datetime.utcnow().year) * distance_km / 1000
+
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE carbon_wallet
+            SET remaining_credits_kg = remaining_credits_kg - %s
+            WHERE user_id = %s
+            RETURNING year, total_credits_kg, remaining_credits_kg
+        """, (emissions_kg, user_id))
+        cur.fetchone()
+        cur.execute("""
+            INSERT INTO travel_log (user_id, vehicle_id, distance_km, emissions_kg)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id, created_at
+        """, (user_id, vehicle_id, distance_km, emissions_kg))
+        log_row = cur.fetchone()
+        _bump_rollups(cur, [(user_id, log_row[1], distance_km, emissions_kg)])
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def after(user_id, vehicle_id, distance_km, country):
+    log_trip(user_id, distance_km, vehicle_id=vehicle_id, country=country)
+
+
+def _run(fn, args, trips, concurrency):
+    latencies, elapsed = run_threaded(
+        lambda: fn(args.user_id, args.vehicle_id, args.distance_km, args.country), trips, concurrency
+    )
+    return {
+        "trips":       trips,
+        "elapsed_s":   round(elapsed, 3),
+        "trips_per_s": round(trips / elapsed, 1),
+        **latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--user-id",     type=int, required=True)
+    parser.add_argument("--vehicle-id",  type=int, required=True)
+    parser.add_argument("--distance-km", type=float, default=12.5)
+    parser.add_argument("--country",     default=None)
+    parser.add_argument("--trips",       type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in (("before", before), ("after", after)):
+        _run(fn, args, min(50, args.trips), args.concurrency)      # warm-up
+        results[name] = _run(fn, args, args.trips, args.concurrency)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.trips} trips, concurrency {args.concurrency}")
+    print(f"{'path':<8}{'trips/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<8}{r['trips_per_s']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    print(f"\nspeed-up: {results['after']['trips_per_s'] / results['before']['trips_per_s']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,32 @@ Manages per-user yearly carbon budgets and travel emission logging.
 Uses the existing get_db_connection() — does NOT touch the lifecycle engine.
 """
 
-from database import get_db_connection
-from datetime import datetime
+from database import get_db_connection, pooled_connection, prepare
+from datetime import date, datetime, timedelta
+import os
+import base64
+import binascii
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+import data_access
+import wallet_rates
+import emissions_rank
 
 # ── Constants ──────────────────────────────────────────────────────────────
 YEARLY_BUDGET_KG = 2300.0   # default annual CO₂ allowance per user (kg)
+MAX_BATCH_TRIPS  = 1000     # upper bound for spend_carbon_credits_batch()
+
+# Ledger mode: trips only INSERT (travel_log + wallet_ledger) and never touch
+# the per-user carbon_wallet / rollup rows, so parallel writers for one user
+# don't queue on a row lock. wallet_ledger.compact() folds the pending rows
+# into the wallet and rollups later. Reads always add pending rows on top, so
+# responses are the same in both modes.
+LEDGER_MODE = os.getenv("WALLET_LEDGER_MODE", "").lower() in ("1", "true", "yes")
+
+# Pending (not yet compacted) spend for one user, as a scalar subquery
+_PENDING_KG_SQL = "COALESCE((SELECT SUM(emissions_kg) FROM wallet_ledger WHERE user_id = {user}), 0)"
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -54,11 +75,12 @@ def get_wallet(user_id: int) -> dict | None:
     conn = get_db_connection()
     cur  = conn.cursor()
     try:
-        cur.execute("""
-            SELECT user_id, year, total_credits_kg, remaining_credits_kg
+        cur.execute(f"""
+            SELECT user_id, year, total_credits_kg,
+                   remaining_credits_kg - {_PENDING_KG_SQL.format(user="%s")}
             FROM carbon_wallet
             WHERE user_id = %s
-        """, (user_id,))
+        """, (user_id, user_id))
         row = cur.fetchone()
         if not row:
             return None
@@ -77,102 +99,460 @@ def get_wallet(user_id: int) -> dict | None:
 # EMISSION CALCULATION  (no lifecycle engine dependency)
 # ══════════════════════════════════════════════════════════════════════════════
 
-def _operational_g_per_km(vehicle: dict) -> float | None:
-    """
-    Return the operational emissions rate (g CO₂/km) for a vehicle row.
-    Mirrors engine.py logic for ICE/HEV (tailpipe) only — EV/PHEV rates
-    require a grid factor that isn't available here, so we use stored
-    co2_wltp_gpkm for those too as the best static approximation.
+def _trip_year(logged_at: datetime | None) -> int:
+    """Calendar year a trip is charged against (its logged_at, else now)."""
+    return (logged_at or datetime.utcnow()).year
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# ROLLUPS  (travel_stats_daily / _weekly / _monthly — kept in step with travel_log)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _day_key(ts: datetime) -> tuple:
+    return (ts.date(),)
+
+
+def _week_key(ts: datetime) -> tuple:
+    # ISO week, identified by its Monday — same as date_trunc('week', ...)
+    return (ts.date() - timedelta(days=ts.weekday()),)
+
+
+def _month_key(ts: datetime) -> tuple:
+    return (ts.year, ts.month)
+
+
+# bucket: (table, key columns, key SQL over l.created_at, key from a Python datetime)
+ROLLUPS = {
+    "day":   ("travel_stats_daily",   ("day",),
+              ("l.created_at::date",), _day_key),
+    "week":  ("travel_stats_weekly",  ("week_start",),
+              ("date_trunc('week', l.created_at)::date",), _week_key),
+    "month": ("travel_stats_monthly", ("year", "month"),
+              ("EXTRACT(YEAR FROM l.created_at)::int", "EXTRACT(MONTH FROM l.created_at)::int"),
+              _month_key),
+}
+
+
+def _on_conflict(table: str, keys: tuple) -> str:
+    return f"""
+        ON CONFLICT (user_id, {', '.join(keys)}) DO UPDATE SET
+            trips              = {table}.trips              + EXCLUDED.trips,
+            total_km           = {table}.total_km           + EXCLUDED.total_km,
+            total_emissions_kg = {table}.total_emissions_kg + EXCLUDED.total_emissions_kg
     """
-    vtype     = (vehicle.get("vehicle_type") or "").upper()
-    tailpipe  = vehicle.get("co2_wltp_gpkm")
-    wh_per_km = vehicle.get("electric_wh_per_km")
 
-    if vtype in ("ICE", "HEV"):
-        return float(tailpipe) if tailpipe is not None else None
 
-    if vtype in ("EV", "BEV"):
-        # wh_per_km × 0.233 kgCO₂/kWh (EU average grid) as a reasonable default
-        if wh_per_km is not None:
-            return float(wh_per_km) * 0.233 / 1000 * 1000  # → g/km
-        return None
+def _bump_rollups(cur, logged: list[tuple]):
+    """
+    Fold newly inserted travel_log rows into every rollup table.
+    logged: [(user_id, created_at, distance_km, emissions_kg), ...]
+    Must run on the same cursor/transaction as the travel_log INSERT.
+    """
+    for table, keys, _, key_of in ROLLUPS.values():
+        buckets: dict[tuple, list] = {}
+        for user_id, created_at, distance_km, emissions_kg in logged:
+            b = buckets.setdefault((user_id, *key_of(created_at)), [0, 0.0, 0.0])
+            b[0] += 1
+            b[1] += float(distance_km)
+            b[2] += float(emissions_kg)
+
+        execute_values(cur, f"""
+            INSERT INTO {table}
+                (user_id, {', '.join(keys)}, trips, total_km, total_emissions_kg)
+            VALUES %s
+            {_on_conflict(table, keys)}
+        """, [(*key, *vals) for key, vals in sorted(buckets.items())], page_size=len(buckets))
 
-    if vtype == "PHEV":
-        # Blend: 60 % electric, 40 % ICE (mirrors engine.py PHEV_ELECTRIC_SHARE)
-        if tailpipe is not None and wh_per_km is not None:
-            elec_g_km = float(wh_per_km) * 0.233 / 1000 * 1000
-            return 0.6 * elec_g_km + 0.4 * float(tailpipe)
-        if tailpipe is not None:
-            return float(tailpipe)
-        return None
 
-    return float(tailpipe) if tailpipe is not None else None
+def _rollup_ctes() -> str:
+    """
+    One data-modifying CTE per rollup, fed from the `l` (inserted log row)
+    CTE. Each returns the bucket's new total_emissions_kg.
+    """
+    return ",\n".join(
+        f"""
+    r_{bucket} AS (
+        INSERT INTO {table}
+            (user_id, {', '.join(keys)}, trips, total_km, total_emissions_kg)
+        SELECT $1, {', '.join(exprs)}, 1, $2, l.emissions_kg
+        FROM l
+        {_on_conflict(table, keys)}
+        RETURNING total_emissions_kg
+    )"""
+        for bucket, (table, keys, exprs, _) in ROLLUPS.items()
+    )
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # SPEND  (core wallet operation)
 # ══════════════════════════════════════════════════════════════════════════════
 
-def spend_carbon_credits(user_id: int, vehicle: dict, distance_km: float) -> dict:
+# One statement per trip: debit the wallet, append to travel_log and bump
+# the rollups. The vehicle and its rate are resolved beforehand in Python
+# (data_access + wallet_rates.rate_for), so the rate formula lives in one
+# place. The log insert is gated on the wallet update, so a missing wallet
+# changes nothing; the final SELECT then returns NULLs for w / l.
+# The yearly total before the trip (for emissions_rank) comes from the
+# monthly rollup's RETURNING: the upsert waits on the row lock and adds to
+# the latest committed total, so concurrent trips for one user chain
+# instead of all reading the same statement-snapshot value.
+#   $1 user_id  $2 distance_km  $3 vehicle_id  $4 rate g CO₂/km
+_TRIP_SQL = """
+    WITH w AS (
+        UPDATE carbon_wallet AS cw
+        SET remaining_credits_kg = cw.remaining_credits_kg - $4 * $2 / 1000
+        WHERE cw.user_id = $1
+        RETURNING cw.year, cw.total_credits_kg, cw.remaining_credits_kg
+    ),
+    l AS (
+        INSERT INTO travel_log (user_id, vehicle_id, distance_km, emissions_kg)
+        SELECT $1, $3, $2, $4 * $2 / 1000
+        FROM w
+        RETURNING id, created_at, emissions_kg
+    ),
+    {rollups},
+    y AS (
+        -- the trip's year outside its month; live trips never touch these rows
+        SELECT COALESCE(SUM(m.total_emissions_kg), 0) AS other_months
+        FROM l, travel_stats_monthly AS m
+        WHERE m.user_id = $1
+          AND m.year  =  EXTRACT(YEAR  FROM l.created_at)::int
+          AND m.month <> EXTRACT(MONTH FROM l.created_at)::int
+    )
+    SELECT w.year, w.total_credits_kg, w.remaining_credits_kg,
+           l.id, l.created_at, l.emissions_kg,
+           y.other_months + r_month.total_emissions_kg - l.emissions_kg
+    FROM (SELECT 1) AS one
+    LEFT JOIN w ON TRUE
+    LEFT JOIN l ON TRUE
+    LEFT JOIN r_month ON TRUE
+    LEFT JOIN y ON TRUE
+"""
+
+# Ledger-mode variant: the wallet is only read (snapshot minus pending), and
+# the trip goes to travel_log + wallet_ledger. No row is updated, so
+# concurrent trips for one user never wait on each other.
+_LEDGER_TRIP_SQL = """
+    WITH w AS (
+        SELECT cw.year, cw.total_credits_kg,
+               cw.remaining_credits_kg - {pending} - $4 * $2 / 1000 AS remaining
+        FROM carbon_wallet AS cw
+        WHERE cw.user_id = $1
+    ),
+    l AS (
+        INSERT INTO travel_log (user_id, vehicle_id, distance_km, emissions_kg)
+        SELECT $1, $3, $2, $4 * $2 / 1000
+        FROM w
+        RETURNING id, created_at, emissions_kg
+    ),
+    p AS (
+        INSERT INTO wallet_ledger (log_id, user_id, created_at, distance_km, emissions_kg)
+        SELECT l.id, $1, l.created_at, $2, l.emissions_kg
+        FROM l
+    )
+    SELECT w.year, w.total_credits_kg, w.remaining,
+           l.id, l.created_at, l.emissions_kg, NULL::float8
+    FROM (SELECT 1) AS one
+    LEFT JOIN w ON TRUE
+    LEFT JOIN l ON TRUE
+"""
+
+_TRIP_TYPES = "(int, float8, int, float8)"
+
+
+def log_trip(user_id: int, distance_km: float, *, vehicle_id: int | None = None,
+             brand: str | None = None, model: str | None = None, year: int | None = None,
+             country: str | None = None, ledger: bool | None = None) -> dict:
     """
-    1. Calculate emissions_kg for the trip.
-    2. Deduct from remaining_credits_kg (floor at 0 — allow overdraft tracking).
-    3. Insert row into travel_log.
-    4. Return updated wallet + trip details.
+    Log one trip, identified by vehicle_id or (brand, model, year), on one
+    pooled connection and in one transaction:
+
+    1. Resolve the vehicle through data_access and its rate with
+       wallet_rates.rate_for (EV/PHEV at `country`'s grid intensity). A
+       cached vehicle costs no query; a miss is read on the same connection.
+    2. In one statement, deduct from remaining_credits_kg (allow overdraft
+       tracking), insert the row into travel_log and fold it into the
+       rollups.
+    3. Return updated wallet + trip details.
+
+    With ledger=True (default: LEDGER_MODE) the wallet / rollup updates in
+    step 2 become an append to wallet_ledger, applied later by
+    wallet_ledger.compact().
 
     Raises:
+        LookupError if the vehicle or the wallet is not found.
         ValueError  if vehicle has no usable emissions data.
-        LookupError if wallet not found for user_id.
     """
-    rate_g_per_km = _operational_g_per_km(vehicle)
-    if rate_g_per_km is None:
-        raise ValueError(
-            f"No emissions data available for vehicle "
-            f"'{vehicle.get('brand')} {vehicle.get('model')}'"
-        )
+    if ledger is None:
+        ledger = LEDGER_MODE
+    if ledger:
+        name = "wallet_ledger_trip"
+        sql  = _LEDGER_TRIP_SQL.format(pending=_PENDING_KG_SQL.format(user="$1"))
+    else:
+        name = "wallet_trip"
+        sql  = _TRIP_SQL.format(rollups=_rollup_ctes())
+
+    with pooled_connection() as conn:
+        with data_access.using_connection(conn):
+            if vehicle_id is not None:
+                vehicle = data_access.vehicle_by_id(vehicle_id)
+                missing = f"Vehicle id={vehicle_id} not found"
+            else:
+                vehicle = data_access.vehicle_by_name(brand, model, year)
+                missing = f"Vehicle '{brand} {model} {year}' not found"
+        if vehicle is None:
+            raise LookupError(missing)
+
+        rate = wallet_rates.rate_for(vehicle, country, datetime.utcnow().year)
+        if rate is None:
+            raise ValueError(
+                f"No emissions data available for vehicle '{vehicle.get('brand')} {vehicle.get('model')}'"
+            )
+
+        prepare(conn, f"{name} {_TRIP_TYPES}", sql)
+        with conn.cursor() as cur:
+            cur.execute(
+                f"EXECUTE {name} (%s, %s, %s, %s)",
+                (user_id, float(distance_km), int(vehicle["id"]), float(rate)),
+            )
+            row = cur.fetchone()
+
+        (w_year, w_total, w_remaining, log_id, logged_at, emissions_kg, year_before) = row
+        if w_year is None:
+            raise LookupError(f"No wallet found for user_id={user_id}")
+        conn.commit()
+
+    if year_before is not None:      # ledger mode: recorded at compaction instead
+        emissions_rank.record([(logged_at.year, year_before, year_before + emissions_kg)])
+
+    v_brand, v_model = vehicle.get("brand"), vehicle.get("model")
+    return {
+        "trip": {
+            "log_id":       log_id,
+            "vehicle":      f"{v_brand or ''} {v_model or ''}".strip(),
+            "vehicle_type": vehicle.get("vehicle_type"),
+            "distance_km":  round(float(distance_km), 2),
+            "emissions_kg": round(emissions_kg, 3),
+            "logged_at":    logged_at.isoformat(),
+        },
+        "wallet": {
+            "user_id":              user_id,
+            "year":                 w_year,
+            "total_credits_kg":     w_total,
+            "remaining_credits_kg": round(w_remaining, 3),
+        },
+    }
+
+
+def spend_carbon_credits(user_id: int, vehicle: dict, distance_km: float,
+                         country: str | None = None) -> dict:
+    """log_trip() for callers that already hold the vehicle row."""
+    return log_trip(user_id, distance_km, vehicle_id=vehicle["id"], country=country)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BATCH SPEND  (fleet integrations / offline mobile queues)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _resolve_vehicles(trips: list[dict]) -> tuple[dict, dict]:
+    """
+    Resolve every vehicle referenced by trips through data_access: one
+    lookup for the ids and one for the names. Trips carry either
+    vehicle_id or brand/model/year; names match case-insensitively.
+    Returns (by_id, by_name) lookups of vehicle dicts.
+    """
+    ids   = sorted({int(t["vehicle_id"]) for t in trips if t.get("vehicle_id") is not None})
+    names = sorted({
+        data_access.name_key(t["brand"], t["model"], t["year"])
+        for t in trips if t.get("vehicle_id") is None
+    })
+    by_id   = {k: v for k, v in zip(ids, data_access.vehicles_by_id(ids)) if v}
+    by_name = {k: v for k, v in zip(names, data_access.vehicles_by_name(names)) if v}
+    return by_id, by_name
+
+
+def _yearly_moves(cur, added: list[tuple]) -> list[tuple]:
+    """
+    [(user_id, year, emissions_kg), ...] just added to the rollups →
+    [(year, total_before, total_after), ...] per (user, year) for
+    emissions_rank. Reads the post-update totals in the same transaction.
+    """
+    delta: dict[tuple, float] = {}
+    for user_id, year, kg in added:
+        delta[(user_id, year)] = delta.get((user_id, year), 0.0) + float(kg)
+
+    users, years = zip(*delta)
+    cur.execute("""
+        SELECT user_id, year, SUM(total_emissions_kg)
+        FROM travel_stats_monthly
+        WHERE (user_id, year) IN (SELECT * FROM unnest(%s::int[], %s::int[]))
+        GROUP BY user_id, year
+    """, (list(users), list(years)))
+    return [
+        (year, after - delta[(user_id, year)], after)
+        for user_id, year, after in cur.fetchall()
+    ]
+
+
+def spend_carbon_credits_batch(trips: list[dict]) -> list[dict]:
+    """
+    Batch version of spend_carbon_credits() for many trips at once.
+
+    Each trip: {user_id, distance_km, vehicle_id | (brand, model, year),
+                country (optional, grid for EV/PHEV rates),
+                logged_at (optional naive-UTC datetime for offline uploads)}
 
-    emissions_kg = (rate_g_per_km * float(distance_km)) / 1000.0
+    One connection and one transaction. Vehicles are resolved through
+    data_access (one batched lookup for ids, one for names) and emissions
+    computed as one vector op. Then each user's wallet
+    gets one aggregated UPDATE and all travel_log rows go in as one
+    multi-row INSERT.
+
+    Returns one result per input trip, in order:
+        {"index", "ok": True,  "trip": {...}, "wallet": {...}}
+        {"index", "ok": False, "status": 404|422, "error": "..."}
+    The wallet in each ok result is the balance after the whole batch.
+    """
+    if len(trips) > MAX_BATCH_TRIPS:
+        raise ValueError(f"At most {MAX_BATCH_TRIPS} trips per batch")
+
+    results: list[dict | None] = [None] * len(trips)
 
     conn = get_db_connection()
     cur  = conn.cursor()
     try:
-        # Deduct from wallet — allow going negative (overdraft visible to user)
-        cur.execute("""
-            UPDATE carbon_wallet
-            SET remaining_credits_kg = remaining_credits_kg - %s
-            WHERE user_id = %s
-            RETURNING year, total_credits_kg, remaining_credits_kg
-        """, (emissions_kg, user_id))
-        wallet_row = cur.fetchone()
-        if not wallet_row:
-            raise LookupError(f"No wallet found for user_id={user_id}")
+        by_id, by_name = _resolve_vehicles(trips)
 
-        # Log the trip
-        cur.execute("""
-            INSERT INTO travel_log (user_id, vehicle_id, distance_km, emissions_kg)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id, created_at
-        """, (user_id, vehicle.get("id"), float(distance_km), emissions_kg))
-        log_row = cur.fetchone()
+        # ── resolve + rate each trip ────────────────────────────────────────
+        ok_idx, vehicles, rates = [], [], []
+        for i, t in enumerate(trips):
+            if t.get("vehicle_id") is not None:
+                vehicle = by_id.get(int(t["vehicle_id"]))
+                missing = f"Vehicle id={t['vehicle_id']} not found"
+            else:
+                vehicle = by_name.get(data_access.name_key(t["brand"], t["model"], t["year"]))
+                missing = f"Vehicle '{t['brand']} {t['model']} {t['year']}' not found"
+            if vehicle is None:
+                results[i] = {"index": i, "ok": False, "status": 404, "error": missing}
+                continue
 
-        conn.commit()
+            rate = wallet_rates.rate_for(vehicle, t.get("country"), _trip_year(t.get("logged_at")))
+            if rate is None:
+                results[i] = {
+                    "index": i, "ok": False, "status": 422,
+                    "error": (
+                        f"No emissions data available for vehicle "
+                        f"'{vehicle.get('brand')} {vehicle.get('model')}'"
+                    ),
+                }
+                continue
 
-        return {
-            "trip": {
-                "log_id":       log_row[0],
-                "vehicle":      f"{vehicle.get('brand', '')} {vehicle.get('model', '')}".strip(),
-                "vehicle_type": vehicle.get("vehicle_type"),
-                "distance_km":  round(float(distance_km), 2),
-                "emissions_kg": round(emissions_kg, 3),
-                "logged_at":    log_row[1].isoformat(),
-            },
-            "wallet": {
-                "user_id":              user_id,
-                "year":                 wallet_row[0],
-                "total_credits_kg":     wallet_row[1],
-                "remaining_credits_kg": round(wallet_row[2], 3),
-            },
+            ok_idx.append(i)
+            vehicles.append(vehicle)
+            rates.append(rate)
+
+        if not ok_idx:
+            return results
+
+        user_ids  = np.array([int(trips[i]["user_id"]) for i in ok_idx], dtype=np.int64)
+        distances = np.array([float(trips[i]["distance_km"]) for i in ok_idx])
+        emissions = np.asarray(rates) * distances / 1000.0
+
+        # ── one aggregated wallet UPDATE per user (ledger mode: read only) ──
+        users, inverse = np.unique(user_ids, return_inverse=True)
+        spent = np.bincount(inverse, weights=emissions)
+
+        pending = _PENDING_KG_SQL.format(user="w.user_id")
+        if LEDGER_MODE:
+            wallet_sql = f"""
+                SELECT w.user_id, w.year, w.total_credits_kg,
+                       w.remaining_credits_kg - {pending} - v.spent
+                FROM carbon_wallet AS w
+                JOIN (VALUES %s) AS v(user_id, spent) ON v.user_id = w.user_id
+            """
+        else:
+            wallet_sql = f"""
+                UPDATE carbon_wallet AS w
+                SET remaining_credits_kg = w.remaining_credits_kg - v.spent
+                FROM (VALUES %s) AS v(user_id, spent)
+                WHERE w.user_id = v.user_id
+                RETURNING w.user_id, w.year, w.total_credits_kg,
+                          w.remaining_credits_kg - {pending}
+            """
+        wallets = execute_values(cur, wallet_sql, list(zip(users.tolist(), spent.tolist())),
+            template="(%s::int, %s::float8)", page_size=len(users), fetch=True)
+        wallet_by_user = {
+            row[0]: {
+                "user_id":              row[0],
+                "year":                 row[1],
+                "total_credits_kg":     row[2],
+                "remaining_credits_kg": round(row[3], 3),
+            }
+            for row in wallets
         }
+
+        # ── bulk INSERT travel_log for trips whose wallet exists ─────────────
+        log_rows, log_idx = [], []
+        for k, i in enumerate(ok_idx):
+            uid = int(user_ids[k])
+            if uid not in wallet_by_user:
+                results[i] = {
+                    "index": i, "ok": False, "status": 404,
+                    "error": f"No wallet found for user_id={uid}",
+                }
+                continue
+            log_idx.append(k)
+            log_rows.append((
+                uid, vehicles[k]["id"], float(distances[k]), float(emissions[k]),
+                trips[i].get("logged_at"),
+            ))
+
+        logged = []
+        if log_rows:
+            logged = execute_values(cur, """
+                INSERT INTO travel_log (user_id, vehicle_id, distance_km, emissions_kg, created_at)
+                VALUES %s
+                RETURNING id, created_at
+            """, log_rows,
+                template="(%s, %s, %s, %s, COALESCE(%s::timestamp, CURRENT_TIMESTAMP))",
+                page_size=len(log_rows), fetch=True)
+            applied = [
+                (row[0], created_at, row[2], row[3])
+                for row, (_, created_at) in zip(log_rows, logged)
+            ]
+            if LEDGER_MODE:
+                execute_values(cur, """
+                    INSERT INTO wallet_ledger (log_id, user_id, created_at, distance_km, emissions_kg)
+                    VALUES %s
+                """, [(log_id, *a) for (log_id, _), a in zip(logged, applied)],
+                    page_size=len(applied))
+            else:
+                _bump_rollups(cur, applied)
+                rank_updates = _yearly_moves(cur, [
+                    (uid, created_at.year, kg) for uid, created_at, _, kg in applied
+                ])
+
+        conn.commit()
+        if logged and not LEDGER_MODE:
+            emissions_rank.record(rank_updates)
+
+        for k, (log_id, created_at) in zip(log_idx, logged):
+            i       = ok_idx[k]
+            vehicle = vehicles[k]
+            results[i] = {
+                "index": i,
+                "ok":    True,
+                "trip": {
+                    "log_id":       log_id,
+                    "vehicle":      f"{vehicle.get('brand', '')} {vehicle.get('model', '')}".strip(),
+                    "vehicle_type": vehicle.get("vehicle_type"),
+                    "distance_km":  round(float(distances[k]), 2),
+                    "emissions_kg": round(float(emissions[k]), 3),
+                    "logged_at":    created_at.isoformat(),
+                },
+                "wallet": wallet_by_user[int(user_ids[k])],
+            }
+        return results
     except Exception:
         conn.rollback()
         raise
@@ -185,67 +565,282 @@ def spend_carbon_credits(user_id: int, vehicle: dict, distance_km: float) -> dic
 # TRAVEL LOG HISTORY
 # ══════════════════════════════════════════════════════════════════════════════
 
-def get_travel_log(user_id: int, limit: int = 50) -> list[dict]:
-    """Return the most recent `limit` trips for user_id."""
+_LOG_COLUMNS = """
+    tl.id,
+    tl.distance_km,
+    tl.emissions_kg,
+    tl.created_at,
+    v.brand,
+    v.model,
+    v.year,
+    v.vehicle_type
+"""
+
+EXPORT_BATCH_ROWS = 1000
+
+
+def _log_row(r) -> dict:
+    return {
+        "log_id":       r[0],
+        "distance_km":  r[1],
+        "emissions_kg": r[2],
+        "logged_at":    r[3].isoformat() if r[3] else None,
+        "vehicle":      f"{r[4] or ''} {r[5] or ''}".strip() or None,
+        "year":         r[6],
+        "vehicle_type": r[7],
+    }
+
+
+def encode_log_cursor(trip: dict) -> str:
+    """Opaque page cursor pointing just past `trip` (newest-first order)."""
+    raw = f"{trip['logged_at']}|{trip['log_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_log_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_log_cursor(). Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        logged_at, log_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(logged_at), int(log_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def get_travel_log(user_id: int, limit: int = 50,
+                   before: tuple[datetime, int] | None = None) -> list[dict]:
+    """
+    Return up to `limit` trips for user_id, newest first.
+
+    before: (created_at, id) of the last trip on the previous page — see
+    decode_log_cursor(). Keyset pagination, so page N costs the same as
+    page 1 on idx_travel_log_user_keyset.
+    """
     conn = get_db_connection()
     cur  = conn.cursor()
     try:
-        cur.execute("""
-            SELECT
-                tl.id,
-                tl.distance_km,
-                tl.emissions_kg,
-                tl.created_at,
-                v.brand,
-                v.model,
-                v.year,
-                v.vehicle_type
+        if before is None:
+            cur.execute(f"""
+                SELECT {_LOG_COLUMNS}
+                FROM travel_log tl
+                LEFT JOIN vehicles v ON v.id = tl.vehicle_id
+                WHERE tl.user_id = %s
+                ORDER BY tl.created_at DESC, tl.id DESC
+                LIMIT %s
+            """, (user_id, limit))
+        else:
+            cur.execute(f"""
+                SELECT {_LOG_COLUMNS}
+                FROM travel_log tl
+                LEFT JOIN vehicles v ON v.id = tl.vehicle_id
+                WHERE tl.user_id = %s
+                  AND (tl.created_at, tl.id) < (%s, %s)
+                ORDER BY tl.created_at DESC, tl.id DESC
+                LIMIT %s
+            """, (user_id, before[0], before[1], limit))
+        return [_log_row(r) for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def iter_travel_log(user_id: int, batch_size: int = EXPORT_BATCH_ROWS):
+    """
+    Yield every trip for user_id, newest first, through a server-side
+    cursor. Only `batch_size` rows are held in memory at a time, however
+    long the log is. The connection closes when the generator is exhausted
+    or closed, e.g. when the client disconnects mid-export.
+    """
+    conn = get_db_connection()
+    cur  = conn.cursor(name=f"travel_log_export_{user_id}")
+    cur.itersize = batch_size
+    try:
+        cur.execute(f"""
+            SELECT {_LOG_COLUMNS}
             FROM travel_log tl
             LEFT JOIN vehicles v ON v.id = tl.vehicle_id
             WHERE tl.user_id = %s
-            ORDER BY tl.created_at DESC
-            LIMIT %s
-        """, (user_id, limit))
-        rows = cur.fetchall()
-        return [
-            {
-                "log_id":       r[0],
-                "distance_km":  r[1],
-                "emissions_kg": r[2],
-                "logged_at":    r[3].isoformat() if r[3] else None,
-                "vehicle":      f"{r[4] or ''} {r[5] or ''}".strip() or None,
-                "year":         r[6],
-                "vehicle_type": r[7],
-            }
-            for r in rows
-        ]
+            ORDER BY tl.created_at DESC, tl.id DESC
+        """, (user_id,))
+        for r in cur:
+            yield _log_row(r)
     finally:
         cur.close()
+        conn.rollback()
         conn.close()
 
 
-def get_yearly_stats(user_id: int) -> dict:
-    """Aggregate stats for the current calendar year."""
-    year = datetime.utcnow().year
+def _pending_rows_sql(*key_exprs: str) -> str:
+    """
+    Not-yet-compacted trips for one user in [start, end), shaped like rollup
+    rows: (*keys, trips, total_km, total_emissions_kg). Key expressions are
+    written against l.created_at. Params: user_id, start, end.
+    """
+    keys = "".join(f"{k}, " for k in key_exprs)
+    return f"""
+                SELECT {keys}1, l.distance_km, l.emissions_kg
+                FROM wallet_ledger AS l
+                WHERE l.user_id = %s AND l.created_at >= %s AND l.created_at < %s"""
+
+
+def get_yearly_stats(user_id: int, year: int | None = None) -> dict:
+    """
+    Aggregate stats for `year` (default: the current calendar year).
+    Reads at most 12 travel_stats_monthly rows by primary key (plus any
+    not-yet-compacted wallet_ledger rows), so the cost does not grow with
+    the user's travel_log history.
+    """
+    year = year or datetime.utcnow().year
     conn = get_db_connection()
     cur  = conn.cursor()
     try:
-        cur.execute("""
+        cur.execute(f"""
             SELECT
-                COUNT(*)            AS trips,
-                COALESCE(SUM(distance_km),  0) AS total_km,
-                COALESCE(SUM(emissions_kg), 0) AS total_emissions_kg
-            FROM travel_log
-            WHERE user_id = %s
-              AND EXTRACT(YEAR FROM created_at) = %s
-        """, (user_id, year))
+                COALESCE(SUM(trips), 0)              AS trips,
+                COALESCE(SUM(total_km), 0)           AS total_km,
+                COALESCE(SUM(total_emissions_kg), 0) AS total_emissions_kg
+            FROM (
+                SELECT trips, total_km, total_emissions_kg
+                FROM travel_stats_monthly
+                WHERE user_id = %s AND year = %s
+                UNION ALL
+                {_pending_rows_sql()}
+            ) t
+        """, (user_id, year, user_id, date(year, 1, 1), date(year + 1, 1, 1)))
         row = cur.fetchone()
         return {
             "year":                year,
-            "trips":               row[0],
+            "trips":               int(row[0]),
             "total_km":            round(row[1], 1),
             "total_emissions_kg":  round(row[2], 3),
         }
     finally:
         cur.close()
         conn.close()
+
+
+def get_monthly_stats(user_id: int, year: int | None = None) -> dict:
+    """Per-month stats for `year` (default: current), all 12 months present."""
+    if year is None:
+        year = datetime.utcnow().year
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT month, SUM(trips), SUM(total_km), SUM(total_emissions_kg)
+            FROM (
+                SELECT month, trips, total_km, total_emissions_kg
+                FROM travel_stats_monthly
+                WHERE user_id = %s AND year = %s
+                UNION ALL
+                {_pending_rows_sql("EXTRACT(MONTH FROM l.created_at)::int")}
+            ) t
+            GROUP BY month
+        """, (user_id, year, user_id, date(year, 1, 1), date(year + 1, 1, 1)))
+        by_month = {r[0]: r for r in cur.fetchall()}
+        return {
+            "year": year,
+            "months": [
+                {
+                    "month":              m,
+                    "trips":              by_month[m][1] if m in by_month else 0,
+                    "total_km":           round(by_month[m][2], 1) if m in by_month else 0.0,
+                    "total_emissions_kg": round(by_month[m][3], 3) if m in by_month else 0.0,
+                }
+                for m in range(1, 13)
+            ],
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+
+MAX_SERIES_POINTS = 1000
+
+
+def _bucket_start(bucket: str, d: date) -> date:
+    if bucket == "week":
+        return d - timedelta(days=d.weekday())
+    if bucket == "month":
+        return d.replace(day=1)
+    return d
+
+
+def _next_bucket(bucket: str, d: date) -> date:
+    if bucket == "day":
+        return d + timedelta(days=1)
+    if bucket == "week":
+        return d + timedelta(weeks=1)
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def get_series(user_id: int, bucket: str, start: date, end: date) -> dict:
+    """
+    Dense time series for [start, end] at day / week (ISO, Monday-start) /
+    month resolution. One index range read on the matching rollup table
+    (plus pending wallet_ledger rows); empty periods are filled with zeros
+    here.
+
+    Raises ValueError for an unknown bucket, an inverted range, or more
+    than MAX_SERIES_POINTS periods.
+    """
+    if bucket not in ROLLUPS:
+        raise ValueError(f"Unknown bucket {bucket!r}; use one of {', '.join(ROLLUPS)}")
+    start, end = _bucket_start(bucket, start), _bucket_start(bucket, end)
+    if end < start:
+        raise ValueError("'from' must not be after 'to'")
+
+    periods = []
+    d = start
+    while d <= end:
+        periods.append(d)
+        if len(periods) > MAX_SERIES_POINTS:
+            raise ValueError(f"Range covers more than {MAX_SERIES_POINTS} {bucket}s")
+        d = _next_bucket(bucket, d)
+
+    table, keys, exprs, _ = ROLLUPS[bucket]
+    if bucket == "month":
+        where = "(year, month) BETWEEN (%s, %s) AND (%s, %s)"
+        params = (start.year, start.month, end.year, end.month)
+    else:
+        where = f"{keys[0]} BETWEEN %s AND %s"
+        params = (start, end)
+
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT {', '.join(keys)}, SUM(trips), SUM(total_km), SUM(total_emissions_kg)
+            FROM (
+                SELECT {', '.join(keys)}, trips, total_km, total_emissions_kg
+                FROM {table}
+                WHERE user_id = %s AND {where}
+                UNION ALL
+                {_pending_rows_sql(*exprs)}
+            ) t
+            GROUP BY {', '.join(keys)}
+        """, (user_id, *params, user_id, start, _next_bucket(bucket, end)))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    if bucket == "month":
+        found = {date(r[0], r[1], 1): r[2:] for r in rows}
+    else:
+        found = {r[0]: r[1:] for r in rows}
+
+    return {
+        "bucket": bucket,
+        "from":   start.isoformat(),
+        "to":     end.isoformat(),
+        "points": [
+            {
+                "period":             p.isoformat(),
+                "trips":              found[p][0] if p in found else 0,
+                "total_km":           round(found[p][1], 1) if p in found else 0.0,
+                "total_emissions_kg": round(found[p][2], 3) if p in found else 0.0,
+            }
+            for p in periods
+        ],
+    }
@@ -66,6 +66,7 @@ Usage
 
 from __future__ import annotations
 
+import os
 import re
 import time
 import logging
@@ -222,7 +223,7 @@ class BraveBackend:
     Get a free API key at https://api.search.brave.com
     Install: pip install requests
     """
-    BASE_URL = "https://api.search.brave.com/res/v1/web/search"
+    BASE_URL = os.getenv("BRAVE_SEARCH_URL", "https://api.search.brave.com/res/v1/web/search")
 
     def __init__(self, api_key: str):
         self.api_key = api_key
@@ -0,0 +1,702 @@
+"""
+data_access.py  —  One place for vehicle / grid / image lookups
+================================================================
+Routes and engine code ask for reference rows through this module instead
+of opening their own connection and running their own copy of the query:
+
+    vehicle  = data_access.vehicle("Tesla", "Model 3", 2022)
+    a, b     = data_access.vehicles([key_a, key_b])        # one query
+    row      = data_access.vehicle_by_id(42)
+    row      = data_access.vehicle_by_name("tesla", "MODEL 3", 2022)   # case-insensitive
+    image    = data_access.vehicle_image("Tesla", "Model 3", 2022)
+    grid     = data_access.grid_intensity("DEU", 2023)
+
+Three layers:
+
+  Backend   where rows come from. PostgresBackend (falls back to the
+            snapshot per snapshot.with_fallback), SnapshotBackend (the
+            mapped bundle) and MemoryBackend (plain dicts, for tests and
+            benchmarks). Every lookup is a batch method: keys in, {key: value} out.
+
+  Loader    DataLoader-style, one per lookup kind per request. Identical
+            keys are fetched once per request, and keys passed to prime()
+            are fetched together on the next load(). Web requests run
+            inside request_scope(), opened by app.py's before_request hook.
+            Outside a scope every call gets a fresh loader, so there is no
+            batching but results are still correct.
+
+  Caches    hooks consulted before the backend: add_cache(hook) with
+            get(kind, key) / put(kind, key, value). The default is
+            VersionedLRU, which drops entries when data_versions moves.
+            afdc_vehicles is loaded out of band, so image entries also
+            expire after IMAGE_CACHE_TTL_S in case nobody bumps "afdc_vehicles".
+            Misses (None) are kept for MISS_CACHE_TTL_S only, so a row
+            added without a data_versions bump shows up within that time.
+
+set_backend() swaps the backend process-wide (benchmarks, tests, tools).
+Inside using_connection(conn), Postgres misses run on the caller's
+connection (and transaction) instead of opening one of their own.
+"""
+
+import os
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+import data_versions
+import snapshot
+from database import get_db_connection
+
+# ── Constants ──────────────────────────────────────────────────────────────
+CACHE_MAX_ENTRIES = 20_000
+IMAGE_CACHE_TTL_S = float(os.getenv("IMAGE_CACHE_TTL_S", "3600"))
+MISS_CACHE_TTL_S  = float(os.getenv("MISS_CACHE_TTL_S", "30"))
+MISS = object()
+
+# lookup kind → (backend batch method, data_versions counter its rows come from)
+KINDS = {
+    "vehicle":         ("vehicles",          data_versions.VEHICLES),
+    "vehicle_by_id":   ("vehicles_by_id",    data_versions.VEHICLES),
+    "vehicle_by_name": ("vehicles_by_name",  data_versions.VEHICLES),
+    "vehicle_image":   ("vehicle_images",    data_versions.IMAGES),
+    "grid":            ("grid",              data_versions.GRID),
+    "grid_average":    ("grid_average",      data_versions.GRID),
+}
+KIND_TTL_S = {"vehicle_image": IMAGE_CACHE_TTL_S}
+
+
+def vehicle_key(brand, model, year) -> tuple | None:
+    """(brand, model, int year), or None when year isn't a number."""
+    try:
+        return (brand, model, int(year))
+    except (TypeError, ValueError):
+        return None
+
+
+def name_key(brand, model, year) -> tuple | None:
+    """Case- and whitespace-insensitive vehicle_key, as the wallet matches names."""
+    try:
+        return (str(brand).strip().lower(), str(model).strip().lower(), int(year))
+    except (TypeError, ValueError):
+        return None
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BACKENDS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class MemoryBackend:
+    """Reference rows held as lists of dicts: {"vehicles": [...], ...}."""
+
+    name = "memory"
+
+    def __init__(self, tables: dict):
+        self._tables = tables
+        self._index  = {}
+
+    def rows(self, table: str) -> list[dict]:
+        return self._tables.get(table, [])
+
+    def _vehicle_index(self) -> dict:
+        if "vehicles" not in self._index:
+            idx = {}
+            for r in sorted(self.rows("vehicles"), key=lambda r: r.get("id") or 0):
+                idx.setdefault((r["brand"], r["model"], r["year"]), r)
+            self._index["vehicles"] = idx
+        return self._index["vehicles"]
+
+    def vehicles(self, keys: list) -> dict:
+        idx = self._vehicle_index()
+        return {k: (dict(idx[k]) if k in idx else None) for k in keys}
+
+    def vehicles_by_id(self, keys: list) -> dict:
+        if "vehicles_by_id" not in self._index:
+            self._index["vehicles_by_id"] = {r["id"]: r for r in self.rows("vehicles")}
+        idx = self._index["vehicles_by_id"]
+        return {k: (dict(idx[k]) if k in idx else None) for k in keys}
+
+    def vehicles_by_name(self, keys: list) -> dict:
+        if "vehicles_by_name" not in self._index:
+            idx = {}
+            for r in sorted(self.rows("vehicles"), key=lambda r: r.get("id") or 0):
+                idx.setdefault(name_key(r["brand"], r["model"], r["year"]), r)
+            self._index["vehicles_by_name"] = idx
+        idx = self._index["vehicles_by_name"]
+        return {k: (dict(idx[k]) if k in idx else None) for k in keys}
+
+    def search_vehicles(self, filters: dict) -> list[dict]:
+        rows = self.rows("vehicles")
+        for k, v in filters.items():
+            if k == "year":
+                rows = [r for r in rows if r["year"] == int(v)]
+            elif k in ("brand", "model", "vehicle_type"):
+                needle = str(v).lower()
+                rows = [r for r in rows if needle in (r.get(k) or "").lower()]
+        return [dict(r) for r in rows]
+
+    def vehicle_images(self, keys: list) -> dict:
+        usable = [
+            r for r in self.rows("afdc_vehicles")
+            if r.get("image_url") and r["image_url"].strip() and r["image_url"] != "NaN"
+        ]
+        out = {}
+        for key in keys:
+            brand, model, year = key
+            hits = [
+                r for r in usable
+                if (r.get("brand") or "").lower() == str(brand).lower()
+                and str(model).lower() in (r.get("model") or "").lower()
+            ]
+            if year is not None:
+                hits.sort(key=lambda r: abs((r.get("year") or 0) - year))
+            out[key] = (hits[0]["image_url"], hits[0].get("manufacturer_url")) if hits else None
+        return out
+
+    def _grid_index(self) -> dict:
+        if "grid" not in self._index:
+            idx = {}
+            for r in self.rows("grid_intensity"):
+                idx.setdefault((r["country_code"], r["year"]), r["carbon_intensity_gco2_per_kwh"])
+            self._index["grid"] = idx
+        return self._index["grid"]
+
+    def grid(self, keys: list) -> dict:
+        idx = self._grid_index()
+        return {k: idx.get(k) for k in keys}
+
+    def grid_average(self, years: list) -> dict:
+        out = {}
+        for year in years:
+            values = [v for (_, y), v in self._grid_index().items() if y == year and v is not None]
+            out[year] = sum(values) / len(values) if values else None
+        return out
+
+
+class SnapshotBackend(MemoryBackend):
+    """
+    MemoryBackend over a mapped snapshot bundle. Lookups run on the column
+    arrays; only the rows they return are turned into dicts.
+    """
+
+    name = "snapshot"
+
+    def __init__(self, snap):
+        super().__init__({})
+        self.snap = snap
+
+    def _has(self, table: str) -> bool:
+        return table in self.snap.manifest["tables"]
+
+    def rows(self, table: str) -> list[dict]:
+        return self.snap.rows(table) if self._has(table) else []
+
+    def _pick(self, table: str, keys: list, hits: dict) -> dict:
+        """{key: row dict | None}, materialising only the row indexes in `hits`."""
+        rows = dict(zip(hits, self.snap.rows_at(table, list(hits.values()))))
+        return {k: rows.get(k) for k in keys}
+
+    def _lower(self, table: str, name: str) -> np.ndarray:
+        """Lower-cased string column (NULL is ""), kept for the backend's lifetime."""
+        key = ("lower", table, name)
+        if key not in self._index:
+            col = self.snap.column(table, name)
+            self._index[key] = np.char.lower(col) if col.dtype.kind == "U" else np.full(len(col), "")
+        return self._index[key]
+
+    def _id_order(self) -> tuple[np.ndarray, np.ndarray]:
+        """(sorted vehicle ids, row index of each) for searchsorted lookups."""
+        if "id_order" not in self._index:
+            ids   = np.asarray(self.snap.column("vehicles", "id"))
+            order = np.argsort(ids, kind="stable")
+            self._index["id_order"] = (ids[order], order)
+        return self._index["id_order"]
+
+    def _key_index(self, name: str, key_of) -> dict:
+        """{key_of(brand, model, year): row index}, lowest id winning."""
+        if name not in self._index:
+            brand, model, year = (self.snap.values("vehicles", c) for c in ("brand", "model", "year"))
+            idx = {}
+            for i in self._id_order()[1].tolist():
+                idx.setdefault(key_of(brand[i], model[i], year[i]), i)
+            self._index[name] = idx
+        return self._index[name]
+
+    def vehicles(self, keys: list) -> dict:
+        if not self._has("vehicles"):
+            return {k: None for k in keys}
+        idx = self._key_index("vehicles", lambda b, m, y: (b, m, y))
+        return self._pick("vehicles", keys, {k: idx[k] for k in keys if k in idx})
+
+    def vehicles_by_id(self, keys: list) -> dict:
+        if not self._has("vehicles"):
+            return {k: None for k in keys}
+        ids, order = self._id_order()
+        hits = {}
+        for k in keys:
+            pos = int(np.searchsorted(ids, k))
+            if pos < len(ids) and ids[pos] == k:
+                hits[k] = int(order[pos])
+        return self._pick("vehicles", keys, hits)
+
+    def vehicles_by_name(self, keys: list) -> dict:
+        if not self._has("vehicles"):
+            return {k: None for k in keys}
+        idx = self._key_index("vehicles_by_name", name_key)
+        return self._pick("vehicles", keys, {k: idx[k] for k in keys if k in idx})
+
+    def search_vehicles(self, filters: dict) -> list[dict]:
+        if not self._has("vehicles"):
+            return []
+        keep = np.ones(len(self.snap.column("vehicles", "id")), dtype=bool)
+        for k, v in filters.items():
+            if k == "year":
+                keep &= np.asarray(self.snap.column("vehicles", "year")) == int(v)
+                nulls = self.snap.nulls("vehicles", "year")
+                if nulls is not None:
+                    keep &= ~nulls
+            elif k in ("brand", "model", "vehicle_type"):
+                keep &= np.char.find(self._lower("vehicles", k), str(v).lower()) >= 0
+        return self.snap.rows_at("vehicles", np.flatnonzero(keep))
+
+    def vehicle_images(self, keys: list) -> dict:
+        table = "afdc_vehicles"
+        if not self._has(table) or self.snap.column(table, "image_url").dtype.kind != "U":
+            return {k: None for k in keys}
+        if "image_usable" not in self._index:
+            url = self.snap.column(table, "image_url")
+            self._index["image_usable"] = (np.char.strip(url) != "") & (url != "NaN")
+            self._index["image_year"]   = np.nan_to_num(np.asarray(self.snap.column(table, "year"), dtype=float))
+        usable, years = self._index["image_usable"], self._index["image_year"]
+        brands, models = self._lower(table, "brand"), self._lower(table, "model")
+
+        out = {}
+        for key in keys:
+            brand, model, year = key
+            hits = np.flatnonzero(usable & (brands == str(brand).lower())
+                                  & (np.char.find(models, str(model).lower()) >= 0))
+            if not len(hits):
+                out[key] = None
+                continue
+            best = hits[np.argmin(np.abs(years[hits] - year))] if year is not None else hits[0]
+            row  = self.snap.rows_at(table, [best])[0]
+            out[key] = (row["image_url"], row.get("manufacturer_url"))
+        return out
+
+    def _grid_index(self) -> dict:
+        if "grid" not in self._index:
+            idx = {}
+            if self._has("grid_intensity"):
+                cols = (self.snap.values("grid_intensity", c)
+                        for c in ("country_code", "year", "carbon_intensity_gco2_per_kwh"))
+                for country, year, value in zip(*cols):
+                    idx.setdefault((country, year), value)
+            self._index["grid"] = idx
+        return self._index["grid"]
+
+
+def _snapshot_backend(snap) -> SnapshotBackend:
+    return snap.memo("data_access_backend", SnapshotBackend)
+
+
+class PostgresBackend:
+    """Batched queries; each method falls back to the snapshot when the DB is down."""
+
+    name = "postgres"
+
+    def _run(self, sql_fn, method: str, *args):
+        return snapshot.with_fallback(
+            lambda: sql_fn(*args),
+            lambda snap: getattr(_snapshot_backend(snap), method)(*args),
+        )
+
+    @staticmethod
+    def _query(sql: str, params) -> tuple[list, list]:
+        borrowed = _connection.get()
+        conn = borrowed or get_db_connection()
+        cur  = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            return [d[0] for d in cur.description], cur.fetchall()
+        finally:
+            cur.close()
+            if borrowed is None:
+                conn.close()
+
+    # ── vehicles ───────────────────────────────────────────────────────────
+    def vehicles(self, keys: list) -> dict:
+        return self._run(self._vehicles, "vehicles", keys)
+
+    def _vehicles(self, keys: list) -> dict:
+        cols, rows = self._query("""
+            SELECT DISTINCT ON (v.brand, v.model, v.year) v.*
+            FROM vehicles v
+            JOIN unnest(%s::text[], %s::text[], %s::int[]) AS k(brand, model, year)
+              ON v.brand = k.brand AND v.model = k.model AND v.year = k.year
+            ORDER BY v.brand, v.model, v.year, v.id
+        """, ([k[0] for k in keys], [k[1] for k in keys], [k[2] for k in keys]))
+        found = {}
+        for row in rows:
+            r = dict(zip(cols, row))
+            found[(r["brand"], r["model"], r["year"])] = r
+        return {k: found.get(k) for k in keys}
+
+    def vehicles_by_id(self, keys: list) -> dict:
+        return self._run(self._vehicles_by_id, "vehicles_by_id", keys)
+
+    def _vehicles_by_id(self, keys: list) -> dict:
+        cols, rows = self._query("SELECT * FROM vehicles WHERE id = ANY(%s)", (list(keys),))
+        found = {r["id"]: r for r in (dict(zip(cols, row)) for row in rows)}
+        return {k: found.get(k) for k in keys}
+
+    def vehicles_by_name(self, keys: list) -> dict:
+        return self._run(self._vehicles_by_name, "vehicles_by_name", keys)
+
+    def _vehicles_by_name(self, keys: list) -> dict:
+        # keys are already lower-cased; several rows can share a name, lowest id wins
+        cols, rows = self._query("""
+            SELECT DISTINCT ON (LOWER(v.brand), LOWER(v.model), v.year) v.*
+            FROM vehicles v
+            JOIN unnest(%s::text[], %s::text[], %s::int[]) AS k(brand, model, year)
+              ON LOWER(v.brand) = k.brand AND LOWER(v.model) = k.model AND v.year = k.year
+            ORDER BY LOWER(v.brand), LOWER(v.model), v.year, v.id
+        """, ([k[0] for k in keys], [k[1] for k in keys], [k[2] for k in keys]))
+        found = {}
+        for row in rows:
+            r = dict(zip(cols, row))
+            found[name_key(r["brand"], r["model"], r["year"])] = r
+        return {k: found.get(k) for k in keys}
+
+    def search_vehicles(self, filters: dict) -> list[dict]:
+        return self._run(self._search_vehicles, "search_vehicles", filters)
+
+    def _search_vehicles(self, filters: dict) -> list[dict]:
+        query, params = "SELECT * FROM vehicles WHERE TRUE", []
+        for k, v in filters.items():
+            if k == "year":
+                query += " AND year = %s"
+                params.append(v)
+            elif k in ("brand", "model", "vehicle_type"):
+                query += f" AND LOWER({k}) LIKE %s"
+                params.append(f"%{str(v).lower()}%")
+        cols, rows = self._query(query, params)
+        return [dict(zip(cols, row)) for row in rows]
+
+    # ── images (afdc_vehicles) ─────────────────────────────────────────────
+    def vehicle_images(self, keys: list) -> dict:
+        return self._run(self._vehicle_images, "vehicle_images", keys)
+
+    def _vehicle_images(self, keys: list) -> dict:
+        # exact year first (distance 0), then the nearest year
+        _, rows = self._query("""
+            SELECT k.i, a.image_url, a.manufacturer_url
+            FROM unnest(%s::text[], %s::text[], %s::int[]) WITH ORDINALITY AS k(brand, model, year, i)
+            JOIN LATERAL (
+                SELECT image_url, manufacturer_url
+                FROM afdc_vehicles
+                WHERE LOWER(brand) = LOWER(k.brand)
+                  AND LOWER(model) LIKE LOWER('%%' || k.model || '%%')
+                  AND image_url IS NOT NULL
+                  AND image_url != 'NaN'
+                ORDER BY ABS(year - k.year)
+                LIMIT 1
+            ) a ON TRUE
+        """, ([k[0] for k in keys], [k[1] for k in keys], [k[2] for k in keys]))
+        by_index = {i: (url, mfr) for i, url, mfr in rows}
+        return {k: by_index.get(i + 1) for i, k in enumerate(keys)}
+
+    # ── grid ───────────────────────────────────────────────────────────────
+    def grid(self, keys: list) -> dict:
+        return self._run(self._grid, "grid", keys)
+
+    def _grid(self, keys: list) -> dict:
+        _, rows = self._query("""
+            SELECT DISTINCT ON (g.country_code, g.year)
+                   g.country_code, g.year, g.carbon_intensity_gco2_per_kwh
+            FROM grid_intensity g
+            JOIN unnest(%s::text[], %s::int[]) AS k(code, year)
+              ON g.country_code = k.code AND g.year = k.year
+        """, ([k[0] for k in keys], [k[1] for k in keys]))
+        found = {(code, year): value for code, year, value in rows}
+        return {k: found.get(k) for k in keys}
+
+    def grid_average(self, years: list) -> dict:
+        return self._run(self._grid_average, "grid_average", years)
+
+    def _grid_average(self, years: list) -> dict:
+        _, rows = self._query("""
+            SELECT year, AVG(carbon_intensity_gco2_per_kwh)
+            FROM grid_intensity WHERE year = ANY(%s)
+            GROUP BY year
+        """, (list(years),))
+        found = {year: avg for year, avg in rows}
+        return {y: found.get(y) for y in years}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                snap = snapshot.current() if snapshot.DATA_SOURCE == "snapshot" else None
+                _backend = _snapshot_backend(snap) if snap is not None else PostgresBackend()
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the process-wide backend; returns the previous one."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CACHE HOOKS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class VersionedLRU:
+    """
+    Process-wide LRU; entries are tied to the data_versions counter of their
+    kind, and kinds listed in KIND_TTL_S also expire after that many seconds.
+    None (not found) expires after MISS_CACHE_TTL_S at most.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(kind: str):
+        return data_versions.current(KINDS[kind][1] if kind in KINDS else kind)
+
+    def get(self, kind: str, key):
+        version = self._version(kind)
+        with self._lock:
+            hit = self._entries.get((kind, key))
+            if hit is None or hit[0] != version or (hit[2] is not None and time.monotonic() > hit[2]):
+                return MISS
+            self._entries.move_to_end((kind, key))
+            return hit[1]
+
+    def put(self, kind: str, key, value):
+        version = self._version(kind)
+        ttl     = KIND_TTL_S.get(kind)
+        if value is None:
+            ttl = min(ttl, MISS_CACHE_TTL_S) if ttl else MISS_CACHE_TTL_S
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[(kind, key)] = (version, value, expires)
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_caches: list = [VersionedLRU()]
+
+
+def add_cache(hook):
+    """hook: object with get(kind, key) → value or data_access.MISS, and put(kind, key, value)."""
+    _caches.append(hook)
+
+
+def clear_caches():
+    """Remove every cache hook (e.g. to benchmark raw backend cost)."""
+    _caches.clear()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# REQUEST-SCOPED LOADERS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class Loader:
+    """Per-request batching + dedupe for one lookup kind."""
+
+    def __init__(self, kind: str, batch_fn):
+        self.kind     = kind
+        self.batch_fn = batch_fn           # list of keys → {key: value}
+        self._values: dict = {}
+        self._queued: dict = {}            # insertion-ordered set
+        self.batches  = 0                  # backend round trips, for tests/metrics
+
+    def prime(self, keys):
+        """Queue keys for the next fetch, so they share one backend call."""
+        for key in keys:
+            if key not in self._values:
+                self._queued[key] = None
+
+    def load(self, key):
+        return self.load_many([key])[0]
+
+    def load_many(self, keys: list) -> list:
+        self.prime(keys)
+        if self._queued:
+            self._dispatch()
+        return [self._values.get(k) for k in keys]
+
+    def _dispatch(self):
+        wanted, self._queued = list(self._queued), {}
+        missing = []
+        for key in wanted:
+            for cache in _caches:
+                value = cache.get(self.kind, key)
+                if value is not MISS:
+                    self._values[key] = value
+                    break
+            else:
+                missing.append(key)
+        if not missing:
+            return
+
+        self.batches += 1
+        fetched = self.batch_fn(missing)
+        for key in missing:
+            value = fetched.get(key)
+            self._values[key] = value
+            for cache in _caches:
+                cache.put(self.kind, key, value)
+
+
+class Scope:
+    """The loaders for one request."""
+
+    def __init__(self, backend=None):
+        self.backend  = backend or get_backend()
+        self._loaders: dict[str, Loader] = {}
+
+    def loader(self, kind: str) -> Loader:
+        if kind not in self._loaders:
+            self._loaders[kind] = Loader(kind, getattr(self.backend, KINDS[kind][0]))
+        return self._loaders[kind]
+
+    def stats(self) -> dict:
+        return {kind: loader.batches for kind, loader in self._loaders.items()}
+
+
+_scope: contextvars.ContextVar[Scope | None] = contextvars.ContextVar("data_access_scope", default=None)
+_connection: contextvars.ContextVar = contextvars.ContextVar("data_access_connection", default=None)
+
+
+@contextmanager
+def using_connection(conn):
+    """Run Postgres backend queries in this block on `conn` (left open, not committed)."""
+    token = _connection.set(conn)
+    try:
+        yield conn
+    finally:
+        _connection.reset(token)
+
+
+def begin_request(backend=None):
+    """Open a scope for the current request; returns a token for end_request()."""
+    return _scope.set(Scope(backend))
+
+
+def end_request(token):
+    _scope.reset(token)
+
+
+@contextmanager
+def request_scope(backend=None):
+    token = begin_request(backend)
+    try:
+        yield _scope.get()
+    finally:
+        end_request(token)
+
+
+def current_scope() -> Scope:
+    return _scope.get() or Scope()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PUBLIC API
+# ══════════════════════════════════════════════════════════════════════════════
+
+def vehicle(brand, model, year) -> dict | None:
+    key = vehicle_key(brand, model, year)
+    row = current_scope().loader("vehicle").load(key) if key else None
+    return dict(row) if row else None
+
+
+def vehicles(refs: list) -> list:
+    """refs: [(brand, model, year), ...] → [row or None, ...] in one backend call."""
+    keys   = [vehicle_key(*ref) for ref in refs]
+    loader = current_scope().loader("vehicle")
+    found  = loader.load_many([k for k in keys if k])
+    by_key = dict(zip([k for k in keys if k], found))
+    return [dict(by_key[k]) if k and by_key.get(k) else None for k in keys]
+
+
+def vehicle_by_id(vehicle_id) -> dict | None:
+    try:
+        key = int(vehicle_id)
+    except (TypeError, ValueError):
+        return None
+    row = current_scope().loader("vehicle_by_id").load(key)
+    return dict(row) if row else None
+
+
+def vehicles_by_id(ids: list) -> list:
+    """[id, ...] → [row or None, ...] in one backend call."""
+    keys = [int(i) for i in ids]
+    return [dict(r) if r else None for r in current_scope().loader("vehicle_by_id").load_many(keys)]
+
+
+def vehicle_by_name(brand, model, year) -> dict | None:
+    """Like vehicle(), but brand / model match case-insensitively (trimmed)."""
+    key = name_key(brand, model, year)
+    row = current_scope().loader("vehicle_by_name").load(key) if key else None
+    return dict(row) if row else None
+
+
+def vehicles_by_name(refs: list) -> list:
+    """refs: [(brand, model, year), ...] → [row or None, ...], case-insensitive, one backend call."""
+    keys   = [name_key(*ref) for ref in refs]
+    wanted = [k for k in keys if k]
+    by_key = dict(zip(wanted, current_scope().loader("vehicle_by_name").load_many(wanted)))
+    return [dict(by_key[k]) if k and by_key.get(k) else None for k in keys]
+
+
+def prime_vehicles(refs: list):
+    current_scope().loader("vehicle").prime([k for k in (vehicle_key(*r) for r in refs) if k])
+
+
+def search_vehicles(filters: dict) -> list[dict]:
+    return current_scope().backend.search_vehicles(filters)
+
+
+def vehicle_image(brand, model, year) -> tuple | None:
+    """(image_url, manufacturer_url) from afdc_vehicles, nearest year first."""
+    try:
+        year = int(year) if year is not None else None
+    except (TypeError, ValueError):
+        year = None
+    return current_scope().loader("vehicle_image").load((brand, model, year))
+
+
+def grid_intensity(country_code: str, year) -> float | None:
+    try:
+        key = (country_code, int(year))
+    except (TypeError, ValueError):
+        return None
+    return current_scope().loader("grid").load(key)
+
+
+def grid_year_average(year) -> float | None:
+    try:
+        return current_scope().loader("grid_average").load(int(year))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,130 @@
+"""
+data_versions.py  —  Version counters for reloadable reference data
+====================================================================
+Cached responses and derived tables are keyed on these counters. Anything
+that reloads a dataset bumps its counter (bump_shared() from a loader job,
+bump() for an in-process reload). Every cache built from that dataset then
+misses on its next read and rebuilds.
+
+Datasets:
+    "grid"          grid_intensity rows and the grid JSON file
+    "grid:<ISO3>"   one country's grid_intensity rows (grid_key("DEU"))
+    "vehicles"      vehicles catalogue
+    "afdc_vehicles" afdc_vehicles (image / manufacturer URLs)
+
+Counters live in the data_versions table, so a bump made by an ingestion
+job reaches every worker process. Each process polls the table every
+DATA_VERSION_POLL_S in a background thread. When a counter moves, the
+listeners registered with on_change(name, fn) run first (e.g. engine
+reloads GRID_CACHE), and only then does current() return the new value.
+So a cache rebuilt under the new version never sees stale reference data.
+
+Without a DB (or before the table exists) the counters are process-local,
+as they used to be. With DATA_SOURCE=snapshot the poller is never started.
+"""
+
+import os
+import time
+import threading
+
+from database import get_db_connection
+
+GRID     = "grid"
+VEHICLES = "vehicles"
+IMAGES   = "afdc_vehicles"
+
+POLL_INTERVAL_S = float(os.getenv("DATA_VERSION_POLL_S", "5"))
+
+_shared    = {}                     # last values read from data_versions
+_local     = {GRID: 0, VEHICLES: 0, IMAGES: 0}  # bump() in this process only
+_listeners: dict[str, list] = {}
+_lock      = threading.Lock()
+_watcher   = None
+
+
+def grid_key(country_code: str) -> str:
+    """Version name for one country's grid rows; pass the ISO3 code."""
+    return f"{GRID}:{country_code.upper()}"
+
+
+def current(name: str) -> int:
+    _ensure_watcher()
+    return _shared.get(name, 0) + _local.get(name, 0)
+
+
+def on_change(name: str, fn):
+    """Call fn() from the poller before a new version of `name` is published."""
+    with _lock:
+        _listeners.setdefault(name, []).append(fn)
+
+
+def bump(name: str) -> int:
+    """Mark `name` as changed (in this process only); returns the new version."""
+    with _lock:
+        _local[name] = _local.get(name, 0) + 1
+    return current(name)
+
+
+def bump_shared(cur, names) -> dict:
+    """
+    Bump `names` in the data_versions table, inside the caller's transaction,
+    so the new versions become visible exactly when the data change commits.
+    Returns {name: new_version}.
+    """
+    new = {}
+    for name in sorted(set(names)):
+        cur.execute("""
+            INSERT INTO data_versions (name, version, updated_at)
+            VALUES (%s, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (name) DO UPDATE
+            SET version = data_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+            RETURNING version
+        """, (name,))
+        new[name] = cur.fetchone()[0]
+    return new
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CROSS-PROCESS POLLING
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _ensure_watcher():
+    global _watcher
+    if _watcher is None and os.getenv("DATA_SOURCE", "auto").lower() != "snapshot":
+        with _lock:
+            if _watcher is None:
+                _watcher = threading.Thread(target=_watch_loop, name="data-versions", daemon=True)
+                _watcher.start()
+
+
+def poll() -> list[str]:
+    """Read data_versions once and apply any changes; returns the names that moved."""
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        cur.execute("SELECT name, version FROM data_versions")
+        shared = dict(cur.fetchall())
+    finally:
+        cur.close()
+        conn.close()
+
+    moved = [name for name, version in shared.items() if version != _shared.get(name)]
+    for name in moved:
+        for fn in _listeners.get(name, []):
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️  data version listener for {name} failed: {e}")
+    with _lock:
+        _shared.update(shared)
+    return moved
+
+
+def _watch_loop():
+    while True:
+        try:
+            poll()
+        except Exception as e:
+            print(f"⚠️  data version poll failed: {e}")
+            time.sleep(POLL_INTERVAL_S * 6)
+        time.sleep(POLL_INTERVAL_S)
@@ -1,9 +1,39 @@
 import psycopg2
 import os
+import time
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from psycopg2.extensions import connection as _pg_connection, cursor as _pg_cursor
+from psycopg2.pool import ThreadedConnectionPool
+
+import metrics
+import query_audit
 load_dotenv()
 
 
+class TimedCursor(_pg_cursor):
+    """Default cursor: reports each execute to metrics and query_audit."""
+
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - t0
+            metrics.record_query(elapsed)
+            query_audit.record(self, query, vars, elapsed)
+
+    def executemany(self, query, vars_list):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            elapsed = time.perf_counter() - t0
+            metrics.record_query(elapsed)
+            query_audit.record(self, query, vars_list, elapsed, many=True)
+
+
 def get_db_connection():
     db_uri = os.getenv("DB_URI")
 
@@ -11,9 +41,69 @@ def get_db_connection():
         raise ValueError("DB_URI environment variable not set")
 
     try:
-        conn = psycopg2.connect(db_uri)
+        conn = psycopg2.connect(db_uri, cursor_factory=TimedCursor)
         return conn
 
     except Exception as e:
         print("Database connection error:", e)
-        raise
\ No newline at end of file
+        raise
+
+# ── Pooled connections ─────────────────────────────────────────────────────
+# For hot paths that run the same statements over and over (wallet trip
+# logging). Connections stay open between requests, so statements PREPAREd
+# on them stay prepared. Everything else keeps using get_db_connection().
+
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+_pool      = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+
+class PooledConnection(_pg_connection):
+    """psycopg2 connection that remembers which statements it has PREPAREd."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db_uri = os.getenv("DB_URI")
+                if not db_uri:
+                    raise ValueError("DB_URI environment variable not set")
+                _pool = ThreadedConnectionPool(
+                    1, DB_POOL_MAX, db_uri,
+                    connection_factory=PooledConnection, cursor_factory=TimedCursor,
+                )
+    return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow a connection from the pool; blocks while all DB_POOL_MAX are in
+    use. Anything left uncommitted is rolled back when it is returned.
+    """
+    with _pool_slots:
+        pool = _get_pool()
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            if not conn.closed:
+                conn.rollback()
+            pool.putconn(conn, close=bool(conn.closed))
+
+
+def prepare(conn, name: str, sql: str):
+    """PREPARE `sql` as `name` on this pooled connection, once."""
+    if name in conn.prepared:
+        return
+    with conn.cursor() as cur:
+        cur.execute(f"PREPARE {name} AS {sql}")
+    conn.prepared.add(name)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+eea_aggregate.py  —  Raw EEA CO₂ registrations → per-model vehicle figures
+==========================================================================
+The EEA CO₂ monitoring dataset has one row per registration (or per group
+of identical registrations, with the count in `r`), millions per year.
+This reads it in chunks and reduces it to one row per
+(brand, model, year, vehicle_type):
+
+    co2_wltp_gpkm        median WLTP g CO₂/km, registration-weighted
+    electric_wh_per_km   median electric consumption (z, Wh/km)
+    registrations        rows × r behind the figures
+    co2_samples / wh_samples   registrations that reported each value
+
+Only the needed columns are read, with explicit dtypes. Memory is bounded
+by the number of distinct models, not by the file size. Each group keeps a
+histogram of values rounded to 1 g/km (1 Wh/km) rather than the raw
+values, so the medians are exact at the dataset's own resolution.
+
+Brands keep the source spelling (the EEA writes most in capitals, and
+title-casing would turn BMW into Bmw). With --load they are mapped to the
+spelling the vehicles catalogue already uses, so new models sit next to
+existing ones; brands the catalogue doesn't have keep the source spelling.
+
+Vehicle type comes from the fuel mode (Fm) and fuel type (Ft):
+    Fm=P → PHEV, Fm=E or Ft=electric → BEV, Fm=H → HEV,
+    Ft=hydrogen → FCV, anything else → ICE
+
+    python eea_aggregate.py CO2_passenger_cars_2023.csv --out vehicles_2023.csv
+    python eea_aggregate.py CO2_passenger_cars_2023.csv --load     # merge into vehicles
+    python eea_aggregate.py data.tsv --sep '\\t' --min-registrations 50
+"""
+
+import time
+import argparse
+from collections import Counter
+
+import pandas as pd
+
+# ── Constants ──────────────────────────────────────────────────────────────
+CHUNK_ROWS        = 500_000
+MIN_REGISTRATIONS = 10          # drop models below this — mostly typos / imports
+
+# canonical name → lower-cased source headers seen across EEA releases
+SOURCE_COLUMNS = {
+    "brand":     ("mk",),
+    "model":     ("cn",),
+    "year":      ("year",),
+    "fuel_type": ("ft",),
+    "fuel_mode": ("fm",),
+    "wltp":      ("ewltp (g/km)", "ewltp"),
+    "wh_per_km": ("z (wh/km)", "z"),
+    "count":     ("r",),
+}
+REQUIRED = ("brand", "model", "year", "fuel_type")
+
+DTYPES = {
+    "brand": "string", "model": "string", "fuel_type": "string", "fuel_mode": "string",
+    "year": "float32", "wltp": "float32", "wh_per_km": "float32", "count": "float32",
+}
+
+
+def _resolve_columns(path: str, sep: str) -> dict:
+    """{source header: canonical name} from the file's header row."""
+    header  = pd.read_csv(path, sep=sep, nrows=0).columns
+    by_name = {str(h).strip().lower(): h for h in header}
+    found   = {}
+    for name, candidates in SOURCE_COLUMNS.items():
+        source = next((by_name[c] for c in candidates if c in by_name), None)
+        if source is not None:
+            found[source] = name
+    missing = [c for c in REQUIRED if c not in found.values()]
+    if missing:
+        raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+    return found
+
+
+def vehicle_types(fuel_type: pd.Series, fuel_mode: pd.Series) -> pd.Series:
+    ft = fuel_type.str.strip().str.lower()
+    fm = fuel_mode.str.strip().str.upper()
+    out = pd.Series("ICE", index=ft.index, dtype="string")
+    out[ft == "hydrogen"] = "FCV"
+    out[fm == "H"] = "HEV"
+    out[(fm == "E") | (ft == "electric")] = "BEV"
+    out[fm == "P"] = "PHEV"
+    return out
+
+
+class _Group:
+    __slots__ = ("brand", "model", "registrations", "wltp", "wh")
+
+    def __init__(self, brand: str, model: str):
+        self.brand, self.model = brand, model
+        self.registrations = 0
+        self.wltp: Counter = Counter()
+        self.wh:   Counter = Counter()
+
+
+def _median(hist: Counter) -> float | None:
+    total = sum(hist.values())
+    if not total:
+        return None
+    half, seen = total / 2, 0
+    for value in sorted(hist):
+        seen += hist[value]
+        if seen >= half:
+            return float(value)
+    return None
+
+
+def catalogue_brands() -> dict:
+    """{BRAND: spelling used in vehicles}, the most common spelling per brand."""
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        cur.execute("SELECT brand FROM vehicles WHERE brand IS NOT NULL GROUP BY brand ORDER BY COUNT(*) DESC")
+        names = {}
+        for (brand,) in cur.fetchall():
+            names.setdefault(brand.strip().upper(), brand.strip())
+        return names
+    finally:
+        cur.close()
+        conn.close()
+
+
+class Aggregator:
+    """
+    Accumulates chunks; rows() returns the per-model table. brand_names
+    ({BRAND: spelling}, see catalogue_brands) overrides the source spelling.
+    """
+
+    def __init__(self, brand_names: dict | None = None):
+        self.groups: dict[tuple, _Group] = {}
+        self.rows_seen = 0
+        self.brand_names = brand_names or {}
+
+    def add(self, chunk: pd.DataFrame):
+        self.rows_seen += len(chunk)
+        chunk = chunk.dropna(subset=["brand", "model", "year"])
+        if chunk.empty:
+            return
+
+        fuel_mode = chunk["fuel_mode"] if "fuel_mode" in chunk else pd.Series("", index=chunk.index, dtype="string")
+        df = pd.DataFrame({
+            "brand":  chunk["brand"].str.strip(),
+            "model":  chunk["model"].str.strip(),
+            "year":   chunk["year"].astype("int32"),
+            "vtype":  vehicle_types(chunk["fuel_type"].fillna(""), fuel_mode.fillna("")),
+            "n":      chunk["count"].fillna(1) if "count" in chunk else 1.0,
+            "wltp":   chunk["wltp"].round() if "wltp" in chunk else float("nan"),
+            "wh":     chunk["wh_per_km"].round() if "wh_per_km" in chunk else float("nan"),
+        })
+        df["bkey"] = df["brand"].str.upper()
+        df["mkey"] = df["model"].str.upper()
+        keys = ["bkey", "mkey", "year", "vtype"]
+
+        # first spelling seen per group, and registration totals
+        firsts = df.groupby(keys, sort=False).agg(brand=("brand", "first"), model=("model", "first"), n=("n", "sum"))
+        for key, row in firsts.iterrows():
+            g = self.groups.get(key)
+            if g is None:
+                brand = self.brand_names.get(key[0], row["brand"])
+                g = self.groups[key] = _Group(brand, row["model"])
+            g.registrations += int(row["n"])
+
+        # per-chunk value histograms, then folded into the running ones
+        for col, attr in (("wltp", "wltp"), ("wh", "wh")):
+            hist = df.dropna(subset=[col]).groupby(keys + [col], sort=False)["n"].sum()
+            for (*key, value), n in hist.items():
+                getattr(self.groups[tuple(key)], attr)[int(value)] += int(n)
+
+    def rows(self, min_registrations: int = MIN_REGISTRATIONS) -> pd.DataFrame:
+        out = []
+        for (_, _, year, vtype), g in self.groups.items():
+            if g.registrations < min_registrations:
+                continue
+            out.append({
+                "brand":              g.brand,
+                "model":              g.model,
+                "year":               int(year),
+                "vehicle_type":       vtype,
+                "co2_wltp_gpkm":      _median(g.wltp),
+                "electric_wh_per_km": _median(g.wh),
+                "registrations":      g.registrations,
+                "co2_samples":        sum(g.wltp.values()),
+                "wh_samples":         sum(g.wh.values()),
+            })
+        return pd.DataFrame(out)
+
+
+def aggregate(path: str, sep: str = ",", chunk_rows: int = CHUNK_ROWS,
+              min_registrations: int = MIN_REGISTRATIONS,
+              brand_names: dict | None = None) -> tuple[pd.DataFrame, dict]:
+    """Stream `path` through an Aggregator; returns (rows, stats)."""
+    columns = _resolve_columns(path, sep)
+    dtypes  = {source: DTYPES[name] for source, name in columns.items()}
+    agg     = Aggregator(brand_names)
+    t0      = time.perf_counter()
+
+    reader = pd.read_csv(
+        path, sep=sep, usecols=list(columns), dtype=dtypes,
+        chunksize=chunk_rows, low_memory=True,
+    )
+    for chunk in reader:
+        agg.add(chunk.rename(columns=columns))
+        elapsed = time.perf_counter() - t0
+        print(f"   {agg.rows_seen:>12,} rows  ({agg.rows_seen / elapsed:,.0f} rows/s)  "
+              f"{len(agg.groups):,} models")
+
+    rows    = agg.rows(min_registrations)
+    elapsed = time.perf_counter() - t0
+    return rows, {
+        "rows":       agg.rows_seen,
+        "models":     len(rows),
+        "seconds":    round(elapsed, 2),
+        "rows_per_s": round(agg.rows_seen / elapsed) if elapsed else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate raw EEA CO2 registrations per model")
+    parser.add_argument("path", help="EEA CSV/TSV (may be .gz / .zip)")
+    parser.add_argument("--sep", default=",", help="field separator (EEA TSV downloads: '\\t')")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--min-registrations", type=int, default=MIN_REGISTRATIONS)
+    parser.add_argument("--out", help="write the per-model table as CSV (load_vehicles.py input)")
+    parser.add_argument("--load", action="store_true", help="merge the result into vehicles")
+    args = parser.parse_args()
+    if not args.out and not args.load:
+        parser.error("--out and/or --load is required")
+
+    sep = "\t" if args.sep in ("\\t", "tab") else args.sep
+    brands = catalogue_brands() if args.load else None
+    rows, stats = aggregate(args.path, sep, args.chunk_rows, args.min_registrations, brands)
+    print(f"✅ EEA: {stats['rows']:,} rows → {stats['models']:,} models "
+          f"in {stats['seconds']}s ({stats['rows_per_s'] or 0:,} rows/s)")
+
+    if args.out:
+        rows.to_csv(args.out, index=False)
+        print(f"   written to {args.out}")
+    if args.load:
+        from load_vehicles import load_frames
+        result = load_frames([rows])
+        print(f"✅ vehicles: {result['inserted']} inserted, {result['updated']} updated")
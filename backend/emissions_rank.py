@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+emissions_rank.py  —  "You emit less than 72% of CarbonWise users this year"
+=============================================================================
+Percentile rank of a user's yearly emissions among all users with at least
+one trip that year. This is answered from a quantile sketch, not a
+percentile query over travel_log.
+
+The sketch is DDSketch-style: a histogram over logarithmic buckets, so
+every value is known to within RELATIVE_ACCURACY. It was chosen over
+t-digest / KLL because its counts can go down as well as up. A user's
+yearly total grows with every trip, so each spend *moves* that user from
+one bucket to another rather than adding a new sample.
+
+  - record() is called after each committed spend with the user's
+    before/after yearly total — O(1)
+  - percentile_rank() scans a bounded number of buckets — constant time
+    and memory, independent of user count
+  - sketches merge by adding counts, so each worker process keeps a delta
+    of its own updates. A background thread folds that delta into the
+    emission_sketches row every SKETCH_FLUSH_S and reloads the merged
+    result, which carries other workers' updates too
+
+Rebuild from the rollups (e.g. after a backfill):
+
+    python emissions_rank.py --rebuild --year 2025
+"""
+
+import os
+import math
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+
+from database import get_db_connection
+
+# ── Constants ──────────────────────────────────────────────────────────────
+RELATIVE_ACCURACY = 0.01       # ±1 % on any reported value
+MIN_VALUE_KG      = 0.001      # totals at or below this land in the zero bucket
+SKETCH_FLUSH_S    = float(os.getenv("SKETCH_FLUSH_S", "60"))
+
+
+class EmissionsSketch:
+    """Log-bucketed histogram with signed, mergeable counts."""
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma     = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_g    = math.log(self.gamma)
+        self.zero      = 0
+        self.bins: dict[int, int] = {}
+
+    # ── updates ────────────────────────────────────────────────────────────
+    def _key(self, value: float) -> int | None:
+        return None if value <= MIN_VALUE_KG else math.ceil(math.log(value) / self._log_g)
+
+    def add(self, value: float, count: int = 1):
+        key = self._key(value)
+        if key is None:
+            self.zero += count
+            return
+        n = self.bins.get(key, 0) + count
+        if n:
+            self.bins[key] = n
+        else:
+            self.bins.pop(key, None)
+
+    def move(self, old: float, new: float):
+        """One user's total changed from old to new (old <= 0: first trip)."""
+        if old > 0 and self._key(old) == self._key(new):
+            return
+        if old > 0:
+            self.add(old, -1)
+        self.add(new, 1)
+
+    def merge(self, other: "EmissionsSketch"):
+        self.zero += other.zero
+        for key, n in other.bins.items():
+            total = self.bins.get(key, 0) + n
+            if total:
+                self.bins[key] = total
+            else:
+                self.bins.pop(key, None)
+
+    # ── queries ────────────────────────────────────────────────────────────
+    @property
+    def count(self) -> int:
+        return self.zero + sum(self.bins.values())
+
+    def rank(self, value: float) -> float | None:
+        """Approximate fraction of users whose total is below `value`."""
+        total = self.count
+        if total <= 0:
+            return None
+        key = self._key(value)
+        if key is None:
+            return self.zero / 2 / total
+        below = self.zero + sum(n for k, n in self.bins.items() if k < key)
+        return (below + self.bins.get(key, 0) / 2) / total
+
+    def quantile(self, q: float) -> float | None:
+        total = self.count
+        if total <= 0:
+            return None
+        target = q * (total - 1)
+        seen = self.zero
+        if target < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if target < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    # ── persistence ────────────────────────────────────────────────────────
+    def to_json(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero":              self.zero,
+            "bins":              {str(k): n for k, n in self.bins.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "EmissionsSketch":
+        sketch = cls(data.get("relative_accuracy", RELATIVE_ACCURACY))
+        sketch.zero = int(data.get("zero", 0))
+        sketch.bins = {int(k): int(n) for k, n in data.get("bins", {}).items() if int(n)}
+        return sketch
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PER-PROCESS STATE  (merged view + unflushed delta, per year)
+# ══════════════════════════════════════════════════════════════════════════════
+
+_merged:  dict[int, EmissionsSketch] = {}
+_pending: dict[int, EmissionsSketch] = {}
+_lock     = threading.Lock()
+_flusher  = None
+
+
+def _build_from_rollups(cur, year: int) -> EmissionsSketch:
+    cur.execute("""
+        SELECT SUM(total_emissions_kg)
+        FROM travel_stats_monthly
+        WHERE year = %s
+        GROUP BY user_id
+    """, (year,))
+    sketch = EmissionsSketch()
+    for (total,) in cur.fetchall():
+        sketch.add(float(total))
+    return sketch
+
+
+def _load(year: int) -> tuple[EmissionsSketch, bool]:
+    """
+    Persisted sketch for `year`, building it from the rollups if missing.
+    Returns (sketch, built); a built sketch already reflects every committed
+    spend, including this process's pending deltas.
+    """
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        cur.execute("SELECT sketch FROM emission_sketches WHERE year = %s", (year,))
+        row = cur.fetchone()
+        if row:
+            return EmissionsSketch.from_json(row[0]), False
+
+        sketch = _build_from_rollups(cur, year)
+        cur.execute("""
+            INSERT INTO emission_sketches (year, sketch) VALUES (%s, %s)
+            ON CONFLICT (year) DO NOTHING
+        """, (year, json.dumps(sketch.to_json())))
+        conn.commit()
+        return sketch, True
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is None:
+        with _lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="emissions-sketch", daemon=True)
+                _flusher.start()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(SKETCH_FLUSH_S)
+        try:
+            flush()
+        except Exception as e:
+            print(f"⚠️  emissions sketch flush failed: {e}")
+
+
+def flush():
+    """Fold this process's deltas into emission_sketches and reload merged views."""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        years = set(_merged) | set(pending)
+    if not years:
+        return
+
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        fresh = {}
+        for year in sorted(years):
+            cur.execute("SELECT sketch FROM emission_sketches WHERE year = %s FOR UPDATE", (year,))
+            row = cur.fetchone()
+            if row:
+                sketch = EmissionsSketch.from_json(row[0])
+                if year in pending:
+                    sketch.merge(pending[year])
+            else:
+                sketch = _build_from_rollups(cur, year)   # already includes pending
+            if year in pending:
+                cur.execute("""
+                    INSERT INTO emission_sketches (year, sketch, updated_at)
+                    VALUES (%s, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (year) DO UPDATE
+                    SET sketch = EXCLUDED.sketch, updated_at = EXCLUDED.updated_at
+                """, (year, json.dumps(sketch.to_json())))
+            fresh[year] = sketch
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        with _lock:                       # keep the deltas for the next attempt
+            for year, delta in pending.items():
+                _pending.setdefault(year, EmissionsSketch()).merge(delta)
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    with _lock:
+        for year, sketch in fresh.items():
+            # updates recorded while we were flushing are still pending
+            if year in _pending:
+                sketch.merge(_pending[year])
+            _merged[year] = sketch
+
+
+def _sketch(year: int) -> EmissionsSketch:
+    _ensure_flusher()
+    if year not in _merged:
+        loaded, built = _load(year)
+        with _lock:
+            if year not in _merged:
+                if built:
+                    _pending.pop(year, None)
+                elif year in _pending:
+                    loaded.merge(_pending[year])
+                _merged[year] = loaded
+    return _merged[year]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PUBLIC API
+# ══════════════════════════════════════════════════════════════════════════════
+
+def record(updates: list[tuple]):
+    """
+    updates: [(year, total_before_kg, total_after_kg), ...] for users whose
+    yearly total just changed. Call only after the spend has committed.
+    """
+    _ensure_flusher()
+    with _lock:
+        for year, before, after in updates:
+            _pending.setdefault(year, EmissionsSketch()).move(before, after)
+            if year in _merged:
+                _merged[year].move(before, after)
+
+
+def percentile_rank(total_kg: float, year: int | None = None) -> dict:
+    year   = year or datetime.utcnow().year
+    sketch = _sketch(year)
+    with _lock:
+        rank, users = sketch.rank(total_kg), sketch.count
+        median = sketch.quantile(0.5)
+    return {
+        "year":               year,
+        "emissions_kg":       round(total_kg, 3),
+        "users_ranked":       users,
+        "percentile":         round(rank * 100, 1) if rank is not None else None,
+        "emit_less_than_pct": round((1 - rank) * 100, 1) if rank is not None else None,
+        "median_kg":          round(median, 2) if median is not None else None,
+    }
+
+
+def rebuild(year: int) -> int:
+    """Replace the persisted sketch for `year` with one built from the rollups."""
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        sketch = _build_from_rollups(cur, year)
+        cur.execute("""
+            INSERT INTO emission_sketches (year, sketch, updated_at)
+            VALUES (%s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (year) DO UPDATE
+            SET sketch = EXCLUDED.sketch, updated_at = EXCLUDED.updated_at
+        """, (year, json.dumps(sketch.to_json())))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    with _lock:
+        _merged[year] = sketch
+        _pending.pop(year, None)
+    return sketch.count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the yearly emissions sketch")
+    parser.add_argument("--rebuild", action="store_true", required=True)
+    parser.add_argument("--year", type=int, default=datetime.utcnow().year)
+    args = parser.parse_args()
+    print(f"✅ emission_sketches[{args.year}]: {rebuild(args.year)} users")
@@ -1,6 +1,9 @@
 import psycopg2
 import os
 from manufacturing import manufacturing_kg as get_manufacturing_kg, recycling_kg
+import data_versions
+import data_access
+import snapshot
 import dotenv
 
 dotenv.load_dotenv()
@@ -19,20 +22,40 @@ def get_connection():
 GRID_CACHE = {}
 
 
-def load_caches():
+def _grid_rows_db():
     conn = get_connection()
     cur  = conn.cursor()
     cur.execute("""
         SELECT country_code, year, carbon_intensity_gco2_per_kwh
         FROM grid_intensity
     """)
-    for country_code, year, value in cur.fetchall():
-        GRID_CACHE[(country_code.upper(), year)] = value
+    rows = cur.fetchall()
     cur.close()
     conn.close()
+    return rows
+
+
+def _grid_rows_snapshot(snap):
+    return list(zip(*(
+        snap.values("grid_intensity", c)
+        for c in ("country_code", "year", "carbon_intensity_gco2_per_kwh")
+    )))
+
+
+def load_caches():
+    rows  = snapshot.with_fallback(_grid_rows_db, _grid_rows_snapshot)
+    fresh = {(country_code.upper(), int(year)): value for country_code, year, value in rows}
+
+    # swap in place (other modules hold a reference to GRID_CACHE) without
+    # an empty window for concurrent lookups
+    GRID_CACHE.update(fresh)
+    for key in [k for k in GRID_CACHE if k not in fresh]:
+        del GRID_CACHE[key]
 
 
 load_caches()
+# reload when an ingestion job changes grid_intensity (see ingest_grid.py)
+data_versions.on_change(data_versions.GRID, load_caches)
 
 
 # =====================================================
@@ -57,11 +80,25 @@ COUNTRY_CODE_MAP = {
 # HELPERS
 # =====================================================
 
+def normalise_country(country_code):
+    """User-facing code ("DE", "deu") → the ISO3 key used by GRID_CACHE."""
+    if not country_code:
+        return None
+    code = str(country_code).strip().upper()
+    return COUNTRY_CODE_MAP.get(code, code)
+
+
 def get_grid_intensity(country_code, year):
-    code = country_code.upper()
-    if code in COUNTRY_CODE_MAP:
-        code = COUNTRY_CODE_MAP[code]
-    return GRID_CACHE.get((code, year))
+    return GRID_CACHE.get((normalise_country(country_code), year))
+
+
+def grid_version(country_code):
+    """
+    data_versions counter for results computed from this country's grid rows.
+    An update to another country leaves it unchanged.
+    """
+    code = normalise_country(country_code)
+    return data_versions.current(data_versions.grid_key(code) if code else data_versions.GRID)
 
 
 def electric_emissions_per_km(vehicle, grid_factor):
@@ -77,30 +114,8 @@ def electric_emissions_per_km(vehicle, grid_factor):
 # =====================================================
 
 def get_vehicle(filters):
-    conn = get_connection()
-    cur  = conn.cursor()
-
-    query  = "SELECT * FROM vehicles WHERE TRUE"
-    params = []
-    allowed_filters = {"brand", "model", "year", "vehicle_type"}
-
-    for k, v in filters.items():
-        if k not in allowed_filters:
-            continue
-        if k == "year":
-            query += " AND year = %s"
-            params.append(v)
-        else:
-            query += f" AND LOWER({k}) LIKE %s"
-            params.append(f"%{v.lower()}%")
-
-    cur.execute(query, params)
-    rows    = cur.fetchall()
-    columns = [desc[0] for desc in cur.description]
-    cur.close()
-    conn.close()
-
-    return [dict(zip(columns, row)) for row in rows]
+    allowed = {"brand", "model", "year", "vehicle_type"}
+    return data_access.search_vehicles({k: v for k, v in filters.items() if k in allowed})
 
 
 # =====================================================
@@ -22,11 +22,15 @@ Output per country:
   model_score   — R² on training data (quality indicator)
 """
 
+import threading
+
 import numpy as np
 from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.gaussian_process.kernels import RBF, WhiteKernel, ConstantKernel
 from sklearn.preprocessing import StandardScaler
 
+import data_versions
+
 
 FORECAST_YEARS = 10        # how many years ahead to project
 CONFIDENCE_Z   = 1.96      # 95% confidence interval
@@ -136,6 +140,15 @@ def forecast_country(years: list[int], values: list[float], horizon: int = FOREC
     }
 
 
+# ── Per-country result cache ─────────────────────────────────────────────────
+# A GPR fit takes tens of ms per country. Results are kept per
+# (country, horizon) together with the country's grid version
+# (data_versions "grid:<ISO3>") and the inputs they were fitted on, so an
+# ingestion that changes one country refits only that country.
+_forecasts: dict[tuple, tuple] = {}
+_forecasts_lock = threading.Lock()
+
+
 def forecast_all(grid_data: dict, horizon: int = FORECAST_YEARS) -> dict:
     """
     Run forecast for every country in grid_data.
@@ -148,5 +161,15 @@ def forecast_all(grid_data: dict, horizon: int = FORECAST_YEARS) -> dict:
         years  = sorted(int(y) for y in year_dict)
         values = [year_dict[str(y)].get("corrected") or year_dict[str(y)].get("raw")
                   for y in years]
+
+        key     = (country, horizon)
+        version = data_versions.current(data_versions.grid_key(country))
+        cached  = _forecasts.get(key)
+        if cached and cached[0] == version and cached[1] == (years, values):
+            results[country] = cached[2]
+            continue
+
         results[country] = forecast_country(years, values, horizon)
+        with _forecasts_lock:
+            _forecasts[key] = (version, (years, values), results[country])
     return results
\ No newline at end of file
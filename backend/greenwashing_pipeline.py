@@ -0,0 +1,290 @@
+"""
+greenwashing_pipeline.py  —  Deadline-bounded web-claim search for /greenwashing
+================================================================================
+The Gemini grounded search in web_search.py takes 10–45 s, while the local
+rule engine answers in milliseconds. This module starts the web search on a
+background pool as soon as the request arrives, lets the route evaluate the
+user's own claims in parallel, and then waits only up to a deadline.
+
+If the web findings miss the deadline the job stays registered under a
+follow-up id so the frontend can poll GET /greenwashing/web/<job_id>.
+
+    job = start_web_search(lc, vm)
+    report = evaluate_claims(...)            # runs while the search is in flight
+    web = wait_for_web_search(job, deadline_s)
+"""
+
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from greenwashing import evaluate_claims
+
+# ── Constants ──────────────────────────────────────────────────────────────
+DEFAULT_WEB_DEADLINE_S = float(os.getenv("GREENWASHING_WEB_DEADLINE_S", "3.0"))
+MAX_WEB_DEADLINE_S     = 60.0   # never hold a request thread longer than this
+WEB_SEARCH_WORKERS     = int(os.getenv("GREENWASHING_WEB_WORKERS", "4"))
+JOB_TTL_S              = 15 * 60  # finished/abandoned jobs are dropped after this
+
+RISK_ORDER = ["SAFE", "CAUTION", "WARNING", "VIOLATION"]
+
+_pool = ThreadPoolExecutor(max_workers=WEB_SEARCH_WORKERS, thread_name_prefix="gw-web")
+_jobs: dict[str, dict] = {}
+_jobs_lock = threading.Lock()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SCORING HELPERS  (shared by the initial response and the follow-up poll)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def worst_risk(risks):
+    ranked = [r for r in risks if r in RISK_ORDER]
+    return max(ranked, key=lambda r: RISK_ORDER.index(r)) if ranked else "SAFE"
+
+
+def combine_with_web(base_risk: str, base_score: int, web_findings: list[dict]) -> tuple[str, int]:
+    """Fold web findings into the rule-engine risk and transparency score."""
+    risk = worst_risk([base_risk] + [w["risk_level"] for w in web_findings])
+    web_penalty = sum(
+        25 if w["risk_level"] == "VIOLATION"
+        else 15 if w["risk_level"] == "WARNING"
+        else 5
+        for w in web_findings
+        if w["risk_level"] not in ("SAFE",)
+        and not w.get("is_aspirational")
+        and not w.get("is_unverified")
+    )
+    return risk, max(10, base_score - web_penalty)
+
+
+def _num(d, key, default=0.0):
+    try:
+        return float(d[key]) if d.get(key) is not None else float(default)
+    except (TypeError, ValueError):
+        return float(default)
+
+
+TYPE_MAP = {
+    "BEV": "EV",  "ELECTRIC": "EV",      "BATTERY": "EV",
+    "HYBRID": "HEV", "MILD_HYBRID": "HEV", "MHEV": "HEV",
+    "PLUGIN": "PHEV", "PLUGIN_HYBRID": "PHEV", "PLUG_IN": "PHEV",
+    "GASOLINE": "ICE", "PETROL": "ICE",   "DIESEL": "ICE",
+    "GAS": "ICE",  "CONVENTIONAL": "ICE",
+}
+
+
+def normalise_inputs(lifecycle: dict, vehicle_meta: dict) -> tuple[dict, dict]:
+    """Coerce the request's lifecycle / vehicle dicts into rule-engine inputs."""
+    lc = {
+        "total_g_per_km":         _num(lifecycle, "total_g_per_km"),
+        "operational_g_per_km":   _num(lifecycle, "operational_g_per_km"),
+        "manufacturing_g_per_km": _num(lifecycle, "manufacturing_g_per_km"),
+        "manufacturing_total_kg": _num(lifecycle, "manufacturing_total_kg"),
+        "recycling_kg":           _num(lifecycle, "recycling_kg", default=0.0),
+    }
+
+    raw_type = (
+        vehicle_meta.get("vehicle_type") or
+        vehicle_meta.get("type") or
+        vehicle_meta.get("fuel_type") or "ICE"
+    ).upper().strip()
+    vtype = TYPE_MAP.get(raw_type, raw_type)
+    if vtype not in ("EV", "HEV", "PHEV", "ICE"):
+        vtype = "ICE"
+
+    vm = {
+        "brand":        str(vehicle_meta.get("brand") or "Unknown"),
+        "model":        str(vehicle_meta.get("model") or "Unknown"),
+        "year":         vehicle_meta.get("year"),
+        "vehicle_type": vtype,
+        "electric":     vtype in ("EV", "PHEV"),
+    }
+    return lc, vm
+
+
+def build_response(lc: dict, vm: dict, report, web_result: dict | None,
+                   search_web: bool, pending_id: str | None) -> dict:
+    """Assemble the /greenwashing JSON body from the rule report and web result."""
+    web_findings     = (web_result or {}).get("web_findings", [])
+    web_search_error = (web_result or {}).get("web_search_error")
+
+    risk, score = combine_with_web(
+        report.overall_risk.value, report.transparency_score, web_findings
+    )
+
+    return {
+        "brand":                  vm["brand"],
+        "model":                  vm["model"],
+        "vehicle_type":           vm["vehicle_type"],
+        "total_g_per_km":         lc["total_g_per_km"],
+        "operational_g_per_km":   lc["operational_g_per_km"],
+        "manufacturing_g_per_km": lc["manufacturing_g_per_km"],
+        "manufacturing_total_kg": lc["manufacturing_total_kg"],
+        "recycling_kg":           lc["recycling_kg"],
+        "overall_risk":           risk,
+        "transparency_score":     score,
+        "structural_flags":       report.structural_flags,
+        "misleading_claims":      report.misleading_claims,
+        "findings": [
+            {
+                "claim":           f.claim,
+                "risk_level":      f.risk_level.value,
+                "reason":          f.reason,
+                "suggestion":      f.suggestion,
+                "is_aspirational": f.is_aspirational,
+                "is_unverified":   f.is_unverified,
+            }
+            for f in report.findings
+        ],
+        "web_findings":       web_findings,
+        "web_search_error":   web_search_error,
+        "web_search_ran":     search_web,
+        "web_search_pending": pending_id is not None,
+        "web_search_id":      pending_id,
+    }
+
+
+def parse_deadline(raw) -> float:
+    """Clamp a client-supplied deadline (seconds) to [0, MAX_WEB_DEADLINE_S]."""
+    if raw is None:
+        return DEFAULT_WEB_DEADLINE_S
+    try:
+        return min(max(float(raw), 0.0), MAX_WEB_DEADLINE_S)
+    except (TypeError, ValueError):
+        return DEFAULT_WEB_DEADLINE_S
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# WORKER
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _run_web_search(lc: dict, vm: dict) -> dict:
+    """Search + rule-evaluate web claims. Runs on the background pool."""
+    from web_search import search_marketing_claims
+
+    error = None
+    web_claims_raw = []
+    try:
+        web_claims_raw = search_marketing_claims(
+            brand                = vm["brand"],
+            model                = vm["model"],
+            year                 = vm.get("year"),
+            actual_total         = lc["total_g_per_km"],
+            actual_operational   = lc["operational_g_per_km"],
+            actual_manufacturing = lc["manufacturing_g_per_km"],
+            vehicle_type         = vm["vehicle_type"],
+        )
+    except Exception as e:
+        print(f"[greenwashing] web_search error: {e}")
+        error = str(e)
+
+    web_findings = []
+    if web_claims_raw:
+        try:
+            web_report = evaluate_claims(
+                lifecycle       = lc,
+                vehicle_meta    = vm,
+                proposed_claims = [c["claim_text"] for c in web_claims_raw],
+            )
+            for finding, meta in zip(web_report.findings, web_claims_raw):
+                web_findings.append({
+                    "claim":           finding.claim,
+                    "risk_level":      finding.risk_level.value,
+                    "reason":          finding.reason,
+                    "suggestion":      finding.suggestion,
+                    "is_aspirational": finding.is_aspirational,
+                    "is_unverified":   finding.is_unverified,
+                    "source":          meta["source"],
+                    "source_url":      meta["source_url"],
+                    "claim_type":      meta["claim_type"],
+                    "context":         meta["context"],
+                })
+        except Exception as e:
+            error = (error or "") + f" | Rule engine: {e}"
+
+    return {"web_findings": web_findings, "web_search_error": error}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# JOB LIFECYCLE
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _evict_expired(now: float):
+    expired = [jid for jid, job in _jobs.items() if now - job["created_at"] > JOB_TTL_S]
+    for jid in expired:
+        _jobs.pop(jid, None)
+
+
+def start_web_search(lc: dict, vm: dict) -> dict:
+    """Submit the web search and return a job handle (not yet registered)."""
+    return {
+        "id":         uuid.uuid4().hex,
+        "created_at": time.monotonic(),
+        "future":     _pool.submit(_run_web_search, lc, vm),
+    }
+
+
+def wait_for_web_search(job: dict, deadline_s: float) -> dict | None:
+    """
+    Block until the web search finishes or deadline_s has elapsed since the
+    job started. Returns the worker result, or None if still pending — in
+    which case the job is registered for get_web_search().
+    """
+    try:
+        return job["future"].result(timeout=remaining_deadline(job, deadline_s))
+    except FutureTimeout:
+        park_web_search(job)
+        return None
+
+
+def remaining_deadline(job: dict, deadline_s: float) -> float:
+    return max(deadline_s - (time.monotonic() - job["created_at"]), 0.0)
+
+
+def park_web_search(job: dict):
+    """Register a still-running job so get_web_search() can find it later."""
+    with _jobs_lock:
+        _evict_expired(time.monotonic())
+        _jobs[job["id"]] = job
+
+
+def register_base_report(job: dict, base_risk: str, base_score: int):
+    """Remember the rule-engine verdict so the poll can return combined scores."""
+    job["base_risk"]  = base_risk
+    job["base_score"] = base_score
+
+
+def get_web_search(job_id: str) -> dict | None:
+    """
+    Follow-up lookup for a pending search. Returns None for unknown/expired ids,
+    otherwise a dict with status "pending" or "done" (plus findings and the
+    recombined overall_risk / transparency_score).
+    """
+    with _jobs_lock:
+        _evict_expired(time.monotonic())
+        job = _jobs.get(job_id)
+    if job is None:
+        return None
+
+    future = job["future"]
+    if not future.done():
+        return {"web_search_id": job_id, "status": "pending"}
+
+    try:
+        result = future.result()
+    except Exception as e:
+        result = {"web_findings": [], "web_search_error": str(e)}
+
+    risk, score = combine_with_web(
+        job.get("base_risk", "SAFE"), job.get("base_score", 100), result["web_findings"]
+    )
+    return {
+        "web_search_id":      job_id,
+        "status":             "done",
+        "web_findings":       result["web_findings"],
+        "web_search_error":   result["web_search_error"],
+        "overall_risk":       risk,
+        "transparency_score": score,
+    }
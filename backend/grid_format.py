@@ -0,0 +1,58 @@
+"""
+grid_format.py  —  Response shapes for /grid
+=============================================
+Both shapes are built from the same (country_code, year, raw, corrected)
+rows, ordered by country_code, year.
+
+nested (default — what GridInsights.jsx and forecast_all() consume):
+
+    { "USA": { "2000": {"raw": 612.0, "corrected": 655.1}, ... }, ... }
+
+columnar (?format=columnar) — one country list, one year list, and dense
+country × year matrices with null for missing cells. No repeated keys, so
+it is several times smaller and much cheaper to encode:
+
+    {
+      "format":    "columnar",
+      "countries": ["AUS", "USA", ...],
+      "years":     [2000, 2001, ...],
+      "raw":       [[612.0, null, ...], ...],   # raw[i][j] → countries[i], years[j]
+      "corrected": [[655.1, null, ...], ...]
+    }
+"""
+
+FORMATS = ("nested", "columnar")
+
+
+def grid_nested(rows) -> dict:
+    grid = {}
+    for country, year, raw, corrected in rows:
+        grid.setdefault(country, {})[str(year)] = {"raw": raw, "corrected": corrected}
+    return grid
+
+
+def grid_columnar(rows) -> dict:
+    rows      = list(rows)
+    countries = sorted({r[0] for r in rows})
+    years     = sorted({int(r[1]) for r in rows})
+    c_index   = {c: i for i, c in enumerate(countries)}
+    y_index   = {y: j for j, y in enumerate(years)}
+
+    raw       = [[None] * len(years) for _ in countries]
+    corrected = [[None] * len(years) for _ in countries]
+    for country, year, r, c in rows:
+        i, j = c_index[country], y_index[int(year)]
+        raw[i][j]       = r
+        corrected[i][j] = c
+
+    return {
+        "format":    "columnar",
+        "countries": countries,
+        "years":     years,
+        "raw":       raw,
+        "corrected": corrected,
+    }
+
+
+def build_grid(rows, fmt: str) -> dict:
+    return grid_columnar(rows) if fmt == "columnar" else grid_nested(rows)
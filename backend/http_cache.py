@@ -0,0 +1,229 @@
+"""
+http_cache.py  —  ETag / conditional GET / compression for reference endpoints
+==============================================================================
+/grid, /grid-data, /countries and /vehicles return large payloads that only
+change when the underlying data is reloaded. Each one is serialized once per
+(cache key, data version). Its gzip and brotli bodies are computed at build
+time too, so a repeat request costs one dict lookup:
+
+    entry = get_or_build(("countries",), data_versions.current("grid"), build)
+    status, body, headers = negotiate(entry, if_none_match, accept_encoding)
+
+Async callers use lookup() / store() directly and await their own build.
+
+  - ETag is a content hash of the JSON bytes, so identical data keeps the
+    same tag across rebuilds and workers. Each encoding gets its own
+    strong tag ("<hash>", "<hash>-gzip", "<hash>-br"), since the bytes
+    differ; caches and Range requests never mix them up
+  - If-None-Match hits return 304 with no body; any encoding's tag for
+    the same content matches
+  - Content-Encoding is chosen per request from Accept-Encoding (br > gzip)
+  - Entries also expire after HTTP_CACHE_TTL_S, which picks up data that
+    was loaded out of band without a version bump
+
+brotli is optional — without it only gzip is offered.
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional: gzip-only when brotli isn't installed
+    brotli = None
+
+# ── Constants ──────────────────────────────────────────────────────────────
+CACHE_TTL_S        = float(os.getenv("HTTP_CACHE_TTL_S", "300"))
+MAX_ENTRIES        = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "512"))
+MIN_COMPRESS_BYTES = 1024   # smaller bodies aren't worth the Content-Encoding
+GZIP_LEVEL         = 6
+BROTLI_QUALITY     = 9
+
+
+class CachedBody:
+    """One serialized payload plus its precomputed encodings."""
+
+    __slots__ = ("version", "built_at", "etag", "bodies")
+
+    def __init__(self, raw: bytes, version, compress: bool = True):
+        self.version  = version
+        self.built_at = time.monotonic()
+        self.etag     = '"' + hashlib.blake2b(raw, digest_size=16).hexdigest() + '"'
+        self.bodies   = {"identity": raw}
+        if compress and len(raw) >= MIN_COMPRESS_BYTES:
+            self.bodies["gzip"] = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                self.bodies["br"] = brotli.compress(raw, quality=BROTLI_QUALITY)
+
+    def etag_for(self, encoding: str) -> str:
+        """Strong tag for one encoding of the body."""
+        return self.etag if encoding == "identity" else f'{self.etag[:-1]}-{encoding}"'
+
+    def fresh(self, version) -> bool:
+        return self.version == version and time.monotonic() - self.built_at < CACHE_TTL_S
+
+
+_cache: "OrderedDict[tuple, CachedBody]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def encode_json(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def lookup(key: tuple, version) -> CachedBody | None:
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry.fresh(version):
+            _cache.move_to_end(key)
+            return entry
+    return None
+
+
+def store(key: tuple, version, payload, encode=encode_json) -> CachedBody:
+    entry = CachedBody(encode(payload), version)
+    with _lock:
+        _cache[key] = entry
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return entry
+
+
+def get_or_build(key: tuple, version, build, encode=encode_json) -> CachedBody:
+    """
+    Return the cached body for key at version, calling build() on a miss.
+    build() runs outside the lock; two concurrent misses may both build,
+    and the last one wins, which is harmless.
+    """
+    return lookup(key, version) or store(key, version, build(), encode)
+
+
+def invalidate(prefix: str | None = None):
+    """Drop every entry (or those whose key starts with prefix)."""
+    with _lock:
+        if prefix is None:
+            _cache.clear()
+            return
+        for key in [k for k in _cache if k and k[0] == prefix]:
+            del _cache[key]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# WATCHED JSON FILE
+# ══════════════════════════════════════════════════════════════════════════════
+
+class WatchedJSONFile:
+    """
+    A JSON file served verbatim. It is validated and parsed once, then
+    reloaded only when its (mtime, size, inode) changes. The file is checked
+    at most once every check_interval_s, so the hot path is a timestamp
+    compare and a write of the prebuilt body. Nothing is re-serialized or
+    re-compressed per request.
+
+    The bodies are plain bytes, not an mmap. WSGI/ASGI servers only accept
+    bytes, so a mapped buffer would be copied on every request anyway.
+    """
+
+    def __init__(self, path: str, check_interval_s: float = 1.0):
+        self.path             = path
+        self.check_interval_s = check_interval_s
+        self.data             = None    # parsed payload, for in-process readers
+        self._entry: CachedBody | None = None
+        self._stamp           = None
+        self._checked_at      = 0.0
+        self._lock            = threading.Lock()
+
+    def entry(self) -> CachedBody:
+        """
+        Current body. Raises FileNotFoundError / json.JSONDecodeError when the
+        file is missing or invalid, like a plain open() + json.load() would.
+        """
+        now = time.monotonic()
+        if self._entry is not None and now - self._checked_at < self.check_interval_s:
+            return self._entry
+
+        with self._lock:
+            st    = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if self._entry is None or stamp != self._stamp:
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+                data = json.loads(raw)
+                self._entry = CachedBody(raw, stamp)
+                self.data   = data
+                self._stamp = stamp
+            self._checked_at = now
+            return self._entry
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# NEGOTIATION
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _accepted(accept_encoding: str) -> dict[str, float]:
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def choose_encoding(entry: CachedBody, accept_encoding: str) -> str:
+    accepted = _accepted(accept_encoding)
+    for enc in ("br", "gzip"):
+        if enc in entry.bodies and accepted.get(enc, accepted.get("*", 0.0)) > 0:
+            return enc
+    return "identity"
+
+
+_ENCODING_SUFFIXES = ('-gzip"', '-br"')
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """True if If-None-Match names etag or one of its per-encoding variants."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        for suffix in _ENCODING_SUFFIXES:
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+                break
+        if tag == etag:
+            return True
+    return False
+
+
+def negotiate(entry: CachedBody, if_none_match: str | None,
+              accept_encoding: str | None) -> tuple[int, bytes, dict]:
+    """Return (status, body, headers) for this request against a cached entry."""
+    encoding = choose_encoding(entry, accept_encoding)
+    headers  = {
+        "ETag":          entry.etag_for(encoding),
+        "Cache-Control": "no-cache",        # always revalidate; 304 makes it cheap
+        "Vary":          "Accept-Encoding",
+    }
+    if etag_matches(if_none_match, entry.etag):
+        return 304, b"", headers
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return 200, entry.bodies[encoding], headers
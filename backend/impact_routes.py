@@ -8,12 +8,20 @@ Register in app.py:
     app.register_blueprint(impact_bp)
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from database import get_db_connection
 from carbon_wallet import get_wallet, get_travel_log, get_yearly_stats
+from http_cache import CachedBody, encode_json, negotiate
+from collections import OrderedDict
 from datetime import datetime
+import os
+import math
+import hashlib
+import threading
 import traceback
 
+import numpy as np
+
 impact_bp = Blueprint("impact", __name__, url_prefix="/impact")
 
 # ── Constants ──────────────────────────────────────────────────────────────
@@ -23,6 +31,10 @@ AVG_DRIVER_KG_PER_YEAR = 2400.0 # average UK/EU driver annual CO₂ (kg)
 PETROL_KG_PER_LITRE   = 2.31    # kg CO₂ per litre petrol burned
 TEMP_RISE_PER_TONNE   = 0.0000000015  # simplified climate sensitivity
 
+MAX_AXIS_POINTS       = 200       # per scenario axis
+MAX_SCENARIO_CELLS    = 50_000    # trips × distance × years × baseline
+SCENARIO_CACHE_BYTES  = int(os.getenv("SCENARIO_CACHE_BYTES", str(32 * 1024 * 1024)))
+
 # ── health check ──────────────────────────────────────────────────────────
 @impact_bp.route("/ping", methods=["GET"])
 def ping():
@@ -186,4 +198,176 @@ def projection_from_wallet(user_id):
 
     except Exception as e:
         traceback.print_exc()
-        return jsonify({"error": f"Could not build projection: {e}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Could not build projection: {e}"}), 500
+
+# ══════════════════════════════════════════════════════════════════════════
+# POST /impact/scenarios
+# Body: {
+#   vehicle_g_per_km:  120,                              # required
+#   trips_per_week:    {min: 1, max: 14, step: 1}  | [1, 3, 5],
+#   distance_km:       {min: 10, max: 100, step: 10} | [...],
+#   years:             {min: 1, max: 10}           | [...],
+#   baseline_g_per_km: [150, 210]                  (default: petrol)
+# }
+# Used by ClimateProjection.jsx sliders — fetch the grid once, interpolate
+# locally instead of calling /projection on every slider move.
+# Axes are sorted and de-duplicated, and the response is cached by a hash of
+# the normalised inputs in _scenario_cache: a byte-bounded LRU of raw JSON,
+# separate from http_cache so client-chosen keys can't evict /grid or
+# /vehicles, and not precompressed.
+# ══════════════════════════════════════════════════════════════════════════
+
+class _ScenarioCache:
+    """LRU of CachedBody (identity only), bounded by total body bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self._bytes = 0
+        self._lock  = threading.Lock()
+
+    def get(self, key: str) -> CachedBody | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedBody):
+        size = len(entry.bodies["identity"])
+        if size > self.max_bytes // 4:          # one huge grid must not flush the rest
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.bodies["identity"])
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._bytes -= len(dropped.bodies["identity"])
+
+
+_scenario_cache = _ScenarioCache(SCENARIO_CACHE_BYTES)
+
+
+def _scenario_key(vehicle_g_per_km: float, axes: dict) -> str:
+    canonical = encode_json({"vehicle_g_per_km": vehicle_g_per_km, **axes})
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+
+def _axis(raw, name: str, default) -> np.ndarray:
+    """A scenario axis (sorted, de-duplicated) from a list of values or a {min, max, step} range."""
+    if raw is None:
+        raw = default
+    if isinstance(raw, dict):
+        try:
+            lo   = float(raw["min"])
+            hi   = float(raw.get("max", lo))
+            step = float(raw.get("step", 1))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{name} range needs numeric min (and optional max, step)")
+        if not all(math.isfinite(v) for v in (lo, hi, step)):
+            raise ValueError(f"{name} range must be finite")
+        if step <= 0 or hi < lo:
+            raise ValueError(f"{name} range needs step > 0 and max >= min")
+        if (hi - lo) / step + 1 > MAX_AXIS_POINTS:
+            raise ValueError(f"{name} has more than {MAX_AXIS_POINTS} points")
+        values = np.arange(lo, hi + step / 2, step)
+    else:
+        if not isinstance(raw, (list, tuple)):
+            raw = [raw]
+        try:
+            values = np.asarray([float(v) for v in raw])
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} values must be numbers")
+        if len(values) > MAX_AXIS_POINTS:
+            raise ValueError(f"{name} has more than {MAX_AXIS_POINTS} points")
+
+    if values.size == 0 or not np.all(np.isfinite(values)) or np.any(values < 0):
+        raise ValueError(f"{name} must be non-empty, finite and non-negative")
+    return np.unique(np.round(values, 6))
+
+
+def _scenario_grid(vehicle_g_per_km: float, trips: np.ndarray, dist: np.ndarray,
+                   years: np.ndarray, baseline: np.ndarray) -> dict:
+    """
+    Every projection for the cross product of the axes, with the same
+    formulas as _build_projection(). Arrays are indexed
+    [trips_per_week, distance_km, years, baseline_g_per_km]; outputs that don't
+    depend on an axis omit it.
+    """
+    t = trips[:, None, None, None]
+    d = dist[None, :, None, None]
+    y = years[None, None, :, None]
+    b = baseline[None, None, None, :]
+
+    trips_per_year = t * 52
+    annual_kg      = vehicle_g_per_km * d / 1000 * trips_per_year      # (T, D, 1, 1)
+    total_kg       = annual_kg * y                                     # (T, D, Y, 1)
+    baseline_kg    = b * d / 1000 * trips_per_year * y                 # (T, D, Y, B)
+    saved_kg       = np.maximum(baseline_kg - total_kg, 0)
+
+    return {
+        "annual_emissions_kg": np.round(annual_kg[:, :, 0, 0], 2).tolist(),
+        "vs_baseline_pct":     np.round(annual_kg[:, :, 0, 0] / AVG_DRIVER_KG_PER_YEAR * 100, 1).tolist(),
+        "total_emissions_kg":  np.round(total_kg[..., 0], 2).tolist(),
+        "trees_to_offset":     np.round(total_kg[..., 0] / KG_PER_TREE_PER_YEAR).tolist(),
+        "total_baseline_kg":   np.round(baseline_kg, 2).tolist(),
+        "saved_kg":            np.round(saved_kg, 2).tolist(),
+        "petrol_litres_equiv": np.round(saved_kg / PETROL_KG_PER_LITRE).tolist(),
+        "temp_rise_avoided_c": np.round(saved_kg / 1000 * TEMP_RISE_PER_TONNE * 1e12, 6).tolist(),
+    }
+
+
+@impact_bp.route("/scenarios", methods=["POST"])
+def projection_scenarios():
+    data = request.json or {}
+
+    try:
+        vehicle_g_per_km = float(data.get("vehicle_g_per_km"))
+        if not math.isfinite(vehicle_g_per_km) or vehicle_g_per_km < 0:
+            raise ValueError
+    except (ValueError, TypeError):
+        return jsonify({"error": "vehicle_g_per_km must be a non-negative number"}), 400
+
+    try:
+        trips    = _axis(data.get("trips_per_week"),    "trips_per_week",    [1, 5])
+        dist     = _axis(data.get("distance_km"),       "distance_km",       [15])
+        years    = _axis(data.get("years"),             "years",             {"min": 1, "max": 10})
+        baseline = _axis(data.get("baseline_g_per_km"), "baseline_g_per_km", [PETROL_G_PER_KM])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cells = trips.size * dist.size * years.size * baseline.size
+    if cells > MAX_SCENARIO_CELLS:
+        return jsonify({
+            "error": f"{cells:,} scenarios requested; the limit is {MAX_SCENARIO_CELLS:,}"
+        }), 413
+
+    axes = {
+        "trips_per_week":    trips.tolist(),
+        "distance_km":       dist.tolist(),
+        "years":             years.tolist(),
+        "baseline_g_per_km": baseline.tolist(),
+    }
+    key   = _scenario_key(vehicle_g_per_km, axes)
+    entry = _scenario_cache.get(key)
+    if entry is None:
+        try:
+            payload = {
+                "vehicle_g_per_km": vehicle_g_per_km,
+                "axes":             axes,
+                "axis_order":       list(axes),
+                **_scenario_grid(vehicle_g_per_km, trips, dist, years, baseline),
+            }
+            entry = CachedBody(encode_json(payload), 0, compress=False)
+        except Exception as e:
+            traceback.print_exc()
+            return jsonify({"error": f"Scenario projection failed: {e}"}), 500
+        _scenario_cache.put(key, entry)
+
+    status, body, headers = negotiate(
+        entry, request.headers.get("If-None-Match"), request.headers.get("Accept-Encoding")
+    )
+    return Response(body, status=status, headers=headers, mimetype="application/json")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+ingest_grid.py  —  Incremental grid-intensity ingestion (Ember + World Bank T&D)
+================================================================================
+Rebuilds grid_intensity cells from the two source files and writes only the
+cells that changed:
+
+    plug_intensity = generation_intensity / (1 - loss_rate)
+
+  - Ember yearly release, long format (CSV or .csv.gz): rows with
+    Variable = "CO2 intensity" (gCO2/kWh) give raw_intensity per
+    (ISO3, year). Aggregate areas (EU, World, ...) are skipped
+  - World Bank EG.ELC.LOSS.ZS (wide CSV, % of output) gives the loss rate.
+    A year with no loss figure uses the country's latest earlier one.
+    Years before a country's first loss figure, and countries with no
+    loss data at all, are skipped and reported (no_loss_data)
+
+Both files are read row by row, keeping only the parsed cells, so memory is
+bounded by the number of (country, year) cells, not by the file size.
+
+The new cells are diffed against grid_intensity under a table lock. Only
+changed or new cells are UPDATEd / INSERTed. In the same transaction the
+data_versions counters "grid" and "grid:<ISO3>" (per changed country) are
+bumped. Running workers pick that up within DATA_VERSION_POLL_S, reload
+engine.GRID_CACHE, and from then on miss every cached /grid, /countries,
+lifecycle, recommendation and forecast result that read a changed country.
+
+    python ingest_grid.py --ember yearly_full_release_long_format.csv \\
+                          --losses API_EG.ELC.LOSS.ZS_DS2_en_csv_v2.csv
+    python ingest_grid.py ... --countries DEU,FRA --dry-run
+"""
+
+import io
+import csv
+import math
+import gzip
+import time
+import bisect
+import argparse
+
+from psycopg2.extras import execute_values
+
+import data_versions
+from database import get_db_connection
+
+# ── Constants ──────────────────────────────────────────────────────────────
+EMBER_VARIABLE = "co2 intensity"
+EMBER_CODE_COLUMNS = ("ISO 3 code", "Country code")   # header differs between releases
+ABS_TOLERANCE = 1e-3            # g/kWh — smaller differences are rounding, not changes
+DECIMALS      = 3
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8-sig", newline="")
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+def _float(value) -> float | None:
+    try:
+        f = float(value)
+    except (TypeError, ValueError):
+        return None
+    return f if math.isfinite(f) else None
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SOURCE PARSING  (streamed)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def read_ember(path: str, countries: set | None = None) -> tuple[dict, int]:
+    """{(ISO3, year): generation gCO2/kWh}, rows scanned."""
+    cells, scanned = {}, 0
+    with _open_text(path) as f:
+        reader = csv.DictReader(f)
+        code_col = next((c for c in EMBER_CODE_COLUMNS if c in (reader.fieldnames or [])), None)
+        if code_col is None:
+            raise ValueError(f"{path}: no country code column ({' / '.join(EMBER_CODE_COLUMNS)})")
+
+        for row in reader:
+            scanned += 1
+            if (row.get("Variable") or "").strip().lower() != EMBER_VARIABLE:
+                continue
+            if (row.get("Area type") or "country").strip().lower() != "country":
+                continue
+            code = (row.get(code_col) or "").strip().upper()
+            if len(code) != 3 or (countries and code not in countries):
+                continue
+            year, value = _float(row.get("Year")), _float(row.get("Value"))
+            if year is None or value is None:
+                continue
+            cells[(code, int(year))] = value
+    return cells, scanned
+
+
+def read_losses(path: str, countries: set | None = None) -> tuple[dict, int]:
+    """{ISO3: ([years], [loss fraction])} sorted by year, rows scanned."""
+    losses, scanned = {}, 0
+    with _open_text(path) as f:
+        reader = csv.reader(f)
+        header = None
+        for row in reader:          # World Bank files start with a few metadata lines
+            if row and row[0].strip() == "Country Name":
+                header = row
+                break
+        if header is None:
+            raise ValueError(f"{path}: no 'Country Name' header row")
+        year_cols = [(i, int(h)) for i, h in enumerate(header) if h.strip().isdigit()]
+        code_col  = header.index("Country Code")
+
+        for row in reader:
+            scanned += 1
+            if len(row) <= code_col:
+                continue
+            code = row[code_col].strip().upper()
+            if countries and code not in countries:
+                continue
+            points = [(year, _float(row[i])) for i, year in year_cols if i < len(row)]
+            points = [(y, pct / 100) for y, pct in points if pct is not None and 0 <= pct < 100]
+            if points:
+                losses[code] = ([y for y, _ in points], [l for _, l in points])
+    return losses, scanned
+
+
+def _loss_for(losses: dict, code: str, year: int) -> float | None:
+    """Loss fraction for `year`, else the latest earlier one; None before the first."""
+    series = losses.get(code)
+    if not series:
+        return None
+    years, values = series
+    i = bisect.bisect_right(years, year)
+    return values[i - 1] if i else None
+
+
+def build_cells(ember: dict, losses: dict) -> tuple[dict, dict]:
+    """{(ISO3, year): (raw, corrected)}, and {ISO3: [years]} skipped for lack of loss data."""
+    cells, no_loss = {}, {}
+    for (code, year), raw in ember.items():
+        loss = _loss_for(losses, code, year)
+        if loss is None:
+            no_loss.setdefault(code, []).append(year)
+            continue
+        cells[(code, year)] = (round(raw, DECIMALS), round(raw / (1 - loss), DECIMALS))
+    return cells, no_loss
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# DIFF + UPSERT
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _same(a, b) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return math.isclose(float(a), float(b), rel_tol=0, abs_tol=ABS_TOLERANCE)
+
+
+def diff(cur, cells: dict) -> tuple[list, list]:
+    """(updates, inserts) as [(code, year, raw, corrected)] against grid_intensity."""
+    codes = sorted({code for code, _ in cells})
+    cur.execute("""
+        SELECT UPPER(country_code), year, raw_intensity, carbon_intensity_gco2_per_kwh
+        FROM grid_intensity
+        WHERE UPPER(country_code) = ANY(%s)
+    """, (codes,))
+    existing = {(code, year): (raw, corrected) for code, year, raw, corrected in cur.fetchall()}
+
+    updates, inserts = [], []
+    for (code, year), (raw, corrected) in sorted(cells.items()):
+        old = existing.get((code, year))
+        if old is None:
+            inserts.append((code, year, raw, corrected))
+        elif not (_same(old[0], raw) and _same(old[1], corrected)):
+            updates.append((code, year, raw, corrected))
+    return updates, inserts
+
+
+def ingest(ember_path: str, losses_path: str, countries: set | None = None,
+           dry_run: bool = False) -> dict:
+    t0 = time.perf_counter()
+    ember, ember_rows  = read_ember(ember_path, countries)
+    losses, loss_rows  = read_losses(losses_path, countries)
+    cells, no_loss     = build_cells(ember, losses)
+    parsed_s           = time.perf_counter() - t0
+
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        # one ingestion at a time; readers are not blocked
+        cur.execute("LOCK TABLE grid_intensity IN SHARE ROW EXCLUSIVE MODE")
+        updates, inserts = diff(cur, cells)
+        changed = sorted({code for code, *_ in updates + inserts})
+
+        if dry_run or not changed:
+            conn.rollback()
+        else:
+            if updates:
+                execute_values(cur, """
+                    UPDATE grid_intensity AS g
+                    SET raw_intensity = v.raw, carbon_intensity_gco2_per_kwh = v.corrected
+                    FROM (VALUES %s) AS v(code, year, raw, corrected)
+                    WHERE UPPER(g.country_code) = v.code AND g.year = v.year
+                """, updates, template="(%s, %s::int, %s::float8, %s::float8)", page_size=1000)
+            if inserts:
+                execute_values(cur, """
+                    INSERT INTO grid_intensity
+                        (country_code, year, raw_intensity, carbon_intensity_gco2_per_kwh)
+                    VALUES %s
+                """, inserts, page_size=1000)
+            data_versions.bump_shared(
+                cur, [data_versions.GRID] + [data_versions.grid_key(c) for c in changed]
+            )
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    return {
+        "rows_scanned":  ember_rows + loss_rows,
+        "rows_per_s":    round((ember_rows + loss_rows) / parsed_s) if parsed_s else None,
+        "cells":         len(cells),
+        "unchanged":     len(cells) - len(updates) - len(inserts),
+        "updated":       len(updates),
+        "inserted":      len(inserts),
+        "countries":     changed,
+        "no_loss_data":  {code: sorted(years) for code, years in sorted(no_loss.items())},
+        "dry_run":       dry_run,
+        "seconds":       round(time.perf_counter() - t0, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upsert changed grid_intensity cells from Ember + World Bank files")
+    parser.add_argument("--ember",  required=True, help="Ember yearly long-format CSV (.csv or .csv.gz)")
+    parser.add_argument("--losses", required=True, help="World Bank EG.ELC.LOSS.ZS CSV")
+    parser.add_argument("--countries", help="comma-separated ISO3 codes (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="report the diff without writing")
+    args = parser.parse_args()
+
+    only   = {c.strip().upper() for c in args.countries.split(",")} if args.countries else None
+    result = ingest(args.ember, args.losses, only, args.dry_run)
+
+    verb = "would change" if result["dry_run"] else "changed"
+    print(f"✅ grid_intensity: {result['updated']} updated, {result['inserted']} inserted, "
+          f"{result['unchanged']} unchanged ({result['rows_scanned']:,} source rows, "
+          f"{result['rows_per_s'] or 0:,} rows/s parse, {result['seconds']}s total)")
+    if result["countries"]:
+        print(f"   {verb}: {', '.join(result['countries'])}")
+    if result["no_loss_data"]:
+        skipped = [
+            f"{code} {years[0]}" if len(years) == 1 else f"{code} {years[0]}–{years[-1]}"
+            for code, years in result["no_loss_data"].items()
+        ]
+        print(f"⚠️  skipped, no T&D loss data: {', '.join(skipped)}")
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+load_vehicles.py  —  Bulk vehicle catalogue loader
+===================================================
+Streams a CSV or XLSX source into the vehicles table in chunks:
+
+    read CHUNK_ROWS rows  →  clean + derive  →  COPY into a temp staging table
+    →  one merge statement (UPDATE matches, INSERT the rest)  →  commit
+
+Rows match on (brand, model, year, vehicle_type), with brand and model
+compared case-insensitively. Source columns that don't exist on vehicles
+are ignored. Values are coerced to the column's type, and a bad number
+becomes NULL rather than failing the chunk.
+
+At load time every row also gets:
+    norm_type         ICE→ICEV, BEV→EV, ...   (manufacturing.NORM)
+    manufacturing_kg  glider + battery + fluids
+    recycling_kg      battery end-of-life
+computed from the GREET tables, which are read once per load
+(manufacturing.reference_factors). So lifecycle and recommendation read
+stored numbers instead of re-deriving them for every query.
+
+    python load_vehicles.py vehicles.csv
+    python load_vehicles.py catalogue.xlsx --sheet Cars --chunk-rows 20000
+    python load_vehicles.py --recompute        # derive for rows already in the table
+
+Run schema_vehicles_derived.sql first.
+"""
+
+import io
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+import data_versions
+from database import get_db_connection
+from manufacturing import reference_factors, derive
+
+# ── Constants ──────────────────────────────────────────────────────────────
+CHUNK_ROWS      = 50_000
+KEY_COLUMNS     = ("brand", "model", "year", "vehicle_type")
+DERIVED_COLUMNS = ("norm_type", "manufacturing_kg", "recycling_kg")
+
+_INT_TYPES   = {"smallint", "integer", "bigint"}
+_FLOAT_TYPES = {"real", "double precision", "numeric"}
+
+_KEY_MATCH = """
+    LOWER(v.brand) = LOWER(s.brand) AND LOWER(v.model) = LOWER(s.model)
+    AND v.year = s.year AND v.vehicle_type = s.vehicle_type
+"""
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SOURCE READING
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _column_name(name) -> str:
+    return str(name).strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def read_chunks(path: str, chunk_rows: int = CHUNK_ROWS, sheet: str | None = None):
+    """Yield DataFrames of at most `chunk_rows` rows, all values as read (str/None)."""
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext in (".csv", ".txt", ".gz"):
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str)
+        return
+
+    if ext in (".xlsx", ".xlsm"):
+        # read_only mode streams rows instead of loading the whole workbook
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws     = wb[sheet] if sheet else wb.active
+            rows   = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame(batch, columns=header)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header)
+        finally:
+            wb.close()
+        return
+
+    raise ValueError(f"Unsupported file type '{ext}' (expected .csv or .xlsx)")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CLEAN + DERIVE
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _vehicle_columns(cur) -> dict:
+    """{column: data_type} for vehicles, minus the id."""
+    cur.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_name = 'vehicles' AND column_name <> 'id'
+        ORDER BY ordinal_position
+    """)
+    return dict(cur.fetchall())
+
+
+def _floats(series: pd.Series) -> np.ndarray:
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def prepare_chunk(df: pd.DataFrame, table_columns: dict, factors: dict) -> pd.DataFrame:
+    """Source chunk → rows ready to COPY: known columns, typed, keyed, derived."""
+    df = df.rename(columns=_column_name)
+    df = df.loc[:, ~df.columns.duplicated()]
+    missing = [c for c in KEY_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Source is missing key column(s): {', '.join(missing)}")
+
+    cols = [c for c in table_columns if c in df.columns and c not in DERIVED_COLUMNS]
+    df   = df[cols].copy()
+
+    for col in cols:
+        kind = table_columns[col]
+        if kind in _INT_TYPES:
+            df[col] = pd.to_numeric(df[col], errors="coerce").round().astype("Int64")
+        elif kind in _FLOAT_TYPES:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        else:
+            df[col] = df[col].astype("string").str.strip().replace("", pd.NA)
+
+    df["vehicle_type"] = df["vehicle_type"].str.upper()
+    df = df.dropna(subset=list(KEY_COLUMNS))
+
+    # last occurrence wins within a chunk, as it would across chunks
+    key = pd.DataFrame({
+        "brand": df["brand"].str.lower(), "model": df["model"].str.lower(),
+        "year":  df["year"],              "vehicle_type": df["vehicle_type"],
+    })
+    df = df[~key.duplicated(keep="last")]
+
+    battery = _floats(df["battery_weight_kg"]) if "battery_weight_kg" in df else np.full(len(df), np.nan)
+    derived = [derive(vtype, kg, factors) for vtype, kg in zip(df["vehicle_type"], battery)]
+    for i, col in enumerate(DERIVED_COLUMNS):
+        df[col] = [d[i] for d in derived]
+    return df
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# STAGING + MERGE
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _merge_sql(cols: list[str]) -> str:
+    col_list = ", ".join(cols)
+    # key columns stay as stored, so a differently-cased source doesn't rename rows
+    updates  = ", ".join(f"{c} = s.{c}" for c in cols if c not in KEY_COLUMNS)
+    return f"""
+        WITH u AS (
+            UPDATE vehicles AS v SET {updates}
+            FROM vehicles_staging AS s
+            WHERE {_KEY_MATCH}
+            RETURNING 1
+        ),
+        i AS (
+            INSERT INTO vehicles ({col_list})
+            SELECT {col_list} FROM vehicles_staging AS s
+            WHERE NOT EXISTS (SELECT 1 FROM vehicles AS v WHERE {_KEY_MATCH})
+            RETURNING 1
+        )
+        SELECT (SELECT COUNT(*) FROM u), (SELECT COUNT(*) FROM i)
+    """
+
+
+def _merge_chunk(cur, df: pd.DataFrame, staged_cols: list) -> tuple[int, int]:
+    """COPY one chunk into staging and merge it; returns (updated, inserted)."""
+    cols = list(df.columns)
+    if cols != staged_cols:
+        cur.execute("DROP TABLE IF EXISTS vehicles_staging")
+        cur.execute(f"CREATE TEMP TABLE vehicles_staging AS SELECT {', '.join(cols)} FROM vehicles WITH NO DATA")
+        staged_cols[:] = cols
+    else:
+        cur.execute("TRUNCATE vehicles_staging")
+
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cur.copy_expert(f"COPY vehicles_staging ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+    # keep a concurrent loader from inserting the same keys between our two steps
+    cur.execute("LOCK TABLE vehicles IN SHARE ROW EXCLUSIVE MODE")
+    cur.execute(_merge_sql(cols))
+    return cur.fetchone()
+
+
+def load(path: str, chunk_rows: int = CHUNK_ROWS, sheet: str | None = None) -> dict:
+    """Load a CSV/XLSX source into vehicles; returns counts."""
+    return load_frames(read_chunks(path, chunk_rows, sheet))
+
+
+def load_frames(frames) -> dict:
+    """
+    Merge an iterable of DataFrames (source column names) into vehicles,
+    one transaction per frame; returns counts. Other producers, such as
+    eea_aggregate.py, feed the table through here.
+    """
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    totals = {"read": 0, "updated": 0, "inserted": 0}
+    staged_cols: list = []
+    t0 = time.perf_counter()
+    try:
+        table_columns = _vehicle_columns(cur)
+        if not all(c in table_columns for c in DERIVED_COLUMNS):
+            raise RuntimeError("vehicles has no derived columns — run schema_vehicles_derived.sql")
+        factors = reference_factors(conn)
+        conn.commit()
+
+        for chunk in frames:
+            totals["read"] += len(chunk)
+            rows = prepare_chunk(chunk, table_columns, factors)
+            if rows.empty:
+                continue
+            updated, inserted = _merge_chunk(cur, rows, staged_cols)
+            if updated or inserted:
+                data_versions.bump_shared(cur, [data_versions.VEHICLES])
+            conn.commit()
+            totals["updated"]  += updated
+            totals["inserted"] += inserted
+
+            elapsed = time.perf_counter() - t0
+            print(f"   {totals['read']:>10,} rows read  "
+                  f"({totals['read'] / elapsed:,.0f} rows/s)  "
+                  f"+{inserted} new, {updated} updated")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    totals["seconds"] = round(time.perf_counter() - t0, 2)
+    return totals
+
+
+def recompute() -> int:
+    """Fill the derived columns for every vehicle already in the table."""
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        factors = reference_factors(conn)
+        cur.execute("SELECT id, vehicle_type, battery_weight_kg FROM vehicles")
+        rows = [
+            (vid, *derive(vtype, float(kg) if kg is not None else None, factors))
+            for vid, vtype, kg in cur.fetchall()
+        ]
+        execute_values(cur, """
+            UPDATE vehicles AS v
+            SET norm_type = d.norm_type, manufacturing_kg = d.mfg, recycling_kg = d.rec
+            FROM (VALUES %s) AS d(id, norm_type, mfg, rec)
+            WHERE v.id = d.id
+        """, rows, template="(%s::int, %s::text, %s::float8, %s::float8)", page_size=5000)
+        data_versions.bump_shared(cur, [data_versions.VEHICLES])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load the vehicles catalogue from CSV/XLSX")
+    parser.add_argument("path", nargs="?", help="CSV or XLSX source")
+    parser.add_argument("--sheet", help="XLSX worksheet (default: first)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--recompute", action="store_true",
+                        help="only (re)derive norm_type / manufacturing_kg / recycling_kg for existing rows")
+    args = parser.parse_args()
+
+    if args.recompute:
+        t0 = time.perf_counter()
+        n  = recompute()
+        print(f"✅ vehicles: derived columns recomputed for {n} rows in {time.perf_counter() - t0:.2f}s")
+    elif args.path:
+        result = load(args.path, args.chunk_rows, args.sheet)
+        rate   = result["read"] / result["seconds"] if result["seconds"] else 0
+        print(f"✅ vehicles: {result['inserted']} inserted, {result['updated']} updated "
+              f"from {result['read']} rows in {result['seconds']}s ({rate:,.0f} rows/s)")
+    else:
+        parser.error("a source path or --recompute is required")
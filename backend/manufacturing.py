@@ -2,6 +2,8 @@ import psycopg2
 import os
 import dotenv
 
+import snapshot
+
 dotenv.load_dotenv()
 
 LIFETIME_KM = 278_600
@@ -144,21 +146,132 @@ def recycling_material_flow(vehicle_weight_kg):
 
 
 def manufacturing_kg(vehicle):
+    # precomputed at load time by load_vehicles.py
+    if vehicle.get("manufacturing_kg") is not None:
+        return float(vehicle["manufacturing_kg"])
     vehicle_type = vehicle.get("vehicle_type")
     if not vehicle_type:
         raise ValueError("vehicle_type missing")
+    return snapshot.with_fallback(
+        lambda: _manufacturing_kg_db(vehicle_type),
+        lambda snap: _manufacturing_kg_snapshot(snap, vehicle_type),
+    )
+
+
+def _manufacturing_kg_db(vehicle_type):
     conn   = get_connection()
     result = glider_emissions(vehicle_type, conn) + battery_emissions(vehicle_type, conn) + fluid_emissions(vehicle_type, conn)
     conn.close()
     return result
 
 
+def _manufacturing_kg_snapshot(snap, vehicle_type):
+    vtype = normalise(vehicle_type)
+    mfg   = snapshot_factors(snap).get(vtype, {}).get("manufacturing_kg")
+    if mfg is None:
+        raise ValueError(f"No glider emissions for vehicle_type='{vehicle_type}' (looked up as '{vtype}')")
+    return mfg
+
+
 def manufacturing_per_km(vehicle):
     return manufacturing_kg(vehicle) / LIFETIME_KM
 
 
 def recycling_kg(vehicle, method=None):
+    # precomputed at load time by load_vehicles.py
+    if vehicle.get("recycling_kg") is not None:
+        return float(vehicle["recycling_kg"])
+    return snapshot.with_fallback(
+        lambda: _recycling_kg_db(vehicle),
+        lambda snap: derive(vehicle.get("vehicle_type", ""), vehicle.get("battery_weight_kg"), snapshot_factors(snap))[2],
+    )
+
+
+def _recycling_kg_db(vehicle):
     conn   = get_connection()
     result = battery_recycling_emissions(vehicle, conn)
     conn.close()
-    return result
\ No newline at end of file
+    return result
+
+
+# ── Load-time derivation (load_vehicles.py) ──────────────────────────────────
+# manufacturing_kg depends only on the normalised type, and recycling_kg on the
+# type plus the vehicle's own battery weight. So the GREET tables are read once
+# per load, and each vehicle row costs a dict lookup.
+
+def reference_factors(conn):
+    """
+    {normalised_type: {"manufacturing_kg": float | None,
+                       "battery_weight_kg": float | None}}
+    using the same lookups as manufacturing_kg() / recycling_kg().
+    """
+    factors = {}
+    for vtype in sorted(set(NORM.values())):
+        try:
+            mfg = glider_emissions(vtype, conn) + battery_emissions(vtype, conn) + fluid_emissions(vtype, conn)
+        except ValueError:
+            mfg = None     # no glider row — read path raises as before
+        factors[vtype] = {
+            "manufacturing_kg":  mfg,
+            "battery_weight_kg": _battery_weight_kg_from_db(vtype, conn),
+        }
+    return factors
+
+
+def derive(vehicle_type, battery_weight_kg, factors):
+    """(normalised_type, manufacturing_kg, recycling_kg) for one vehicle row."""
+    ntype = normalise(vehicle_type)
+    f     = factors.get(ntype, {})
+
+    if ntype in EOL_ZERO_TYPES:
+        recycle = 0.0
+    else:
+        weight  = battery_weight_kg if battery_weight_kg and battery_weight_kg > 0 else (f.get("battery_weight_kg") or 0)
+        recycle = weight * BATTERY_RECYCLING_FACTOR if weight > 0 else 0.0
+
+    return ntype, f.get("manufacturing_kg"), recycle
+
+
+def snapshot_factors(snap):
+    """reference_factors() computed from a snapshot bundle instead of the DB."""
+    return snap.memo("manufacturing_factors", _factors_from_snapshot)
+
+
+def _greet_tables(snap) -> dict:
+    cols = lambda table, *names: zip(*(snap.values(table, n) for n in names))
+    return {
+        "glider":  {(t, s): kg for t, s, kg in cols("glider_emissions", "vehicle_type", "structure", "kg_co2")},
+        "weights": {(t, c, s): lb for t, c, s, lb in
+                    cols("battery_weights", "vehicle_type", "chemistry", "structure", "weight_lb")},
+        "per_kg":  dict(cols("battery_emission_factors", "chemistry", "kg_co2_per_kg")),
+        "fluids":  dict(cols("fluids_weights", "vehicle_type", "grams_co2")),
+    }
+
+
+def greet_tables(snap) -> dict:
+    """The GREET lookups of a snapshot bundle as dicts (glider / weights / per_kg / fluids)."""
+    return snap.memo("greet_tables", _greet_tables)
+
+
+def snapshot_parts(snap, vtype, chemistry) -> tuple:
+    """
+    (glider kg | None, battery weight kg | None, battery kg, fluids kg) for one
+    GREET vehicle type and battery chemistry, read from a snapshot bundle.
+    """
+    g = greet_tables(snap)
+    weight_lb = g["weights"].get((vtype, chemistry, "conventional")) if chemistry else None
+    weight_kg = weight_lb * LB_TO_KG if weight_lb is not None else None
+    battery   = weight_kg * (g["per_kg"].get(chemistry) or 0) if weight_kg is not None else 0
+    return (g["glider"].get((vtype, "conventional")), weight_kg, battery,
+            (g["fluids"].get(vtype) or 0) / 1000)
+
+
+def _factors_from_snapshot(snap):
+    factors = {}
+    for vtype in sorted(set(NORM.values())):
+        glide, weight_kg, battery, fluids = snapshot_parts(snap, vtype, CHEMISTRY_MAP.get(vtype))
+        factors[vtype] = {
+            "manufacturing_kg":  None if glide is None else glide + battery + fluids,
+            "battery_weight_kg": weight_kg,
+        }
+    return factors
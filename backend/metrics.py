@@ -0,0 +1,323 @@
+"""
+metrics.py  —  Per-route latency, DB time and outbound HTTP time for /metrics
+=============================================================================
+Request middleware for both app.py (Flask) and api.py (FastAPI) records:
+
+    http_requests_total{method,route,status}             counter
+    http_request_duration_seconds{method,route}          histogram
+    http_request_db_queries{method,route}                histogram (queries per request)
+    http_request_db_seconds{method,route}                histogram (DB time per request)
+    http_request_outbound_seconds{method,route}          histogram (outbound HTTP time per request)
+    db_query_duration_seconds                            histogram (every psycopg2 execute)
+    outbound_http_duration_seconds{host,status}          histogram (every requests / httpx call)
+
+It serves them at GET /metrics in Prometheus text format. The route label
+is the URL rule ("/wallet/travel/by-name"), never the raw path, so label
+cardinality stays bounded.
+
+Hot-path cost is a bisect and two list increments. Every thread writes to
+its own preallocated cells, and a scrape sums them, so no lock is taken
+per observation. Cells of finished threads are folded into a retired
+total at the next scrape. That way, a server that starts one thread per
+request does not keep one shard per request it ever served.
+
+DB queries are counted by database.TimedCursor, the default cursor of
+get_db_connection() and pooled_connection(). Outbound time comes from a
+wrapper around requests.Session.send and from httpx event hooks. Work a
+request hands to a background thread (the greenwashing web search)
+still shows up in the global DB and outbound histograms. It is not
+counted in that request's per-request figures.
+
+Counters are per process: with several workers, each scrape sees one
+worker, so scrape every worker or aggregate per instance.
+METRICS_ENABLED=0 turns the middleware off.
+"""
+
+import os
+import time
+import bisect
+import threading
+import contextvars
+from urllib.parse import urlsplit
+
+# ── Constants ──────────────────────────────────────────────────────────────
+ENABLED      = os.getenv("METRICS_ENABLED", "1") != "0"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+UNMATCHED    = "<unmatched>"
+
+LATENCY_BUCKETS  = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DB_TIME_BUCKETS  = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10)
+QUERY_BUCKETS    = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+OUTBOUND_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# METRIC FAMILIES  — per-thread cells, summed at scrape time
+# ══════════════════════════════════════════════════════════════════════════════
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), width: int = 1):
+        self.name    = name
+        self.help    = help
+        self.labels  = labels
+        self.width   = width
+        self._local  = threading.local()
+        self._shards = []           # [(thread, {label_values: cells})]
+        self._retired = {}          # cells of threads that have exited
+        self._lock   = threading.Lock()
+        REGISTRY.append(self)
+
+    def _cells(self, key: tuple) -> list:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:        # once per thread
+                self._shards.append((threading.current_thread(), shard))
+        cells = shard.get(key)
+        if cells is None:
+            cells = shard[key] = [0] * self.width
+        return cells
+
+    def collect(self) -> dict:
+        """{label_values: summed cells}; folds exited threads into the retired total."""
+        def add(into, key, cells):
+            acc = into.get(key)
+            if acc is None:
+                into[key] = list(cells)
+            else:
+                for i, v in enumerate(cells):
+                    acc[i] += v
+
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    for key, cells in list(shard.items()):
+                        add(self._retired, key, cells)
+            self._shards = live
+            total = {key: list(cells) for key, cells in self._retired.items()}
+            for _, shard in live:
+                for key, cells in list(shard.items()):
+                    add(total, key, cells)
+        return total
+
+    def _label_str(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, cells in sorted(self.collect().items()):
+            lines.extend(self._samples(key, cells))
+        return lines
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def inc(self, key: tuple = (), amount: float = 1):
+        self._cells(key)[0] += amount
+
+    def _samples(self, key, cells):
+        return [f"{self.name}{self._label_str(key)} {_num(cells[0])}"]
+
+
+class Histogram(_Family):
+    """Cells are one count per bucket, then +Inf, then the running sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labels, width=len(self.buckets) + 2)
+
+    def observe(self, key: tuple, value: float):
+        cells = self._cells(key)
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def _samples(self, key, cells):
+        out, running = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), cells):
+            running += count
+            le = 'le="%s"' % ("+Inf" if bound == "+Inf" else _num(bound))
+            out.append(f"{self.name}_bucket{self._label_str(key, le)} {running}")
+        out.append(f"{self.name}_sum{self._label_str(key)} {_num(cells[-1])}")
+        out.append(f"{self.name}_count{self._label_str(key)} {running}")
+        return out
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY: list[_Family] = []
+
+REQUESTS          = Counter("http_requests_total", "HTTP requests by route and status code.",
+                            ("method", "route", "status"))
+REQUEST_SECONDS   = Histogram("http_request_duration_seconds", "Time to handle a request.",
+                              ("method", "route"), LATENCY_BUCKETS)
+REQUEST_QUERIES   = Histogram("http_request_db_queries", "DB queries issued per request.",
+                              ("method", "route"), QUERY_BUCKETS)
+REQUEST_DB        = Histogram("http_request_db_seconds", "Time spent in DB queries per request.",
+                              ("method", "route"), DB_TIME_BUCKETS)
+REQUEST_OUTBOUND  = Histogram("http_request_outbound_seconds", "Time spent in outbound HTTP calls per request.",
+                              ("method", "route"), OUTBOUND_BUCKETS)
+QUERY_SECONDS     = Histogram("db_query_duration_seconds", "Duration of one DB execute.",
+                              (), DB_TIME_BUCKETS)
+OUTBOUND_SECONDS  = Histogram("outbound_http_duration_seconds", "Duration of one outbound HTTP call.",
+                              ("host", "status"), OUTBOUND_BUCKETS)
+
+
+def render() -> str:
+    """Every registered family in Prometheus text exposition format."""
+    return "\n".join(line for family in REGISTRY for line in family.render()) + "\n"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PER-REQUEST ACCOUNTING
+# ══════════════════════════════════════════════════════════════════════════════
+
+class _RequestStats:
+    __slots__ = ("started", "queries", "db_s", "outbound_s")
+
+    def __init__(self):
+        self.started    = time.perf_counter()
+        self.queries    = 0
+        self.db_s       = 0.0
+        self.outbound_s = 0.0
+
+
+_current: contextvars.ContextVar[_RequestStats | None] = contextvars.ContextVar(
+    "metrics_request", default=None
+)
+
+
+def begin_request():
+    """Start accounting for one request; pass the token to end_request()."""
+    return _current.set(_RequestStats())
+
+
+def end_request(token, method: str, route: str | None, status: int):
+    stats = _current.get()
+    _current.reset(token)
+    if stats is None:
+        return
+    key = (method, route or UNMATCHED)
+    REQUESTS.inc(key + (str(status),))
+    REQUEST_SECONDS.observe(key, time.perf_counter() - stats.started)
+    REQUEST_QUERIES.observe(key, stats.queries)
+    REQUEST_DB.observe(key, stats.db_s)
+    REQUEST_OUTBOUND.observe(key, stats.outbound_s)
+
+
+def record_query(seconds: float):
+    """Called by database.TimedCursor after every execute."""
+    QUERY_SECONDS.observe((), seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_s    += seconds
+
+
+def record_outbound(host: str, status, seconds: float):
+    OUTBOUND_SECONDS.observe((host or "", str(status)), seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.outbound_s += seconds
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# OUTBOUND HTTP  (requests, httpx)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def instrument_requests():
+    """Time every call made through the requests library (module functions included)."""
+    import requests
+
+    send = requests.Session.send
+    if getattr(send, "_metrics_wrapped", False):
+        return
+
+    def timed_send(self, request, **kwargs):
+        t0, status = time.perf_counter(), "error"
+        try:
+            response = send(self, request, **kwargs)
+            status   = response.status_code
+            return response
+        finally:
+            record_outbound(urlsplit(request.url).hostname, status, time.perf_counter() - t0)
+
+    timed_send._metrics_wrapped = True
+    requests.Session.send = timed_send
+
+
+def httpx_event_hooks() -> dict:
+    """event_hooks for an httpx.AsyncClient; times up to the response headers."""
+    async def on_request(request):
+        request.extensions["metrics_t0"] = time.perf_counter()
+
+    async def on_response(response):
+        t0 = response.request.extensions.get("metrics_t0")
+        if t0 is not None:
+            record_outbound(response.request.url.host, response.status_code, time.perf_counter() - t0)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# FRAMEWORK HOOKS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def init_app(app, path: str | None = "/metrics"):
+    """Install the Flask request hooks and, unless path is None, the /metrics route."""
+    from flask import Response, g, request
+
+    if path:
+        app.add_url_rule(path, "metrics", lambda: Response(render(), mimetype=CONTENT_TYPE))
+    if not ENABLED:
+        return
+    instrument_requests()
+
+    @app.before_request
+    def _metrics_begin():
+        g.metrics_token = begin_request()
+
+    @app.after_request
+    def _metrics_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metrics_end(exc):
+        token = g.pop("metrics_token", None)
+        if token is not None:
+            rule = request.url_rule
+            end_request(token, request.method, rule.rule if rule else None,
+                        g.pop("metrics_status", 500))
+
+
+async def asgi_middleware(request, call_next):
+    """FastAPI http middleware. Requests no native route matched are left to the
+    mounted Flask app's own hooks, so they are not counted twice."""
+    token, status = begin_request(), 500
+    try:
+        response = await call_next(request)
+        status   = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        if route is not None:
+            end_request(token, request.method, route.path, status)
+        else:
+            _current.reset(token)
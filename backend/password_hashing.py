@@ -0,0 +1,222 @@
+"""
+password_hashing.py  —  bcrypt off the request thread
+======================================================
+bcrypt is deliberately slow (~250 ms at cost 12). Run inline, a burst of
+logins pins every Flask worker on hashing and unrelated requests queue
+behind it. Hashing and checking run in a small process pool instead:
+
+    digest, hash_ms = hash_password("secret")
+    ok,     hash_ms = check_password("secret", digest)
+
+  - at most HASH_WORKERS hashes run at once (one per process, so no GIL)
+  - at most HASH_QUEUE_LIMIT may be in flight or waiting. Past that,
+    HashPoolSaturated is raised immediately, and the caller answers 429
+    instead of letting the queue grow
+  - a hash still unfinished after HASH_TIMEOUT_S raises HashTimeout (a
+    HashPoolSaturated), and is answered the same way. Its slot stays
+    taken until the worker actually finishes it
+  - workers start from a forkserver (spawn on Windows), never by forking
+    the multithreaded server process
+  - if a worker dies (e.g. OOM-killed) the pool is broken for good, so it
+    is shut down and replaced, and the hash is retried once on the new one
+  - BCRYPT_ROUNDS sets the cost for new hashes. Existing hashes carry
+    their own cost, so changing it never breaks logins
+
+Timings are kept separately for pure hash time (measured inside the
+worker), queue wait, and whole-request time. metrics() reports them.
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+# ── Constants ──────────────────────────────────────────────────────────────
+BCRYPT_ROUNDS    = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS     = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_WORKERS * 4)))
+HASH_TIMEOUT_S   = float(os.getenv("HASH_TIMEOUT_S", "10"))
+TIMING_SAMPLES   = 1024
+
+
+class HashPoolSaturated(Exception):
+    """Too many hashes in flight — the caller should shed load (HTTP 429)."""
+
+
+class HashTimeout(HashPoolSaturated):
+    """A hash did not finish within HASH_TIMEOUT_S; shed load the same way."""
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# WORKER FUNCTIONS  (run in the pool processes)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _hash(plain: str, rounds: int) -> tuple[str, float]:
+    t0 = time.perf_counter()
+    digest = bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+    return digest, (time.perf_counter() - t0) * 1000
+
+
+def _check(plain: str, hashed: str) -> tuple[bool, float]:
+    t0 = time.perf_counter()
+    ok = bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
+    return ok, (time.perf_counter() - t0) * 1000
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# METRICS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class _Timings:
+    """Recent samples of one latency, in ms."""
+
+    def __init__(self):
+        self._samples = deque(maxlen=TIMING_SAMPLES)
+        self._count   = 0
+        self._lock    = threading.Lock()
+
+    def add(self, ms: float):
+        with self._lock:
+            self._samples.append(ms)
+            self._count += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples, count = sorted(self._samples), self._count
+        if not samples:
+            return {"count": count}
+        pick = lambda pct: samples[min(len(samples) - 1, int(pct / 100 * len(samples)))]
+        return {
+            "count":  count,
+            "p50_ms": round(pick(50), 2),
+            "p95_ms": round(pick(95), 2),
+            "p99_ms": round(pick(99), 2),
+            "max_ms": round(samples[-1], 2),
+        }
+
+
+TIMINGS = {
+    "hash":       _Timings(),   # bcrypt CPU time inside the worker
+    "queue_wait": _Timings(),   # submit → result, minus hash time
+    "request":    _Timings(),   # whole auth request (recorded by auth_routes)
+}
+_rejected  = 0
+_timed_out = 0
+_restarts  = 0
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# POOL
+# ══════════════════════════════════════════════════════════════════════════════
+
+_pool       = None
+_pool_lock  = threading.Lock()
+_slots      = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+_in_flight  = 0
+_count_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                ctx = multiprocessing.get_context(method)
+                if method == "forkserver":
+                    # the server imports only this module (and bcrypt), not the app
+                    ctx.set_forkserver_preload([__name__])
+                _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=ctx)
+    return _pool
+
+
+def _discard_pool(broken: ProcessPoolExecutor):
+    """Drop a broken pool so the next _get_pool() starts a fresh one."""
+    global _pool, _restarts
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+            with _count_lock:
+                _restarts += 1
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _release(_future=None):
+    """Free a queue slot once its job is done (or was never submitted)."""
+    global _in_flight
+    with _count_lock:
+        _in_flight -= 1
+    _slots.release()
+
+
+def _run(fn, *args):
+    """Submit to the pool; returns (result, hash_ms). Raises HashPoolSaturated / HashTimeout."""
+    try:
+        return _run_once(fn, args)
+    except BrokenProcessPool:
+        # a worker died; _run_once replaced the pool, so try once more
+        return _run_once(fn, args)
+
+
+def _run_once(fn, args):
+    global _in_flight, _rejected, _timed_out
+    if not _slots.acquire(blocking=False):
+        with _count_lock:
+            _rejected += 1
+        raise HashPoolSaturated(f"{HASH_QUEUE_LIMIT} password hashes already queued")
+
+    with _count_lock:
+        _in_flight += 1
+    t0   = time.perf_counter()
+    pool = _get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except BaseException as e:
+        _release()
+        if isinstance(e, BrokenProcessPool):
+            _discard_pool(pool)
+        raise
+    # the slot is held until the job finishes, even if we stop waiting for it
+    future.add_done_callback(_release)
+
+    try:
+        result, hash_ms = future.result(timeout=HASH_TIMEOUT_S)
+    except FuturesTimeout:
+        with _count_lock:
+            _timed_out += 1
+        raise HashTimeout(f"password hash took longer than {HASH_TIMEOUT_S:g}s") from None
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+    TIMINGS["hash"].add(hash_ms)
+    TIMINGS["queue_wait"].add(max((time.perf_counter() - t0) * 1000 - hash_ms, 0.0))
+    return result, hash_ms
+
+
+def hash_password(plain: str) -> tuple[str, float]:
+    """bcrypt hash at BCRYPT_ROUNDS; returns (hash, hash_ms)."""
+    return _run(_hash, plain, BCRYPT_ROUNDS)
+
+
+def check_password(plain: str, hashed: str) -> tuple[bool, float]:
+    """Returns (matches, hash_ms)."""
+    return _run(_check, plain, hashed)
+
+
+def metrics() -> dict:
+    return {
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "workers":       HASH_WORKERS,
+        "queue_limit":   HASH_QUEUE_LIMIT,
+        "in_flight":     _in_flight,
+        "rejected":      _rejected,
+        "timed_out":     _timed_out,
+        "pool_restarts": _restarts,
+        **{f"{name}_ms": t.summary() for name, t in TIMINGS.items()},
+    }
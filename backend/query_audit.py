@@ -0,0 +1,275 @@
+"""
+query_audit.py  —  Slow-query and N+1 detection on the psycopg2 cursor
+======================================================================
+database.TimedCursor reports every execute here. This module writes two
+kinds of finding to a rotating JSON-lines report:
+
+    slow_query   one execute over QUERY_SLOW_MS. Records the statement,
+                 the shape of its parameters (types and list lengths,
+                 never the values), its row count and the request it
+                 ran in. For a QUERY_EXPLAIN_RATE fraction of slow
+                 SELECTs, it also records an EXPLAIN (ANALYZE, BUFFERS)
+                 plan.
+    n_plus_one   a request that ran one statement more than
+                 QUERY_REPEAT_LIMIT times. Records the count, the total
+                 time, the span from first to last execute and the
+                 parameter shape. This is usually a per-row lookup that
+                 should be one batched query.
+
+Statements are grouped by their text with whitespace collapsed and
+literals replaced by "?". So a query built with an f-string still groups
+with itself. Repeat counts need a request scope: app.py and api.py open one per
+request (init_app(), asgi_middleware). Loaders and scripts get slow-query findings
+only.
+
+EXPLAIN ANALYZE runs the statement a second time. That is why only
+SELECTs are sampled. The plan is captured on a separate short-lived
+connection, on a background thread, so it never delays the request or
+touches the caller's transaction.
+
+Settings (environment):
+    QUERY_SLOW_MS            200      slow-query threshold
+    QUERY_REPEAT_LIMIT       10       more executes than this per request → n_plus_one
+    QUERY_EXPLAIN_RATE       0        fraction of slow SELECTs to EXPLAIN (0 = never)
+    QUERY_AUDIT_FILE         logs/query_audit.jsonl
+    QUERY_AUDIT_MAX_BYTES    5 MB     rotate at this size, keeping
+    QUERY_AUDIT_BACKUPS      3        this many old files
+    QUERY_AUDIT              1        0 turns auditing off
+"""
+
+import os
+import re
+import json
+import time
+import random
+import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor
+
+# ── Constants ──────────────────────────────────────────────────────────────
+ENABLED       = os.getenv("QUERY_AUDIT", "1") != "0"
+SLOW_S        = float(os.getenv("QUERY_SLOW_MS", "200")) / 1000
+REPEAT_LIMIT  = int(os.getenv("QUERY_REPEAT_LIMIT", "10"))
+EXPLAIN_RATE  = float(os.getenv("QUERY_EXPLAIN_RATE", "0"))
+REPORT_FILE   = os.getenv("QUERY_AUDIT_FILE") or os.path.join(
+    os.path.dirname(__file__), "..", "logs", "query_audit.jsonl"
+)
+MAX_BYTES     = int(os.getenv("QUERY_AUDIT_MAX_BYTES", str(5 * 1024 * 1024)))
+BACKUPS       = int(os.getenv("QUERY_AUDIT_BACKUPS", "3"))
+EXPLAIN_TIMEOUT_MS = 10_000
+STATEMENT_CHARS    = 2000     # truncate statements in the report
+
+_LITERALS   = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+_SELECT     = re.compile(r"^\s*(\(\s*)*(select|with)\b", re.I)
+_WRITES     = re.compile(r"\b(insert|update|delete|merge|truncate|create|drop|alter)\b", re.I)
+
+_request: contextvars.ContextVar[dict | None] = contextvars.ContextVar("query_audit", default=None)
+_rng       = random.Random()
+_explainer = None
+_logger    = None
+_init_lock = threading.Lock()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# REPORT
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _report(finding: dict):
+    global _logger
+    if _logger is None:
+        with _init_lock:
+            if _logger is None:
+                logger = logging.getLogger("query_audit")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(REPORT_FILE)), exist_ok=True)
+                    handler = RotatingFileHandler(REPORT_FILE, maxBytes=MAX_BYTES,
+                                                  backupCount=BACKUPS, encoding="utf-8")
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    logger.addHandler(handler)
+                except OSError as e:
+                    print(f"⚠️  query_audit: cannot open {REPORT_FILE} ({e}); findings go to stdout only")
+                    logger.addHandler(logging.NullHandler())
+                _logger = logger
+
+    finding = {"at": _now(), **finding}
+    _logger.info(json.dumps(finding, default=str))
+    size = f"{finding['ms']} ms" if "ms" in finding else f"{finding['count']}×"
+    print(f"⚠️  [query_audit] {finding['kind']} {size} in {finding.get('request') or '-'}: "
+          f"{finding['statement'][:120]}")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+@lru_cache(maxsize=2048)
+def statement_key(query: str) -> str:
+    """Statement text with whitespace collapsed and literals replaced by '?'."""
+    return _WHITESPACE.sub(" ", _LITERALS.sub("?", query)).strip()
+
+
+def param_shape(params):
+    """Types and lengths of the parameters, never their values."""
+    def one(v):
+        if isinstance(v, (list, tuple, set)):
+            inner = sorted({type(x).__name__ for x in v})
+            return f"{type(v).__name__}[{'|'.join(inner)}]×{len(v)}"
+        return type(v).__name__
+
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: one(v) for k, v in params.items()}
+    return [one(v) for v in params]
+
+
+def _query_text(cursor, query) -> str:
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    if hasattr(query, "as_string"):          # psycopg2.sql.Composable
+        return query.as_string(cursor)
+    return str(query)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CURSOR HOOK
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _shape(params, many: bool):
+    if not many:
+        return param_shape(params)
+    rows = params if isinstance(params, (list, tuple)) else None     # generators are spent
+    return {"executemany": len(rows) if rows is not None else None,
+            "row": param_shape(rows[0]) if rows else None}
+
+
+def record(cursor, query, params, seconds: float, many: bool = False):
+    """Called by database.TimedCursor after execute / executemany."""
+    if not ENABLED:
+        return
+    scope = _request.get()
+    if seconds < SLOW_S and scope is None:
+        return
+
+    text = _query_text(cursor, query)
+    key  = statement_key(text)
+
+    if scope is not None:
+        stat = scope["statements"].get(key)
+        now  = time.perf_counter()
+        if stat is None:
+            scope["statements"][key] = [1, seconds, now, now, _shape(params, many)]
+        else:
+            stat[0] += 1
+            stat[1] += seconds
+            stat[3]  = now
+
+    if seconds >= SLOW_S:
+        finding = {
+            "at":        _now(),
+            "kind":      "slow_query",
+            "ms":        round(seconds * 1000, 1),
+            "statement": key[:STATEMENT_CHARS],
+            "params":    _shape(params, many),
+            "rows":      cursor.rowcount,
+            "request":   scope["label"] if scope else None,
+        }
+        if (EXPLAIN_RATE > 0 and not many and _SELECT.match(text) and not _WRITES.search(key)
+                and _rng.random() < EXPLAIN_RATE):
+            try:
+                sql = cursor.mogrify(query, params)
+            except Exception:
+                sql = None
+            if sql is not None:
+                _explain_later(sql, finding)
+                return
+        _report(finding)
+
+
+def _explain_later(sql: bytes, finding: dict):
+    global _explainer
+    if _explainer is None:
+        with _init_lock:
+            if _explainer is None:
+                _explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-explain")
+    _explainer.submit(_explain, sql, finding)
+
+
+def _explain(sql: bytes, finding: dict):
+    import psycopg2
+
+    try:
+        conn = psycopg2.connect(os.getenv("DB_URI"),
+                                options=f"-c statement_timeout={EXPLAIN_TIMEOUT_MS}")
+        try:
+            with conn.cursor() as cur:
+                cur.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + sql)
+                finding["explain"] = [row[0] for row in cur.fetchall()]
+        finally:
+            conn.rollback()
+            conn.close()
+    except Exception as e:
+        finding["explain_error"] = str(e)[:300]
+    _report(finding)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# REQUEST SCOPE
+# ══════════════════════════════════════════════════════════════════════════════
+
+def begin_request(label: str):
+    """Start counting statements for one request; pass the token to end_request()."""
+    return _request.set({"label": label, "statements": {}})
+
+
+def end_request(token):
+    """Close the scope and report statements repeated more than REPEAT_LIMIT times."""
+    scope = _request.get()
+    _request.reset(token)
+    if scope is None:
+        return
+    for key, (count, total_s, first, last, shape) in scope["statements"].items():
+        if count > REPEAT_LIMIT:
+            _report({
+                "kind":      "n_plus_one",
+                "count":     count,
+                "total_ms":  round(total_s * 1000, 1),
+                "span_ms":   round((last - first) * 1000, 1),
+                "statement": key[:STATEMENT_CHARS],
+                "params":    shape,
+                "request":   scope["label"],
+            })
+
+
+def init_app(app):
+    """Open a statement-counting scope around every Flask request."""
+    if not ENABLED:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _query_audit_begin():
+        rule = request.url_rule
+        g.query_audit_token = begin_request(f"{request.method} {rule.rule if rule else request.path}")
+
+    @app.teardown_request
+    def _query_audit_end(exc):
+        token = g.pop("query_audit_token", None)
+        if token is not None:
+            end_request(token)
+
+
+async def asgi_middleware(request, call_next):
+    """FastAPI http middleware; covers engine work that api._offload runs on its pool."""
+    token = begin_request(f"{request.method} {request.url.path}")
+    try:
+        return await call_next(request)
+    finally:
+        end_request(token)
@@ -1,4 +1,11 @@
+import numpy as np
+
 from database import get_db_connection
+from engine import GRID_CACHE
+import data_access
+import data_versions
+from manufacturing import LB_TO_KG, greet_tables, snapshot_parts
+import snapshot
 
 COUNTRY_CODE_MAP = {
     "US": "USA", "DE": "DEU", "FR": "FRA", "UK": "GBR",
@@ -8,6 +15,9 @@ COUNTRY_CODE_MAP = {
 
 LIFETIME_KM = 278_600
 
+# chemistry joined per mtype in the mfg CTE (anything else: LiIon)
+CHEMISTRY_BY_MTYPE = {"ICEV": "LeadAcid", "HEV": "NiMH", "PHEV": "LiIon", "EV": "LiIon", "FCV": "NiMH"}
+
 # ── GREET2 constant (hardcoded — no battery_recycling_factors table needed) ──
 BATTERY_RECYCLING_FACTOR = 1.4706  # kg CO2 per kg battery
 
@@ -57,44 +67,34 @@ def generate_reasons(r, rank, all_results, lifetime_km, annual_km, grid_ci):
     return reasons[:4]
 
 
-def recommend_vehicle(
-    daily_km,
-    years=10,
-    body_type=None,
-    vehicle_type=None,
-    top_n=3,
-    country="US",
-    grid_year=2023,
-    baseline_vehicle=None,
-):
+def cache_version(country, grid_year):
     """
-    EoL recycling logic (GREET2):
-      EV/PHEV:      battery_weight_kg × 1.4706 kg CO2/kg
-      ICEV/HEV/FCV: 0  (metal recycling credits offset dismantling/shredding)
-
-    Battery weight:
-      1. vehicles.battery_weight_kg  (vehicle-specific, if > 0)
-      2. battery_weights table       (GREET standard fallback)
-         EV   LiIon conventional = 938.3 lb = 425.7 kg
-         PHEV LiIon conventional = 226.2 lb = 102.6 kg
+    Version of the data a recommend_vehicle() result depends on: the
+    country's grid rows (or every country's, when it has no row for
+    grid_year and the average is used) plus the vehicles catalogue.
     """
-    annual_km   = int(daily_km * 365)
-    lifetime_km = int(annual_km * years)
-    country3    = COUNTRY_CODE_MAP.get(country, country)
+    country3 = str(COUNTRY_CODE_MAP.get(country, country)).upper()
+    try:
+        has_row = GRID_CACHE.get((country3, int(grid_year))) is not None
+    except (TypeError, ValueError):
+        has_row = False
+    grid = data_versions.grid_key(country3) if has_row else data_versions.GRID
+    return (data_versions.current(grid), data_versions.current(data_versions.VEHICLES))
+
+
+def _grid_ci(country3, grid_year) -> float:
+    """Country intensity for grid_year, else that year's average, else 400 g/kWh."""
+    value = data_access.grid_intensity(country3, grid_year)
+    if not value:
+        value = data_access.grid_year_average(grid_year)
+    return float(value) if value else 400.0
+
 
+def _recommend_rows_db(grid_ci, vehicle_type, body_type, top_n, lifetime_km, annual_km):
+    """[row dicts] from the recommendation query."""
     conn = get_db_connection()
     cur  = conn.cursor()
 
-    cur.execute("""
-        SELECT carbon_intensity_gco2_per_kwh FROM grid_intensity
-        WHERE country_code=%s AND year=%s LIMIT 1
-    """, (country3, grid_year))
-    row = cur.fetchone()
-    if not row:
-        cur.execute("SELECT AVG(carbon_intensity_gco2_per_kwh) FROM grid_intensity WHERE year=%s", (grid_year,))
-        row = cur.fetchone()
-    grid_ci = float(row[0]) if row and row[0] else 400.0
-
     extra_where = ""
     params = [grid_ci, grid_ci]
     if vehicle_type:
@@ -113,11 +113,14 @@ def recommend_vehicle(
                 v.co2_wltp_gpkm,
                 v.electric_wh_per_km,
                 v.battery_weight_kg AS vehicle_battery_kg,
-                CASE v.vehicle_type
+                -- precomputed by load_vehicles.py; NULL for rows loaded out of band
+                v.manufacturing_kg  AS stored_manufacturing_kg,
+                v.recycling_kg      AS stored_recycling_kg,
+                COALESCE(v.norm_type, CASE v.vehicle_type
                     WHEN 'ICE' THEN 'ICEV'
                     WHEN 'BEV' THEN 'EV'
                     ELSE v.vehicle_type
-                END AS mtype,
+                END) AS mtype,
                 CASE v.vehicle_type
                     WHEN 'BEV'  THEN (v.electric_wh_per_km / 1000.0) * %s
                     WHEN 'PHEV' THEN 0.6*(v.electric_wh_per_km/1000.0)*%s
@@ -126,8 +129,8 @@ def recommend_vehicle(
                 END AS operational_g_per_km
             FROM vehicles v
             WHERE
-                (v.vehicle_type NOT IN ('BEV','PHEV') AND v.co2_wltp_gpkm > 0)
-                OR (v.vehicle_type IN ('BEV','PHEV') AND v.electric_wh_per_km > 0)
+                ((v.vehicle_type NOT IN ('BEV','PHEV') AND v.co2_wltp_gpkm > 0)
+                 OR (v.vehicle_type IN ('BEV','PHEV') AND v.electric_wh_per_km > 0))
             {extra_where}
         ),
 
@@ -135,22 +138,24 @@ def recommend_vehicle(
             SELECT
                 n.*,
                 COALESCE(g.kg_co2, 0)                                           AS glider_kg,
-                COALESCE(bw_mfg.weight_lb,0)*0.453592*COALESCE(bf.kg_co2_per_kg,0) AS battery_mfg_kg,
+                COALESCE(bw_mfg.weight_lb,0)*{LB_TO_KG}*COALESCE(bf.kg_co2_per_kg,0) AS battery_mfg_kg,
                 COALESCE(fl.grams_co2,0)/1000.0                                 AS fluids_kg,
-                COALESCE(g.kg_co2,0)
-                    + COALESCE(bw_mfg.weight_lb,0)*0.453592*COALESCE(bf.kg_co2_per_kg,0)
-                    + COALESCE(fl.grams_co2,0)/1000.0                           AS manufacturing_kg,
+                COALESCE(n.stored_manufacturing_kg,
+                    COALESCE(g.kg_co2,0)
+                    + COALESCE(bw_mfg.weight_lb,0)*{LB_TO_KG}*COALESCE(bf.kg_co2_per_kg,0)
+                    + COALESCE(fl.grams_co2,0)/1000.0)                          AS manufacturing_kg,
 
                 -- EoL recycling (GREET2: 1.4706 kg CO2/kg battery)
                 -- ICEV/HEV/FCV = 0; EV/PHEV = battery_weight_kg × 1.4706
+                COALESCE(n.stored_recycling_kg,
                 CASE WHEN n.mtype IN ('EV','PHEV')
                      THEN
                          COALESCE(
                              NULLIF(n.vehicle_battery_kg, 0),
-                             bw_recycle.weight_lb * 0.453592
+                             bw_recycle.weight_lb * {LB_TO_KG}
                          ) * {BATTERY_RECYCLING_FACTOR}
                      ELSE 0
-                END AS recycling_kg
+                END) AS recycling_kg
 
             FROM norm n
 
@@ -239,10 +244,150 @@ def recommend_vehicle(
     rows = cur.fetchall()
     cur.close()
     conn.close()
+    return [dict(zip(cols, row)) for row in rows]
+
+
+def _mtype_mfg_kg(snap):
+    """Per-mtype manufacturing kg exactly as the mfg CTE joins compute it."""
+    def build(snap):
+        out = {}
+        for mtype in {t for t, _ in greet_tables(snap)["glider"]} | set(CHEMISTRY_BY_MTYPE):
+            glider, _, battery, fluids = snapshot_parts(
+                snap, mtype, CHEMISTRY_BY_MTYPE.get(mtype, "LiIon"))
+            out[mtype] = (glider or 0) + battery + fluids
+        recycle_kg = {m: snapshot_parts(snap, m, "LiIon")[1] for m in ("EV", "PHEV")}
+        return out, recycle_kg
+    return snap.memo("recommendation_mfg", build)
+
+
+def _recommend_rows_snapshot(snap, grid_ci, vehicle_type, body_type, top_n, lifetime_km, annual_km):
+    """_recommend_rows_db() over a snapshot bundle, vectorised with NumPy."""
+    # ── norm ────────────────────────────────────────────────────────────────
+    def col(name):
+        return snap.column("vehicles", name)
+
+    def present(name):
+        mask = snap.nulls("vehicles", name)
+        return ~mask if mask is not None else np.ones(len(col(name)), dtype=bool)
+
+    vt, co2, wh = col("vehicle_type"), col("co2_wltp_gpkm"), col("electric_wh_per_km")
+    plug = np.isin(vt, ["BEV", "PHEV"])
+    keep = np.where(plug, wh > 0, co2 > 0) & present("vehicle_type")
+    if vehicle_type:
+        keep &= vt == vehicle_type
+    if body_type:
+        keep &= (col("body_type") == body_type) & present("body_type")
+
+    idx   = np.flatnonzero(keep)
+    vt_k  = vt[idx]
+    co2_k = np.nan_to_num(co2[idx])
+    wh_k  = wh[idx]
+    ops   = np.where(vt_k == "BEV", wh_k / 1000.0 * grid_ci,
+            np.where(vt_k == "PHEV", 0.6 * wh_k / 1000.0 * grid_ci + 0.4 * co2_k, co2_k))
+
+    if snap.has_column("vehicles", "norm_type"):
+        stored_mtype = np.where(present("norm_type")[idx], col("norm_type")[idx], "")
+    else:
+        stored_mtype = np.full(len(idx), "")
+    mtype = np.where(stored_mtype != "", stored_mtype,
+            np.where(vt_k == "ICE", "ICEV", np.where(vt_k == "BEV", "EV", vt_k)))
+
+    # ── mfg ─────────────────────────────────────────────────────────────────
+    by_mtype, recycle_kg = _mtype_mfg_kg(snap)
+    mfg = np.array([by_mtype.get(m, 0.0) for m in mtype.tolist()])
+    if snap.has_column("vehicles", "manufacturing_kg"):
+        stored = col("manufacturing_kg")[idx]
+        mfg = np.where(np.isnan(stored), mfg, stored)
+
+    battery = col("battery_weight_kg")[idx].astype(float) if snap.has_column("vehicles", "battery_weight_kg") else np.full(len(idx), np.nan)
+    battery[battery == 0] = np.nan
+    fallback = np.array([
+        recycle_kg.get(m) if recycle_kg.get(m) is not None else np.nan
+        for m in mtype.tolist()
+    ])
+    recycle = np.where(np.isin(mtype, ["EV", "PHEV"]),
+                       np.where(np.isnan(battery), fallback, battery) * BATTERY_RECYCLING_FACTOR, 0.0)
+    if snap.has_column("vehicles", "recycling_kg"):
+        stored = col("recycling_kg")[idx]
+        recycle = np.where(np.isnan(stored), recycle, stored)
+
+    # ── scored ──────────────────────────────────────────────────────────────
+    ok = ops > 0
+    idx, vt_k, ops, mfg, recycle = idx[ok], vt_k[ok], ops[ok], mfg[ok], recycle[ok]
+    ops_r   = np.round(ops, 2)           # later terms use the unrounded rate, as in SQL
+    mfg_gkm = mfg * 1000.0 / LIFETIME_KM
+    rec_gkm = recycle * 1000.0 / LIFETIME_KM
+    total_gkm = np.round(ops + mfg_gkm + rec_gkm, 2)
+    op_total  = ops * lifetime_km / 1000.0
+    rank      = np.round(mfg + op_total + recycle, 1)
+
+    # ── deduped: best per brand, then best overall ─────────────────────────
+    brands  = col("brand")[idx]
+    sortkey = np.where(np.isnan(rank), np.inf, rank)
+    order   = np.lexsort((sortkey, brands))
+    first   = np.ones(len(order), dtype=bool)
+    first[1:] = brands[order][1:] != brands[order][:-1]
+    best    = order[first]
+    best    = best[np.argsort(sortkey[best], kind="stable")][:top_n]
+
+    models, years = col("model"), col("year")
+    rows = []
+    for i in best.tolist():
+        v = idx[i]
+        rows.append({
+            "brand":                  str(brands[i]),
+            "model":                  str(models[v]),
+            "year":                   int(years[v]),
+            "vehicle_type":           str(vt_k[i]),
+            "operational_g_per_km":   float(ops_r[i]),
+            "manufacturing_g_per_km": round(float(mfg_gkm[i]), 2),
+            "manufacturing_total_kg": round(float(mfg[i]), 2),
+            "total_g_per_km":         float(total_gkm[i]),
+            "rank_total_kg":          float(rank[i]),
+            "operational_total_kg":   round(float(op_total[i]), 1),
+            "total_for_distance_kg":  float(rank[i]),
+            "recycling_g_per_km":     round(float(rec_gkm[i]), 2),
+            "recycling_kg":           float(recycle[i]),
+            "annual_co2_kg":          round(float(ops_r[i]) * annual_km / 1000.0, 1),
+            "carbon_score":           round(100 - float(total_gkm[i]) / 4.0, 1),
+        })
+    return rows
+
+
+def recommend_vehicle(
+    daily_km,
+    years=10,
+    body_type=None,
+    vehicle_type=None,
+    top_n=3,
+    country="US",
+    grid_year=2023,
+    baseline_vehicle=None,
+):
+    """
+    EoL recycling logic (GREET2):
+      EV/PHEV:      battery_weight_kg × 1.4706 kg CO2/kg
+      ICEV/HEV/FCV: 0  (metal recycling credits offset dismantling/shredding)
+
+    Battery weight:
+      1. vehicles.battery_weight_kg  (vehicle-specific, if > 0)
+      2. battery_weights table       (GREET standard fallback)
+         EV   LiIon conventional = 938.3 lb = 425.7 kg
+         PHEV LiIon conventional = 226.2 lb = 102.6 kg
+    """
+    annual_km   = int(daily_km * 365)
+    lifetime_km = int(annual_km * years)
+    country3    = COUNTRY_CODE_MAP.get(country, country)
+
+    grid_ci     = _grid_ci(country3, grid_year)
+
+    rows = snapshot.with_fallback(
+        lambda: _recommend_rows_db(grid_ci, vehicle_type, body_type, top_n, lifetime_km, annual_km),
+        lambda snap: _recommend_rows_snapshot(snap, grid_ci, vehicle_type, body_type, top_n, lifetime_km, annual_km),
+    )
 
     results = []
-    for row in rows:
-        r = dict(zip(cols, row))
+    for r in rows:
         results.append({
             "vehicle":                f"{r['brand']} {r['model']} ({r['year']})",
             "brand":                  r["brand"],
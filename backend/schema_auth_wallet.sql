@@ -34,4 +34,66 @@ CREATE TABLE IF NOT EXISTS travel_log (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
-CREATE INDEX IF NOT EXISTS idx_travel_log_user ON travel_log (user_id, created_at DESC);
+-- (created_at, id) keyset for /wallet/<user_id>/log pagination; id breaks ties
+-- between trips logged in the same batch.
+DROP INDEX IF EXISTS idx_travel_log_user;
+CREATE INDEX IF NOT EXISTS idx_travel_log_user_keyset
+    ON travel_log (user_id, created_at DESC, id DESC);
+
+
+-- Per-user travel rollups: daily, ISO-weekly (keyed by Monday) and monthly
+-- Maintained in the same transaction as every travel_log INSERT
+-- (carbon_wallet.ROLLUPS); rebuild with backfill_wallet_stats.py.
+CREATE TABLE IF NOT EXISTS travel_stats_daily (
+    user_id            INT     NOT NULL,
+    day                DATE    NOT NULL,
+    trips              INT     NOT NULL DEFAULT 0,
+    total_km           FLOAT   NOT NULL DEFAULT 0,
+    total_emissions_kg FLOAT   NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS travel_stats_weekly (
+    user_id            INT     NOT NULL,
+    week_start         DATE    NOT NULL,
+    trips              INT     NOT NULL DEFAULT 0,
+    total_km           FLOAT   NOT NULL DEFAULT 0,
+    total_emissions_kg FLOAT   NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, week_start),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS travel_stats_monthly (
+    user_id            INT     NOT NULL,
+    year               INT     NOT NULL,
+    month              INT     NOT NULL CHECK (month BETWEEN 1 AND 12),
+    trips              INT     NOT NULL DEFAULT 0,
+    total_km           FLOAT   NOT NULL DEFAULT 0,
+    total_emissions_kg FLOAT   NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, year, month),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+
+-- Yearly emissions quantile sketch (one row per year) for percentile ranks
+-- Written by emissions_rank.py; each worker merges its deltas in periodically.
+CREATE TABLE IF NOT EXISTS emission_sketches (
+    year        INT       PRIMARY KEY,
+    sketch      JSONB     NOT NULL,
+    updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+
+-- Pending wallet spends in ledger mode (WALLET_LEDGER_MODE=1)
+-- One row per trip, deleted once wallet_ledger.compact() has applied it to
+-- carbon_wallet and the rollups. Reads add these rows on top.
+CREATE TABLE IF NOT EXISTS wallet_ledger (
+    log_id       INT        PRIMARY KEY,      -- travel_log.id
+    user_id      INT        NOT NULL,
+    created_at   TIMESTAMP  NOT NULL,
+    distance_km  FLOAT      NOT NULL,
+    emissions_kg FLOAT      NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_wallet_ledger_user ON wallet_ledger (user_id, created_at);
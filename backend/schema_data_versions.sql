@@ -0,0 +1,8 @@
+-- Shared version counters for reference data (see data_versions.py)
+-- Loader jobs bump a row in the same transaction as their data change;
+-- every worker polls this table and drops caches built from older versions.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name        TEXT      PRIMARY KEY,     -- "grid", "grid:DEU", "vehicles"
+    version     BIGINT    NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,10 @@
+-- Load-time derived columns on the vehicles catalogue
+-- Filled by load_vehicles.py. NULL on rows loaded some other way, in which
+-- case manufacturing.py / recommendation.py compute them at query time as before.
+ALTER TABLE vehicles ADD COLUMN IF NOT EXISTS norm_type        TEXT;    -- ICE→ICEV, BEV→EV, ...
+ALTER TABLE vehicles ADD COLUMN IF NOT EXISTS manufacturing_kg FLOAT;   -- glider + battery + fluids
+ALTER TABLE vehicles ADD COLUMN IF NOT EXISTS recycling_kg     FLOAT;   -- battery EoL recycling
+
+-- Merge key used by load_vehicles.py (not UNIQUE: existing catalogues may hold duplicates)
+CREATE INDEX IF NOT EXISTS idx_vehicles_natural_key
+    ON vehicles (LOWER(brand), LOWER(model), year, vehicle_type);
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+snapshot.py  —  Offline reference-data bundles
+===============================================
+The engine needs the vehicles catalogue, grid intensities and the GREET
+tables. This writes them to a versioned bundle on disk, and reads it back
+memory-mapped, so the engine can run with no database:
+
+    python snapshot.py --export              # data/snapshots/<version>/ + CURRENT
+    python snapshot.py --info
+
+Bundle layout (one directory per version, CURRENT names the live one):
+
+    manifest.json                 tables, row counts, column dtypes, versions
+    <table>.<column>.npy          one uncompressed array per column
+    <table>.<column>.null.npy     null mask, for non-float columns that have nulls
+
+Plain .npy files (not .npz) so np.load(mmap_mode="r") maps them. Opening a
+bundle maps every column up front (a manifest read plus one mmap per file);
+pages are faulted in only when a column is used. Because the files are
+already mapped, a later export pruning this bundle cannot pull data from
+under a running process. Float columns keep NULL as NaN; strings are
+fixed-width unicode.
+
+Data source selection (DATA_SOURCE):
+    auto      Postgres, falling back to the snapshot when the DB is
+              unreachable (retried after SNAPSHOT_RETRY_S)  — default
+    postgres  never use the snapshot
+    snapshot  never touch the DB
+"""
+
+import os
+import json
+import time
+import shutil
+import argparse
+import threading
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import numpy as np
+import psycopg2
+import psycopg2.extensions
+
+# ── Constants ──────────────────────────────────────────────────────────────
+SNAPSHOT_DIR     = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "snapshots"))
+DATA_SOURCE      = os.getenv("DATA_SOURCE", "auto").lower()
+SNAPSHOT_RETRY_S = float(os.getenv("SNAPSHOT_RETRY_S", "30"))
+FORMAT_VERSION   = 1
+KEEP_BUNDLES     = 3
+
+TABLES = (
+    "vehicles",
+    "grid_intensity",
+    "glider_emissions",
+    "battery_weights",
+    "battery_emission_factors",
+    "fluids_weights",
+    "afdc_vehicles",
+)
+
+# errors that mean "no database", as opposed to a bad query; the
+# OperationalError subclasses below are raised by a live DB (statement
+# timeout, deadlock / serialization failure) and must reach the caller
+DB_UNAVAILABLE  = (psycopg2.OperationalError, psycopg2.InterfaceError)
+DB_QUERY_FAILED = (psycopg2.extensions.QueryCanceledError,
+                   psycopg2.extensions.TransactionRollbackError)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# EXPORT
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _to_array(values: list) -> tuple[np.ndarray, np.ndarray | None, str]:
+    """Column values → (array, null mask or None, kind)."""
+    present = [v for v in values if v is not None]
+    nulls   = np.array([v is None for v in values], dtype=bool)
+
+    if not present:
+        return np.full(len(values), np.nan), None, "float"      # all NULL: type unknown
+    if all(isinstance(v, bool) for v in present):
+        arr  = np.array([bool(v) if v is not None else False for v in values], dtype=bool)
+        kind = "bool"
+    elif all(isinstance(v, int) and not isinstance(v, bool) for v in present) and not nulls.any():
+        arr  = np.array(values, dtype=np.int64)
+        kind = "int"
+    elif all(isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) for v in present):
+        arr  = np.array([float(v) if v is not None else np.nan for v in values], dtype=np.float64)
+        return arr, None, "float"            # NULL is NaN
+    else:
+        text = [
+            "" if v is None else (v.isoformat() if isinstance(v, (date, datetime)) else str(v))
+            for v in values
+        ]
+        arr  = np.array(text, dtype=str)
+        kind = "str"
+    return arr, (nulls if nulls.any() else None), kind
+
+
+def _read_versions(cur) -> dict:
+    try:
+        cur.execute("SELECT name, version FROM data_versions")
+        return dict(cur.fetchall())
+    except psycopg2.Error:
+        cur.connection.rollback()
+        return {}
+
+
+def export(root: str = SNAPSHOT_DIR, tables=TABLES, keep: int = KEEP_BUNDLES) -> str:
+    """Write every table to a new bundle under root and make it CURRENT; returns its path."""
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        versions = _read_versions(cur)
+        data = {}
+        for table in tables:
+            cur.execute(f"SELECT * FROM {table}")
+            data[table] = ([d[0] for d in cur.description], cur.fetchall())
+    finally:
+        cur.close()
+        conn.close()
+
+    return write_bundle(data, root, versions, keep)
+
+
+def write_bundle(data: dict, root: str = SNAPSHOT_DIR, versions: dict | None = None,
+                 keep: int = KEEP_BUNDLES) -> str:
+    """
+    data: {table: (column_names, row_tuples)} → a new bundle made CURRENT.
+    export() feeds it from Postgres; tests and benchmarks can feed it directly.
+    """
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    path    = os.path.join(root, version)
+    tmp     = path + ".partial"
+    os.makedirs(tmp, exist_ok=True)
+
+    manifest = {
+        "format":        FORMAT_VERSION,
+        "version":       version,
+        "created_at":    datetime.now(timezone.utc).isoformat(),
+        "data_versions": versions or {},
+        "tables":        {},
+    }
+    for table, (names, rows) in data.items():
+        columns = {}
+        for i, name in enumerate(names):
+            arr, nulls, kind = _to_array([r[i] for r in rows])
+            np.save(os.path.join(tmp, f"{table}.{name}.npy"), arr, allow_pickle=False)
+            if nulls is not None:
+                np.save(os.path.join(tmp, f"{table}.{name}.null.npy"), nulls, allow_pickle=False)
+            columns[name] = {"kind": kind, "dtype": arr.dtype.str, "nulls": nulls is not None}
+        manifest["tables"][table] = {"rows": len(rows), "columns": columns}
+
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+    # flip CURRENT atomically, then prune old bundles
+    pointer = os.path.join(root, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+
+    bundles = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)) and not d.endswith(".partial"))
+    for old in bundles[:-keep] if keep else []:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return path
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# READ
+# ══════════════════════════════════════════════════════════════════════════════
+
+class Snapshot:
+    """One bundle; every column (and null mask) is memory-mapped on open."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported snapshot format {self.manifest.get('format')}")
+        self.version = self.manifest["version"]
+        self._arrays: dict[tuple, np.ndarray] = {}
+        self._rows:   dict[str, list[dict]] = {}
+        self._memo:   dict[str, object] = {}
+        self._lock    = threading.Lock()
+
+        for table, meta in self.manifest["tables"].items():
+            for name, info in meta["columns"].items():
+                self._arrays[(table, name)] = self._map(f"{table}.{name}.npy")
+                if info["nulls"]:
+                    self._arrays[(table, name + ".null")] = self._map(f"{table}.{name}.null.npy")
+
+    def _map(self, filename: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, filename), mmap_mode="r", allow_pickle=False)
+
+    def tables(self) -> list[str]:
+        return list(self.manifest["tables"])
+
+    def column(self, table: str, name: str) -> np.ndarray:
+        """Read-only memory-mapped array (floats carry NaN for NULL)."""
+        arr = self._arrays.get((table, name))
+        if arr is None:
+            raise KeyError(f"snapshot has no column {table}.{name}")
+        return arr
+
+    def nulls(self, table: str, name: str) -> np.ndarray | None:
+        return self._arrays.get((table, name + ".null"))
+
+    def has_column(self, table: str, name: str) -> bool:
+        return name in self.manifest["tables"].get(table, {}).get("columns", {})
+
+    def _python(self, table: str, name: str, idx=None) -> list:
+        """Column values (all, or those at `idx`) as Python objects, NULL → None."""
+        info   = self.manifest["tables"][table]["columns"][name]
+        arr    = self.column(table, name)
+        values = (arr if idx is None else arr[idx]).tolist()
+        if info["kind"] == "float":
+            values = [None if v != v else v for v in values]          # NaN → None
+        mask = self.nulls(table, name)
+        if mask is not None:
+            mask   = mask if idx is None else mask[idx]
+            values = [None if null else v for v, null in zip(values, mask.tolist())]
+        return values
+
+    def values(self, table: str, name: str) -> list:
+        """One column as a Python list, NULL → None."""
+        return self._python(table, name)
+
+    def rows(self, table: str) -> list[dict]:
+        """The table as DB-style row dicts (built once, then shared — don't mutate)."""
+        if table in self._rows:
+            return self._rows[table]
+        cols  = {name: self.values(table, name) for name in self.manifest["tables"][table]["columns"]}
+        names = list(cols)
+        rows  = [dict(zip(names, vals)) for vals in zip(*cols.values())] if names else []
+        with self._lock:
+            self._rows[table] = rows
+        return rows
+
+    def rows_at(self, table: str, indices) -> list[dict]:
+        """Only the rows at `indices` (in that order), as new row dicts."""
+        idx   = np.asarray(indices, dtype=np.intp)
+        names = list(self.manifest["tables"][table]["columns"])
+        cols  = [self._python(table, name, idx) for name in names]
+        return [dict(zip(names, vals)) for vals in zip(*cols)] if names else [{} for _ in idx]
+
+    def memo(self, key: str, build):
+        """Per-snapshot cache for values derived from it."""
+        if key not in self._memo:
+            value = build(self)
+            with self._lock:
+                self._memo.setdefault(key, value)
+        return self._memo[key]
+
+
+_current: Snapshot | None = None
+_current_lock = threading.Lock()
+_db_down_until = 0.0
+
+
+def current(root: str = SNAPSHOT_DIR) -> Snapshot | None:
+    """The bundle named by CURRENT, mapped once per process; None if there is none."""
+    global _current
+    if _current is None:
+        with _current_lock:
+            if _current is None:
+                try:
+                    with open(os.path.join(root, "CURRENT")) as f:
+                        _current = Snapshot(os.path.join(root, f.read().strip()))
+                except FileNotFoundError:
+                    return None
+                print(f"✅ snapshot {_current.version} mapped from {_current.path}")
+    return _current
+
+
+def with_fallback(from_db, from_snapshot):
+    """
+    Run from_db(), or from_snapshot(snapshot) per DATA_SOURCE. In auto mode a
+    connection failure switches to the snapshot for SNAPSHOT_RETRY_S, so a
+    dead DB costs one connect timeout, not one per call.
+    """
+    global _db_down_until
+    if DATA_SOURCE == "snapshot":
+        snap = current()
+        if snap is None:
+            raise RuntimeError(f"DATA_SOURCE=snapshot but no bundle in {SNAPSHOT_DIR}")
+        return from_snapshot(snap)
+
+    if DATA_SOURCE == "auto" and time.monotonic() < _db_down_until:
+        snap = current()
+        if snap is not None:
+            return from_snapshot(snap)
+
+    try:
+        return from_db()
+    except DB_UNAVAILABLE as e:
+        if isinstance(e, DB_QUERY_FAILED):
+            raise
+        snap = current() if DATA_SOURCE == "auto" else None
+        if snap is None:
+            raise
+        if time.monotonic() >= _db_down_until:
+            reason = (str(e).strip().splitlines() or ["unknown error"])[0][:80]
+            print(f"⚠️  database unavailable ({reason}), serving snapshot {snap.version}")
+        _db_down_until = time.monotonic() + SNAPSHOT_RETRY_S
+        return from_snapshot(snap)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export / inspect reference-data snapshots")
+    parser.add_argument("--export", action="store_true", help="write a new bundle and make it CURRENT")
+    parser.add_argument("--info", action="store_true", help="describe the CURRENT bundle")
+    parser.add_argument("--root", default=SNAPSHOT_DIR)
+    parser.add_argument("--keep", type=int, default=KEEP_BUNDLES, help="bundles to keep after export")
+    args = parser.parse_args()
+
+    if args.export:
+        t0   = time.perf_counter()
+        path = export(args.root, keep=args.keep)
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        print(f"✅ snapshot written to {path} ({size / 1e6:.1f} MB, {time.perf_counter() - t0:.1f}s)")
+    if args.info or not args.export:
+        snap = current(args.root)
+        if snap is None:
+            print(f"⚠️  no snapshot in {args.root}")
+        else:
+            print(f"snapshot {snap.version}  ({snap.path})")
+            for table, meta in snap.manifest["tables"].items():
+                print(f"   {table:<26} {meta['rows']:>8,} rows  {len(meta['columns'])} columns")
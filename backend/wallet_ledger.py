@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+wallet_ledger.py  —  Compaction for ledger-mode wallet spending
+================================================================
+With WALLET_LEDGER_MODE=1, a trip only appends a wallet_ledger row (see
+carbon_wallet.LEDGER_MODE). This module folds those rows into the
+carbon_wallet snapshot and the travel_stats_* rollups in batches:
+
+    DELETE a batch of ledger rows (SKIP LOCKED) ... RETURNING them
+    → one aggregated UPDATE carbon_wallet per user
+    → one upsert per rollup table
+    → emissions_rank moves, after commit
+
+All of it runs in one transaction. A ledger row is either still pending
+(and added on top by every read) or applied — never both. Several
+compactors can run at once, since SKIP LOCKED hands each a disjoint batch.
+
+Runs in the background of each worker when ledger mode is on (every
+WALLET_COMPACT_S), or by hand, e.g. after switching ledger mode off:
+
+    python wallet_ledger.py --compact
+"""
+
+import os
+import time
+import argparse
+import threading
+
+from psycopg2.extras import execute_values
+
+from database import get_db_connection
+import emissions_rank
+from carbon_wallet import LEDGER_MODE, _bump_rollups, _yearly_moves
+
+# ── Constants ──────────────────────────────────────────────────────────────
+COMPACT_INTERVAL_S = float(os.getenv("WALLET_COMPACT_S", "5"))
+COMPACT_BATCH_ROWS = 5000
+
+_compactor = None
+_compactor_lock = threading.Lock()
+
+
+def compact_batch(limit: int = COMPACT_BATCH_ROWS) -> int:
+    """Apply up to `limit` pending ledger rows; returns how many were applied."""
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    try:
+        cur.execute("""
+            DELETE FROM wallet_ledger
+            WHERE log_id IN (
+                SELECT log_id FROM wallet_ledger
+                ORDER BY log_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING user_id, created_at, distance_km, emissions_kg
+        """, (limit,))
+        applied = cur.fetchall()
+        if not applied:
+            conn.rollback()
+            return 0
+
+        spent: dict[int, float] = {}
+        for user_id, _, _, kg in applied:
+            spent[user_id] = spent.get(user_id, 0.0) + kg
+
+        execute_values(cur, """
+            UPDATE carbon_wallet AS w
+            SET remaining_credits_kg = w.remaining_credits_kg - v.spent
+            FROM (VALUES %s) AS v(user_id, spent)
+            WHERE w.user_id = v.user_id
+        """, sorted(spent.items()), template="(%s::int, %s::float8)", page_size=len(spent))
+
+        _bump_rollups(cur, applied)
+        moves = _yearly_moves(cur, [
+            (user_id, created_at.year, kg) for user_id, created_at, _, kg in applied
+        ])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    emissions_rank.record(moves)
+    return len(applied)
+
+
+def compact() -> int:
+    """Drain the ledger; returns rows applied."""
+    total = 0
+    while True:
+        n = compact_batch()
+        total += n
+        if n < COMPACT_BATCH_ROWS:
+            return total
+
+
+def _compact_loop():
+    while True:
+        time.sleep(COMPACT_INTERVAL_S)
+        try:
+            compact()
+        except Exception as e:
+            print(f"⚠️  wallet ledger compaction failed: {e}")
+
+
+def start_compactor():
+    """Start the background compactor once per process (ledger mode only)."""
+    global _compactor
+    if not LEDGER_MODE or _compactor is not None:
+        return
+    with _compactor_lock:
+        if _compactor is None:
+            _compactor = threading.Thread(target=_compact_loop, name="wallet-ledger", daemon=True)
+            _compactor.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending wallet_ledger rows")
+    parser.add_argument("--compact", action="store_true", required=True)
+    parser.parse_args()
+
+    t0 = time.perf_counter()
+    n  = compact()
+    print(f"✅ wallet_ledger: {n} rows applied in {time.perf_counter() - t0:.2f}s")
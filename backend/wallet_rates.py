@@ -0,0 +1,125 @@
+"""
+wallet_rates.py  —  Operational g CO₂/km rates for wallet spending
+===================================================================
+The wallet charges each trip at the vehicle's operational rate. For EV and
+PHEV trips that rate depends on the grid the car charges from, so the rate
+table is keyed on (vehicle_id, country, year):
+
+    rate = rate_for(vehicle, country="DE", year=2025)     # g CO₂/km or None
+
+Grid intensities come from engine.GRID_CACHE, the same source as
+/lifecycle. When the requested year has no data, the latest earlier year for
+that country is used, then the latest year overall. Trips with no country,
+or a country with no grid data, fall back to DEFAULT_GRID_G_PER_KWH.
+
+ICE / HEV rates don't depend on the grid, so they are stored once per
+vehicle under (vehicle_id, None, None).
+
+Entries are computed on first use and then served from memory. The whole
+table is dropped when data_versions "grid" or "vehicles" is bumped.
+"""
+
+import bisect
+import threading
+
+import data_versions
+from engine import GRID_CACHE, PHEV_ELECTRIC_SHARE, normalise_country
+
+# ── Constants ──────────────────────────────────────────────────────────────
+DEFAULT_GRID_G_PER_KWH = 233.0      # EU-average grid, the wallet's old fixed factor
+
+TAILPIPE_TYPES = {"ICE", "HEV"}
+ELECTRIC_TYPES = {"EV", "BEV", "PHEV"}
+
+_rates: dict[tuple, float | None] = {}
+_grid_years: dict[str, list[int]] = {}      # country → sorted years in GRID_CACHE
+_built_for = None                           # (grid version, vehicles version)
+_lock = threading.Lock()
+
+
+def _sync():
+    """Drop the tables if the grid or vehicle data changed since they were built."""
+    global _built_for
+    versions = (data_versions.current(data_versions.GRID),
+                data_versions.current(data_versions.VEHICLES))
+    if versions == _built_for:
+        return
+    with _lock:
+        if versions == _built_for:
+            return
+        years: dict[str, list[int]] = {}
+        for (country, year), value in list(GRID_CACHE.items()):
+            if value is not None:
+                years.setdefault(country, []).append(int(year))
+        _grid_years.clear()
+        _grid_years.update({c: sorted(ys) for c, ys in years.items()})
+        _rates.clear()
+        _built_for = versions
+
+
+def grid_g_per_kwh(country: str | None, year: int) -> float:
+    """Grid intensity for (country, year), using the nearest earlier year if needed."""
+    _sync()
+    code  = normalise_country(country)
+    years = _grid_years.get(code) if code else None
+    if not years:
+        return DEFAULT_GRID_G_PER_KWH
+
+    i = bisect.bisect_right(years, int(year))
+    resolved = years[i - 1] if i else years[-1]
+    return float(GRID_CACHE[(code, resolved)])
+
+
+def _compute_rate(vehicle: dict, grid_g_kwh: float) -> float | None:
+    """Mirrors engine.calculate_operational() for a single vehicle row."""
+    vtype     = (vehicle.get("vehicle_type") or "").upper()
+    tailpipe  = vehicle.get("co2_wltp_gpkm")
+    wh_per_km = vehicle.get("electric_wh_per_km")
+
+    if vtype in ("EV", "BEV"):
+        return float(wh_per_km) / 1000 * grid_g_kwh if wh_per_km is not None else None
+
+    if vtype == "PHEV":
+        if tailpipe is not None and wh_per_km is not None:
+            elec_g_km = float(wh_per_km) / 1000 * grid_g_kwh
+            return PHEV_ELECTRIC_SHARE * elec_g_km + (1 - PHEV_ELECTRIC_SHARE) * float(tailpipe)
+        return float(tailpipe) if tailpipe is not None else None
+
+    # ICE, HEV and anything unrecognised: stored tailpipe figure
+    return float(tailpipe) if tailpipe is not None else None
+
+
+def rate_for(vehicle: dict, country: str | None, year: int) -> float | None:
+    """
+    Operational g CO₂/km for this vehicle charged from `country`'s grid in
+    `year`, or None if the vehicle row lacks the data to compute one.
+    """
+    _sync()
+    vtype = (vehicle.get("vehicle_type") or "").upper()
+    if vtype in ELECTRIC_TYPES:
+        key = (vehicle.get("id"), normalise_country(country), int(year))
+    else:
+        key = (vehicle.get("id"), None, None)
+
+    try:
+        return _rates[key]
+    except KeyError:
+        pass
+
+    grid = grid_g_per_kwh(key[1], key[2]) if key[1] is not None else DEFAULT_GRID_G_PER_KWH
+    rate = _compute_rate(vehicle, grid)
+    if key[0] is not None:
+        _rates[key] = rate
+    return rate
+
+
+def precompute(vehicles: list[dict], countries: list[str], year: int) -> int:
+    """
+    Fill the table for every (vehicle, country) pair at `year`, e.g. at
+    start-up for the countries most wallets use. Returns entries added.
+    """
+    before = len(_rates)
+    for vehicle in vehicles:
+        for country in countries:
+            rate_for(vehicle, country, year)
+    return len(_rates) - before
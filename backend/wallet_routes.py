@@ -10,20 +10,34 @@ Make sure app.py does NOT have url_prefix on the blueprint itself
 if it already lives inside a /wallet prefix here.
 """
 
-from flask import Blueprint, request, jsonify
-from database import get_db_connection
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from carbon_wallet import (
     get_wallet,
-    spend_carbon_credits,
+    log_trip,
     get_travel_log,
+    iter_travel_log,
+    encode_log_cursor,
+    decode_log_cursor,
     get_yearly_stats,
+    get_monthly_stats,
+    get_series,
     create_wallet,
+    spend_carbon_credits_batch,
+    MAX_BATCH_TRIPS,
 )
-from datetime import datetime
+from emissions_rank import percentile_rank
+from wallet_ledger import start_compactor
+from datetime import date, datetime, timedelta, timezone
+import csv
+import io
+import json
 import traceback
 
 wallet_bp = Blueprint("wallet", __name__, url_prefix="/wallet")
 
+# Ledger mode only: fold pending wallet_ledger rows in the background
+start_compactor()
+
 
 def _parse_user_id(raw):
     """Return (int_id, None) or (None, flask_error_tuple)."""
@@ -99,7 +113,7 @@ def wallet_balance(user_id):
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-# GET /wallet/<user_id>/log
+# GET /wallet/<user_id>/log?limit=50&cursor=<next_cursor>
 # ══════════════════════════════════════════════════════════════════════════════
 
 @wallet_bp.route("/<user_id>/log", methods=["GET"])
@@ -109,18 +123,166 @@ def travel_log(user_id):
         return err
 
     try:
-        limit = min(int(request.args.get("limit", 50)), 200)
+        limit = max(1, min(int(request.args.get("limit", 50)), 200))
     except (ValueError, TypeError):
         limit = 50
 
+    before = None
+    if request.args.get("cursor"):
+        try:
+            before = decode_log_cursor(request.args["cursor"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
     try:
-        trips = get_travel_log(uid, limit=limit)
-        return jsonify({"user_id": uid, "trips": trips or [], "count": len(trips or [])})
+        # one extra row tells us whether another page exists
+        trips = get_travel_log(uid, limit=limit + 1, before=before)
+        next_cursor = encode_log_cursor(trips[limit - 1]) if len(trips) > limit else None
+        trips = trips[:limit]
+        return jsonify({
+            "user_id":     uid,
+            "trips":       trips,
+            "count":       len(trips),
+            "next_cursor": next_cursor,
+        })
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": f"Could not load travel log: {e}"}), 500
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# GET /wallet/<user_id>/log/export?format=csv|ndjson
+# ══════════════════════════════════════════════════════════════════════════════
+
+EXPORT_FIELDS = ["log_id", "logged_at", "vehicle", "year", "vehicle_type",
+                 "distance_km", "emissions_kg"]
+
+
+def _csv_lines(trips):
+    buf    = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for trip in trips:
+        writer.writerow(trip)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+
+def _ndjson_lines(trips):
+    for trip in trips:
+        yield json.dumps(trip) + "\n"
+
+
+@wallet_bp.route("/<user_id>/log/export", methods=["GET"])
+def travel_log_export(user_id):
+    uid, err = _parse_user_id(user_id)
+    if err:
+        return err
+
+    fmt = (request.args.get("format") or "csv").lower()
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": f"Unknown format {fmt!r}; use 'csv' or 'ndjson'"}), 400
+
+    lines = _csv_lines if fmt == "csv" else _ndjson_lines
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(lines(iter_travel_log(uid))),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="travel_log_{uid}.{fmt}"'},
+    )
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# GET /wallet/<user_id>/stats/monthly?year=2025
+# ══════════════════════════════════════════════════════════════════════════════
+
+@wallet_bp.route("/<user_id>/stats/monthly", methods=["GET"])
+def monthly_stats(user_id):
+    uid, err = _parse_user_id(user_id)
+    if err:
+        return err
+
+    year = request.args.get("year")
+    try:
+        year = int(year) if year else None
+    except ValueError:
+        return jsonify({"error": f"Invalid year: {year!r}"}), 400
+
+    try:
+        return jsonify({"user_id": uid, **get_monthly_stats(uid, year)})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": f"Could not load monthly stats: {e}"}), 500
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# GET /wallet/<user_id>/rank?year=2025
+# "You emit less than N% of CarbonWise users this year"
+# ══════════════════════════════════════════════════════════════════════════════
+
+@wallet_bp.route("/<user_id>/rank", methods=["GET"])
+def emissions_percentile(user_id):
+    uid, err = _parse_user_id(user_id)
+    if err:
+        return err
+
+    year = request.args.get("year")
+    try:
+        year = int(year) if year else None
+    except ValueError:
+        return jsonify({"error": f"Invalid year: {year!r}"}), 400
+
+    try:
+        stats = get_yearly_stats(uid, year)
+        if not stats["trips"]:
+            return jsonify({
+                "user_id": uid, "year": stats["year"], "percentile": None,
+                "note": "No trips logged this year yet.",
+            })
+        return jsonify({"user_id": uid, **percentile_rank(stats["total_emissions_kg"], stats["year"])})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": f"Could not rank emissions: {e}"}), 500
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# GET /wallet/<user_id>/series?bucket=day|week|month&from=2025-01-01&to=2025-03-31
+# Used by WalletDashboard charts — dense series, zero-filled
+# ══════════════════════════════════════════════════════════════════════════════
+
+SERIES_DEFAULT_SPAN = {"day": timedelta(days=29), "week": timedelta(weeks=11), "month": timedelta(days=334)}
+
+
+@wallet_bp.route("/<user_id>/series", methods=["GET"])
+def emission_series(user_id):
+    uid, err = _parse_user_id(user_id)
+    if err:
+        return err
+
+    bucket = (request.args.get("bucket") or "day").lower()
+    if bucket not in SERIES_DEFAULT_SPAN:
+        return jsonify({"error": f"Unknown bucket {bucket!r}; use day, week or month"}), 400
+
+    try:
+        end   = date.fromisoformat(request.args["to"]) if request.args.get("to") else datetime.utcnow().date()
+        start = (date.fromisoformat(request.args["from"]) if request.args.get("from")
+                 else end - SERIES_DEFAULT_SPAN[bucket])
+    except ValueError:
+        return jsonify({"error": "'from' and 'to' must be YYYY-MM-DD dates"}), 400
+
+    try:
+        series = get_series(uid, bucket, start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": f"Could not load series: {e}"}), 500
+
+    return jsonify({"user_id": uid, **series})
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # POST /wallet/travel
 # ══════════════════════════════════════════════════════════════════════════════
@@ -147,24 +309,13 @@ def log_travel():
     except (ValueError, TypeError):
         return jsonify({"error": "distance_km must be a positive number"}), 400
 
-    conn = get_db_connection()
-    cur  = conn.cursor()
     try:
-        cur.execute("SELECT * FROM vehicles WHERE id = %s", (vehicle_id,))
-        row = cur.fetchone()
-        if not row:
-            return jsonify({"error": f"Vehicle id={vehicle_id} not found"}), 404
-        columns = [d[0] for d in cur.description]
-        vehicle = dict(zip(columns, row))
-    except Exception as e:
-        traceback.print_exc()
-        return jsonify({"error": f"Database error fetching vehicle: {e}"}), 500
-    finally:
-        cur.close()
-        conn.close()
+        vehicle_id = int(vehicle_id)
+    except (ValueError, TypeError):
+        return jsonify({"error": f"Invalid vehicle_id: {vehicle_id!r}"}), 400
 
     try:
-        result = spend_carbon_credits(uid, vehicle, distance_km)
+        result = log_trip(uid, distance_km, vehicle_id=vehicle_id, country=data.get("country"))
     except LookupError as e:
         return jsonify({"error": str(e)}), 404
     except ValueError as e:
@@ -204,30 +355,14 @@ def log_travel_by_name():
     except (ValueError, TypeError):
         return jsonify({"error": "distance_km must be a positive number"}), 400
 
-    conn = get_db_connection()
-    cur  = conn.cursor()
-    try:
-        cur.execute("""
-            SELECT * FROM vehicles
-            WHERE LOWER(brand) = LOWER(%s)
-              AND LOWER(model) = LOWER(%s)
-              AND year = %s
-            LIMIT 1
-        """, (brand, model, year))
-        row = cur.fetchone()
-        if not row:
-            return jsonify({"error": f"Vehicle '{brand} {model} {year}' not found"}), 404
-        columns = [d[0] for d in cur.description]
-        vehicle = dict(zip(columns, row))
-    except Exception as e:
-        traceback.print_exc()
-        return jsonify({"error": f"Database error: {e}"}), 500
-    finally:
-        cur.close()
-        conn.close()
+    try:
+        year = int(year)
+    except (ValueError, TypeError):
+        return jsonify({"error": f"Invalid year: {year!r}"}), 400
 
     try:
-        result = spend_carbon_credits(uid, vehicle, distance_km)
+        result = log_trip(uid, distance_km, brand=brand, model=model, year=year,
+                          country=data.get("country"))
     except LookupError as e:
         return jsonify({"error": str(e)}), 404
     except ValueError as e:
@@ -236,4 +371,112 @@ def log_travel_by_name():
         traceback.print_exc()
         return jsonify({"error": f"Could not log trip: {e}"}), 500
 
-    return jsonify(result), 200
\ No newline at end of file
+    return jsonify(result), 200
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# POST /wallet/travel/batch
+# Body: { trips: [ { user_id, distance_km, vehicle_id | brand+model+year,
+#                    country?, logged_at? }, ... ] }
+# Used by fleet integrations and offline mobile queues
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _parse_logged_at(value):
+    """ISO 8601 timestamp → naive UTC datetime (None when absent); ValueError if malformed."""
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        raise ValueError
+    ts = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _validate_batch_trip(raw):
+    """Return (clean_trip, None) or (None, error_message)."""
+    if not isinstance(raw, dict):
+        return None, "trip must be an object"
+
+    try:
+        uid = int(raw.get("user_id"))
+        if uid <= 0:
+            raise ValueError
+    except (ValueError, TypeError):
+        return None, f"Invalid user_id: {raw.get('user_id')!r} — must be a positive integer"
+
+    try:
+        distance_km = float(raw.get("distance_km"))
+        if distance_km <= 0:
+            raise ValueError
+    except (ValueError, TypeError):
+        return None, "distance_km must be a positive number"
+
+    try:
+        logged_at = _parse_logged_at(raw.get("logged_at"))
+    except ValueError:
+        return None, f"Invalid logged_at: {raw.get('logged_at')!r} — must be an ISO 8601 timestamp"
+
+    trip = {
+        "user_id":     uid,
+        "distance_km": distance_km,
+        "country":     (raw.get("country") or "").strip() or None,
+        "logged_at":   logged_at,
+    }
+
+    if raw.get("vehicle_id") is not None:
+        try:
+            trip["vehicle_id"] = int(raw["vehicle_id"])
+        except (ValueError, TypeError):
+            return None, f"Invalid vehicle_id: {raw['vehicle_id']!r}"
+        return trip, None
+
+    brand = (raw.get("brand") or "").strip()
+    model = (raw.get("model") or "").strip()
+    try:
+        year = int(raw.get("year"))
+    except (ValueError, TypeError):
+        year = None
+    if not brand or not model or year is None:
+        return None, "each trip needs vehicle_id or brand, model, and year"
+
+    trip.update(vehicle_id=None, brand=brand, model=model, year=year)
+    return trip, None
+
+
+@wallet_bp.route("/travel/batch", methods=["POST"])
+def log_travel_batch():
+    data  = request.json or {}
+    trips = data.get("trips")
+
+    if not isinstance(trips, list) or not trips:
+        return jsonify({"error": "trips must be a non-empty list"}), 400
+    if len(trips) > MAX_BATCH_TRIPS:
+        return jsonify({"error": f"At most {MAX_BATCH_TRIPS} trips per batch"}), 413
+
+    results   = [None] * len(trips)
+    valid     = []
+    valid_idx = []
+    for i, raw in enumerate(trips):
+        trip, error = _validate_batch_trip(raw)
+        if error:
+            results[i] = {"index": i, "ok": False, "status": 400, "error": error}
+        else:
+            valid.append(trip)
+            valid_idx.append(i)
+
+    if valid:
+        try:
+            batch = spend_carbon_credits_batch(valid)
+        except Exception as e:
+            traceback.print_exc()
+            return jsonify({"error": f"Could not log trips: {e}"}), 500
+        for i, r in zip(valid_idx, batch):
+            results[i] = {**r, "index": i}
+
+    accepted = sum(1 for r in results if r["ok"])
+    return jsonify({
+        "results":  results,
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+    }), 200
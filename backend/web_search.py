@@ -11,8 +11,9 @@ import dotenv
 dotenv.load_dotenv()
 
 GEMINI_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
 GEMINI_URL = (
-    "https://generativelanguage.googleapis.com/v1beta/models/"
+    f"{GEMINI_API_BASE}/v1beta/models/"
     "gemini-2.5-flash:generateContent"
 )
 
@@ -329,10 +329,11 @@ class CarbonWiseAPI {
 
   /**
    * Get grid data for all countries
+   * @param {string} [format] - 'columnar' for compact country × year matrices
    * @returns {Promise<object>} Grid data
    */
-  async getGridData() {
-    return this.request('/grid');
+  async getGridData(format) {
+    return this.request(format ? `/grid?format=${format}` : '/grid');
   }
 }
 